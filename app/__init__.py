@@ -1,4 +1,11 @@
 # Inicialización del módulo principal
-from .main import app
+# La aplicación web se importa bajo demanda: el arranque (python -m app) pone
+# en marcha el control de ventiladores antes de cargar FastAPI
+__all__ = ["app"]
 
-__all__ = ["app"]
\ No newline at end of file
+
+def __getattr__(name):
+    if name == "app":
+        from .main import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
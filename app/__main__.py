@@ -0,0 +1,48 @@
+"""Arranque del servicio: python -m app
+
+El control de ventiladores sale primero: se crean los servicios con el
+mínimo de importaciones (sin FastAPI, uvicorn, httpx ni NumPy), se hace la
+primera escritura PWM y arranca el bucle. Después se importa la API web en
+un hilo, para que el bucle siga funcionando mientras tanto, y se sirve con
+uvicorn. Los niveles agregados del histórico se reconstruyen al final, para
+no competir con esa importación. FANCONTROL_HOST y FANCONTROL_PORT eligen dónde escuchar.
+"""
+import asyncio
+import logging
+import os
+import time
+from importlib import import_module
+from .services.container import ServiceContainer
+
+logger = logging.getLogger("app.main")
+
+
+async def serve(host: str, port: int):
+    begin = time.perf_counter()
+    logger.info("Iniciando servicio FanControl")
+    services = ServiceContainer.from_env()
+    if services.cluster is not None:
+        logger.info(f"Modo agregador con {len(services.cluster.peers)} nodos")
+    await services.start(rebuild_tiers=False)
+    logger.info(f"Control de ventiladores activo en {time.perf_counter() - begin:.3f} s")
+
+    loop = asyncio.get_running_loop()
+    try:
+        main = await loop.run_in_executor(None, import_module, "app.main")
+        uvicorn = await loop.run_in_executor(None, import_module, "uvicorn")
+    except BaseException:
+        await services.stop()
+        raise
+    services.rebuild_tiers()
+    # El lifespan de la aplicación los detiene al salir
+    main.app.state.services = services
+    await uvicorn.Server(uvicorn.Config(main.app, host=host, port=port)).serve()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(serve(os.getenv("FANCONTROL_HOST", "0.0.0.0"), int(os.getenv("FANCONTROL_PORT", "8000"))))
+
+
+if __name__ == "__main__":
+    main()
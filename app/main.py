@@ -1,20 +1,45 @@
-import os
 import logging
-from fastapi import FastAPI, Request
+from contextlib import asynccontextmanager
+from pathlib import Path
+from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from .routes import api, auth, ws
-from .services.history import HistoryService
-from .services.fan_control import FanControlService
+from .routes import api, auth, cluster as cluster_routes, ws
+from .services.container import ServiceContainer
 
 # Configuración inicial
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Crea los servicios una sola vez, los publica en app.state y los detiene al salir.
+
+    Con python -m app el control ya está en marcha antes de importar este
+    módulo y los servicios llegan en app.state; aquí sólo se detienen.
+    """
+    services = getattr(app.state, "services", None)
+    if services is None:
+        logger.info("Iniciando servicio FanControl")
+        services = ServiceContainer.from_env()
+        if services.cluster is not None:
+            logger.info(f"Modo agregador con {len(services.cluster.peers)} nodos")
+        await services.start()
+        app.state.services = services
+    try:
+        yield
+    finally:
+        logger.info("Deteniendo servicio FanControl")
+        app.state.services = None
+        await services.stop()
+
+
 app = FastAPI(
     title="FanControl Proxmox",
     description="Sistema de monitorización y control de ventiladores para servidores Proxmox/Debian",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Middleware
@@ -26,26 +51,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Servicios
-history_service = HistoryService()
-fan_control = FanControlService(history_service)
-
 # Rutas
 app.include_router(api.router)
 app.include_router(auth.router)
 app.include_router(ws.router)
+app.include_router(cluster_routes.router)
 
 # Archivos estáticos
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
-
-@app.on_event("startup")
-async def startup_event():
-    """Inicialización del servicio"""
-    logger.info("Iniciando servicio FanControl")
-    await fan_control.initialize()
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Limpieza al detener el servicio"""
-    logger.info("Deteniendo servicio FanControl")
-    await fan_control.cleanup()
\ No newline at end of file
+app.mount("/static", StaticFiles(directory=Path(__file__).parent / "static"), name="static")
@@ -1,4 +1,4 @@
-from .config import FanConfig, ControlCurve, AlertConfig
-from .sensor import SensorData
+from .config import FanConfig, ControlCurve, AlertConfig, AlertRule, ChannelMap, FanChannel, PredictiveSettings, ScheduleConfig, ScheduleRule, default_config
+from .sensor import Sample, SensorData
 
-__all__ = ["FanConfig", "ControlCurve", "AlertConfig", "SensorData"]
\ No newline at end of file
+__all__ = ["FanConfig", "ControlCurve", "AlertConfig", "AlertRule", "ChannelMap", "FanChannel", "PredictiveSettings", "ScheduleConfig", "ScheduleRule", "default_config", "Sample", "SensorData"]
\ No newline at end of file
@@ -1,5 +1,12 @@
-from pydantic import BaseModel, conint, conlist, validator
-from typing import List, Tuple
+from datetime import datetime
+from pydantic import BaseModel, confloat, conint, conlist, root_validator, validator
+from typing import Dict, List, Optional, Tuple
+
+# Reglas para combinar varias entradas de temperatura de un ventilador
+AGGREGATIONS = ("max", "mean", "curve_max")
+# Condiciones de las reglas de alerta
+ALERT_KINDS = ("above", "below", "rate", "stuck")
+NOTIFIERS = ("email", "telegram", "webhook")
 
 class ControlCurve(BaseModel):
     """Configuración de curva de control para un ventilador"""
@@ -13,16 +20,264 @@ class ControlCurve(BaseModel):
         # Ordenar curva por temperatura
         return sorted(v, key=lambda x: x[0])
 
+class AlertRule(BaseModel):
+    """Regla de alerta evaluada sobre una métrica en cada muestra.
+
+    above/below: la métrica supera/no alcanza threshold durante duration s.
+    rate: la variación supera threshold unidades/s en una ventana de duration s.
+    stuck: la métrica no cambia más de threshold durante duration s.
+    """
+    name: str
+    metric: str  # Zona de temperatura o "<ventilador>_rpm"
+    kind: str = "above"
+    threshold: float
+    duration: confloat(ge=0) = 0.0
+    severity: str = "warning"
+    cooldown: Optional[float] = None  # None: el cooldown global de AlertConfig
+    notify: List[str] = []            # Vacío: todos los notificadores configurados
+
+    @validator('kind')
+    def validate_kind(cls, v):
+        if v not in ALERT_KINDS:
+            raise ValueError(f"kind debe ser uno de {ALERT_KINDS}")
+        return v
+
+    @validator('notify', each_item=True)
+    def validate_notify(cls, v):
+        if v not in NOTIFIERS:
+            raise ValueError(f"notify debe contener valores de {NOTIFIERS}")
+        return v
+
+    @root_validator(skip_on_failure=True)
+    def validate_window(cls, values):
+        if values['kind'] in ("rate", "stuck") and values['duration'] <= 0:
+            raise ValueError(f"{values['name']}: las reglas {values['kind']} necesitan duration > 0")
+        return values
+
+class EmailSettings(BaseModel):
+    """Servidor SMTP para las notificaciones por email"""
+    host: str
+    port: int = 25
+    sender: str
+    to: conlist(item_type=str, min_items=1)
+    username: Optional[str] = None
+    password: Optional[str] = None
+    starttls: bool = False
+
+class TelegramSettings(BaseModel):
+    """Bot de Telegram para las notificaciones"""
+    token: str
+    chat_id: str
+    api_url: str = "https://api.telegram.org"
+
+class WebhookSettings(BaseModel):
+    """Webhook HTTP que recibe cada alerta como JSON"""
+    url: str
+    headers: Dict[str, str] = {}
+
 class AlertConfig(BaseModel):
     """Configuración de alertas"""
     temp_threshold: float = 85.0
     rpm_threshold: int = 500
     temp_critical: float = 95.0
+    rpm_duration: float = 5.0       # Segundos con RPM bajas antes de alertar
+    rpm_deviation: float = 0.2      # Caída relativa de RPM frente a lo esperado para el PWM
+    rise_score: float = 4.0         # Sigmas de subida de temperatura anómala para el PWM
     email_notifications: bool = False
     telegram_notifications: bool = False
+    default_rules: bool = True      # Generar las reglas clásicas a partir de los umbrales
+    rules: List[AlertRule] = []
+    cooldown: float = 300.0         # Segundos mínimos entre notificaciones de una regla
+    retries: conint(ge=0, le=10) = 3
+    email: Optional[EmailSettings] = None
+    telegram: Optional[TelegramSettings] = None
+    webhook: Optional[WebhookSettings] = None
+
+class ChannelMap(BaseModel):
+    """Canales hwmon como "<chip>[@<dispositivo>]/<canal o etiqueta>" (ver discovery)"""
+    temp: str = "hwmon0/temp2"
+    fan1: str = "hwmon0/fan1"
+    fan2: str = "hwmon0/fan2"
+    pwm1: str = "hwmon0/pwm1"
+    pwm2: str = "hwmon0/pwm2"
+
+class FanChannel(BaseModel):
+    """Ventilador genérico: salida PWM, tacómetro opcional y regla de control"""
+    pwm: str
+    rpm: Optional[str] = None
+    inputs: conlist(item_type=str, min_items=1)
+    curve: ControlCurve
+    # max: curva sobre la entrada más caliente; mean: curva sobre la media
+    # (ponderada con weights); curve_max: curva por entrada y máximo del PWM
+    aggregate: str = "max"
+    weights: Optional[List[float]] = None
+    input_curves: Dict[str, ControlCurve] = {}
+
+    @validator('aggregate')
+    def validate_aggregate(cls, v):
+        if v not in AGGREGATIONS:
+            raise ValueError(f"aggregate debe ser uno de {AGGREGATIONS}")
+        return v
+
+    @validator('weights')
+    def validate_weights(cls, v, values):
+        if v is not None and len(v) != len(values.get('inputs', [])):
+            raise ValueError("weights debe tener un peso por entrada")
+        return v
+
+    @validator('input_curves')
+    def validate_input_curves(cls, v, values):
+        unknown = [name for name in v if name not in values.get('inputs', [])]
+        if unknown:
+            raise ValueError(f"input_curves para entradas que no existen: {unknown}")
+        return v
+
+class PredictiveSettings(BaseModel):
+    """Control predictivo de un ventilador: PID sobre la temperatura más feed-forward de carga.
+
+    El feed-forward es el PWM que, según el modelo térmico ajustado con los
+    últimos `window` s (cada `refit_every` s), mantiene la temperatura en
+    setpoint con la carga de CPU actual. Mientras no hay modelo se usa la
+    curva. El PWM queda entre el valor mínimo y el máximo de la curva.
+    """
+    setpoint: Optional[float] = None  # °C; None: donde la curva alcanza su PWM medio
+    kp: confloat(ge=0) = 6.0          # PWM por °C
+    ki: confloat(ge=0) = 0.05         # PWM por °C·s
+    kd: confloat(ge=0) = 40.0         # PWM por °C/s
+    deadband: conint(ge=0, le=64) = 4  # Cambios de PWM menores no se piden
+    window: confloat(ge=60, le=86400) = 1800.0
+    refit_every: confloat(ge=1) = 60.0
+    min_samples: conint(ge=20) = 300
+
+class ScheduleRule(BaseModel):
+    """Regla del planificador de perfiles (una de las tres formas).
+
+    cron: "min hora día mes díasemana"; el perfil rige desde cada disparo
+    hasta el disparo de otra regla cron.
+    start/end: intervalo de calendario; tiene prioridad sobre las reglas cron.
+    above: el perfil rige mientras la media de `metric` en los últimos
+    `window` s supere el umbral (y hasta que baje de above - hysteresis,
+    como mínimo `hold` s); tiene prioridad sobre todas las demás.
+    """
+    profile: str
+    cron: Optional[str] = None
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    metric: str = "temp"  # Columna del histórico
+    above: Optional[float] = None
+    hysteresis: confloat(ge=0) = 2.0
+    window: confloat(gt=0) = 300.0
+    hold: confloat(ge=0) = 600.0
+
+    @root_validator(skip_on_failure=True)
+    def validate_kind(cls, values):
+        kinds = [values['cron'] is not None, values['start'] is not None or values['end'] is not None,
+                 values['above'] is not None]
+        if sum(kinds) != 1:
+            raise ValueError(f"{values['profile']}: cada regla necesita cron, start/end o above")
+        if kinds[1] and (values['start'] is None or values['end'] is None or values['end'] <= values['start']):
+            raise ValueError(f"{values['profile']}: las reglas de calendario necesitan start < end")
+        return values
+
+class ScheduleConfig(BaseModel):
+    """Planificador de perfiles: sin reglas ni default se usa la configuración tal cual"""
+    default: Optional[str] = None  # Perfil cuando no rige ninguna regla
+    rules: List[ScheduleRule] = []
+    ramp_rate: confloat(gt=0) = 20.0   # PWM/s al pasar de un perfil a otro
+    load_check: confloat(gt=0) = 30.0  # Segundos entre evaluaciones de las reglas de carga
 
 class FanConfig(BaseModel):
-    """Configuración completa del sistema"""
-    fan1: ControlCurve
-    fan2: ControlCurve
-    alerts: AlertConfig
\ No newline at end of file
+    """Configuración completa del sistema.
+
+    fan1/fan2/channels describen la configuración clásica de dos
+    ventiladores; zones/fans permiten cualquier número de sensores y
+    ventiladores. Si se definen fans, fan1/fan2 son opcionales.
+    """
+    fan1: Optional[ControlCurve] = None
+    fan2: Optional[ControlCurve] = None
+    alerts: AlertConfig
+    channels: ChannelMap = ChannelMap()
+    zones: Dict[str, str] = {}
+    fans: Dict[str, FanChannel] = {}
+    min_write_interval: float = 0.0  # Segundos mínimos entre bajadas de PWM
+    sample_rate: confloat(gt=0, le=50) = 1.0   # Hz de lectura de sensores
+    control_rate: confloat(gt=0, le=50) = 1.0  # Hz de actuación (<= sample_rate)
+    # Curva PWM -> RPM medida por scripts/calibrate.py, por ventilador
+    calibration: Dict[str, conlist(item_type=Tuple[int, float], min_items=2)] = {}
+    stats_windows: conlist(item_type=confloat(gt=0, le=86400), min_items=1) = [60, 600, 3600]
+    hwmon_root: str = "/sys/class/hwmon"  # Otro directorio para usar un árbol simulado
+    proc_root: str = "/proc"              # stat y loadavg para el control predictivo
+    schedule: ScheduleConfig = ScheduleConfig()
+    # Ventiladores con control predictivo (el resto sigue su curva)
+    predictive: Dict[str, PredictiveSettings] = {}
+
+    @root_validator(skip_on_failure=True)
+    def validate_layout(cls, values):
+        fans, zones = values.get('fans'), values.get('zones')
+        if not fans and (values.get('fan1') is None or values.get('fan2') is None):
+            raise ValueError("Se necesitan fan1 y fan2, o una sección fans")
+        if values.get('control_rate', 1.0) > values.get('sample_rate', 1.0):
+            raise ValueError("control_rate no puede superar sample_rate")
+        for name, fan in fans.items():
+            unknown = [z for z in fan.inputs if z not in zones]
+            if unknown:
+                raise ValueError(f"{name}: zonas desconocidas {unknown}")
+        curves = {name: fan.curve for name, fan in fans.items()} if fans else \
+            {"fan1": values['fan1'], "fan2": values['fan2']}
+        for name, settings in values.get('predictive', {}).items():
+            if name not in curves:
+                raise ValueError(f"predictive para un ventilador que no existe: {name}")
+            pwms = sorted(curves[name].curve)
+            # Sin setpoint se usa el punto medio de la curva, que necesita un tramo de subida
+            if settings.setpoint is None and not any(b[1] > a[1] for a, b in zip(pwms, pwms[1:])):
+                raise ValueError(f"predictive.{name}: la curva es plana, indica setpoint")
+        return values
+
+    def control_layout(self) -> Tuple[Dict[str, str], Dict[str, FanChannel]]:
+        """Zonas y ventiladores efectivos (convierte la configuración clásica)"""
+        if self.fans:
+            return self.zones, self.fans
+        channels = self.channels
+        zones = {"temp": channels.temp}
+        fans = {
+            "fan1": FanChannel(pwm=channels.pwm1, rpm=channels.fan1, inputs=["temp"], curve=self.fan1),
+            "fan2": FanChannel(pwm=channels.pwm2, rpm=channels.fan2, inputs=["temp"], curve=self.fan2),
+        }
+        return zones, fans
+
+    def with_curves(self, curves: Dict[str, ControlCurve], **alerts) -> "FanConfig":
+        """Copia validada con otras curvas por ventilador y, opcionalmente, otros umbrales"""
+        data = self.dict()
+        for name, curve in curves.items():
+            if self.fans:
+                if name not in self.fans:
+                    raise ValueError(f"Ventilador desconocido: {name}")
+                data['fans'][name]['curve'] = curve.dict()
+            elif name in ("fan1", "fan2"):
+                data[name] = curve.dict()
+            else:
+                raise ValueError(f"Ventilador desconocido: {name}")
+        data['alerts'].update(alerts)
+        return FanConfig(**data)
+
+def default_config() -> FanConfig:
+    """Configuración por defecto (sin /etc/fancontrol.json)"""
+    return FanConfig(
+        fan1=ControlCurve(
+            min_pwm=22,
+            max_pwm=255,
+            curve=[(50, 90), (80, 255)],
+            hysteresis=3
+        ),
+        fan2=ControlCurve(
+            min_pwm=4,
+            max_pwm=100,
+            curve=[(0, 14)],
+            hysteresis=0
+        ),
+        alerts=AlertConfig(
+            temp_threshold=85,
+            rpm_threshold=500,
+            temp_critical=95
+        )
+    )
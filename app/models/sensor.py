@@ -1,9 +1,11 @@
+import json
 from pydantic import BaseModel
 from datetime import datetime
+from typing import NamedTuple
 
 class SensorData(BaseModel):
     """Modelo para datos de sensores"""
-    timestamp: int
+    timestamp: float  # Segundos epoch con precisión de milisegundos
     temp: float
     fan1_rpm: float
     fan2_rpm: float
@@ -13,4 +15,24 @@ class SensorData(BaseModel):
     @property
     def datetime(self) -> datetime:
         """Convierte timestamp a datetime"""
-        return datetime.fromtimestamp(self.timestamp)
\ No newline at end of file
+        return datetime.fromtimestamp(self.timestamp)
+
+class Sample(NamedTuple):
+    """Muestra interna del bucle, sin validación (mismo orden que las columnas del histórico).
+
+    SensorData sólo se construye en el borde de la API.
+    """
+    timestamp: float
+    temp: float
+    fan1_rpm: float
+    fan2_rpm: float
+    pwm1: int
+    pwm2: int
+
+    def to_json(self) -> bytes:
+        """JSON compacto; las lecturas fallidas (NaN) se codifican como null"""
+        text = json.dumps(self._asdict(), separators=(",", ":"))
+        return (text.replace("NaN", "null") if "NaN" in text else text).encode()
+
+    def to_model(self) -> SensorData:
+        return SensorData(**self._asdict())
@@ -1,37 +1,247 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import time
+from typing import Dict, Optional
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from ..models.sensor import SensorData
 from ..services.fan_control import FanControlService
-from ..models.config import FanConfig
+from ..models.config import ControlCurve
+from ..services.curves import CompiledCurve, as_array, summarize
+from ..services.export import DOWNSAMPLING, ENCODERS, FORMATS, negotiate
+from ..services.history import FIELDS
+from ..services.replay import HIGH_PWM
+from .deps import get_fan_control
 
 router = APIRouter()
 security = HTTPBasic()
 
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    """If-None-Match contiene el ETag (lista separada por comas, W/ o *)"""
+    if header is None:
+        return False
+    if header == etag:
+        return True
+    return any(tag.strip().removeprefix("W/") in (etag, "*") for tag in header.split(","))
+
+def _reading(value: Optional[float]) -> Optional[float]:
+    """Lectura para JSON: null si ha fallado (NaN no es JSON válido)"""
+    return None if value is None or value != value else value
+
 @router.get("/sensors", response_model=SensorData)
-async def get_sensors(fan_control: FanControlService = Depends()):
-    """Obtiene los valores actuales de los sensores"""
-    last_record = fan_control.history.get_last_record()
-    if not last_record:
-        raise HTTPException(status_code=503, detail="No hay datos disponibles")
-    return last_record
+async def get_sensors(request: Request, after: Optional[int] = Query(None, ge=0),
+                      timeout: float = Query(30.0, gt=0, le=120),
+                      fan_control: FanControlService = Depends(get_fan_control)):
+    """Obtiene los valores actuales de los sensores.
+
+    ETag por muestra (If-None-Match -> 304). Con after=<seq> espera hasta
+    timeout segundos a una muestra posterior (long-poll) y si no llega
+    responde 304.
+    """
+    # Frame codificada una vez por muestra; SensorData sólo documenta el esquema
+    hub = fan_control.hub
+    frame = hub.latest if after is None else await hub.wait(after, timeout)
+    if frame is None:
+        if after is not None and hub.latest is not None:
+            return Response(status_code=304, headers={"ETag": hub.latest.etag})
+        # Antes del primer tick: la última muestra del histórico persistido, sin ETag
+        body = fan_control.history.get_last_json()
+        if body is None:
+            raise HTTPException(status_code=503, detail="No hay datos disponibles")
+        return Response(content=body, media_type="application/json")
+    headers = {"ETag": frame.etag, "X-Seq": str(frame.seq), "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), frame.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=frame.payload, media_type="application/json", headers=headers)
+
+@router.get("/history")
+async def get_history(request: Request,
+                      start: Optional[float] = None, end: Optional[float] = None,
+                      max_points: int = Query(2000, ge=3, le=100_000),
+                      downsample: str = "lttb", field: str = "temp",
+                      cursor: Optional[float] = None,
+                      limit: Optional[int] = Query(None, ge=1, le=1_000_000),
+                      format: Optional[str] = None,
+                      fan_control: FanControlService = Depends(get_fan_control)):
+    """Exporta el histórico de [start, end] en JSON, NDJSON, CSV o binario columnar"""
+    if downsample not in DOWNSAMPLING:
+        raise HTTPException(status_code=400, detail=f"downsample debe ser uno de {DOWNSAMPLING}")
+    if field not in FIELDS[1:]:
+        raise HTTPException(status_code=400, detail=f"field debe ser uno de {FIELDS[1:]}")
+    if format is not None and format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format debe ser uno de {tuple(FORMATS)}")
+    if (limit is not None or cursor is not None) and downsample != "none":
+        raise HTTPException(status_code=400, detail="limit y cursor sólo se admiten con downsample=none")
+    fmt = format or negotiate(request.headers.get("accept"))
+    end = time.time() if end is None else end
+    start = end - 3600 if start is None else start
+
+    # Los niveles agregados sólo se modifican en el event loop; la selección de puntos,
+    # que puede recorrer muchas muestras, se hace en un executor
+    history = fan_control.history
+    history.rebuild_tiers()
+    loop = asyncio.get_running_loop()
+    export = await loop.run_in_executor(None, history.export, start, end, max_points, downsample,
+                                        field, cursor, limit)
+    headers = {"X-Resolution": repr(float(export.resolution)), "X-Count": str(len(export))}
+    if export.next_cursor is not None:
+        headers["X-Next-Cursor"] = repr(export.next_cursor)
+    return StreamingResponse(ENCODERS[fmt](export), media_type=FORMATS[fmt], headers=headers)
 
 @router.post("/control/pwm")
-async def set_pwm(fan1: int = None, fan2: int = None,
-                 fan_control: FanControlService = Depends(),
+async def set_pwm(fan1: int = None, fan2: int = None, fan: str = None, value: int = None,
+                 hold: float = 600,
+                 fan_control: FanControlService = Depends(get_fan_control),
                  credentials: HTTPBasicCredentials = Depends(security)):
-    """Establece valores PWM manualmente"""
+    """Establece valores PWM manualmente durante `hold` segundos (0 = indefinido)"""
     # Aquí iría la lógica de autenticación
-    if fan1 is not None:
-        await fan_control._apply_pwm("fan1", fan1)
-    if fan2 is not None:
-        await fan_control._apply_pwm("fan2", fan2)
+    requested = {"fan1": fan1, "fan2": fan2}
+    if fan is not None:
+        requested[fan] = value
+    for name, pwm in requested.items():
+        if pwm is None:
+            continue
+        if name not in fan_control.engine.fan_names:
+            raise HTTPException(status_code=404, detail=f"Ventilador desconocido: {name}")
+        fan_control.set_manual_pwm(name, pwm, hold)
     return {"status": "ok"}
 
+@router.post("/control/auto")
+async def set_auto(fan: str = None,
+                   fan_control: FanControlService = Depends(get_fan_control),
+                   credentials: HTTPBasicCredentials = Depends(security)):
+    """Devuelve uno o todos los ventiladores al control automático"""
+    if fan is not None and fan not in fan_control.engine.fan_names:
+        raise HTTPException(status_code=404, detail=f"Ventilador desconocido: {fan}")
+    fan_control.release_manual_pwm(fan)
+    return {"status": "ok"}
+
+@router.post("/control/curve")
+async def set_curve(curve: ControlCurve, fan: str = "fan1", save: bool = False,
+                    fan_control: FanControlService = Depends(get_fan_control),
+                    credentials: HTTPBasicCredentials = Depends(security)):
+    """Cambia la curva automática de un ventilador en caliente (save: también en el fichero)"""
+    if fan not in fan_control.engine.fan_names:
+        raise HTTPException(status_code=404, detail=f"Ventilador desconocido: {fan}")
+    try:
+        state = await fan_control.apply_config(fan_control.state.base.with_curves({fan: curve}), save)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except OSError as e:
+        # No se ha publicado nada: la curva activa no cambia
+        raise HTTPException(status_code=500, detail=e.strerror or str(e))
+    return {"status": "ok", "version": state.version}
+
+@router.get("/profiles")
+async def get_profiles(fan_control: FanControlService = Depends(get_fan_control)):
+    """Perfiles disponibles, perfil activo y estado del planificador"""
+    return {
+        "profiles": fan_control.profiles.get_available_profiles(),
+        "active": fan_control.state.profile,
+        "schedule": fan_control.state.scheduler.describe(),
+    }
+
+@router.post("/profiles/apply")
+async def apply_profile(name: str,
+                        fan_control: FanControlService = Depends(get_fan_control),
+                        credentials: HTTPBasicCredentials = Depends(security)):
+    """Aplica un perfil sobre la configuración base hasta el próximo cambio del planificador"""
+    if name not in fan_control.profiles.profiles:
+        raise HTTPException(status_code=404, detail=f"Perfil desconocido: {name}")
+    try:
+        state = await fan_control.apply_profile(name)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"status": "ok", "profile": name, "version": state.version}
+
+@router.get("/fans")
+async def get_fans(fan_control: FanControlService = Depends(get_fan_control)):
+    """Estado de todas las zonas y ventiladores del motor de control"""
+    engine = fan_control.engine
+    return {
+        "zones": {zone: _reading(temp) for zone, temp in zip(engine.zones, engine.temps)},
+        "fans": {
+            name: {
+                "target_pwm": target,
+                "pwm": fan_control.current_pwm[name],
+                "rpm": _reading(rpm),
+                "mode": "predictive" if name in engine.controllers else "curve",
+                **({"predictive": engine.controllers[name].describe()} if name in engine.controllers else {}),
+            }
+            for name, target, rpm in zip(engine.fan_names, engine.targets, engine.rpms)
+        },
+        **({"load": {"cpu": engine.load[0], "per_cpu": engine.load[1]}} if engine.predictive else {}),
+        "manual": fan_control.actuator.manual(),
+        "actuator": fan_control.actuator.stats(),
+    }
+
+@router.get("/alerts")
+async def get_alerts(fan_control: FanControlService = Depends(get_fan_control)):
+    """Reglas activas, últimas transiciones y estado de las notificaciones"""
+    alerts = fan_control.alerts
+    return {
+        "active": alerts.active(),
+        "recent": list(alerts.recent),
+        "notifications": alerts.notifier.stats(),
+    }
+
+@router.get("/analytics")
+async def get_analytics(fan_control: FanControlService = Depends(get_fan_control)):
+    """Estadísticas deslizantes por canal y detectores de anomalías"""
+    return fan_control.analytics.summary()
+
+@router.get("/metrics")
+async def get_metrics(fan_control: FanControlService = Depends(get_fan_control)):
+    """Métricas en formato de exposición de Prometheus"""
+    return Response(
+        content=fan_control.metrics.render(fan_control.collect_metrics),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
 @router.get("/diag")
-async def system_diagnostics(fan_control: FanControlService = Depends()):
+async def system_diagnostics(fan_control: FanControlService = Depends(get_fan_control)):
     """Diagnóstico del sistema"""
     return {
         "sensors_accessible": await fan_control.check_sensors_access(),
         "pwm_accessible": await fan_control.check_pwm_access(),
-        "current_config": fan_control.config.dict()
-    }
\ No newline at end of file
+        "current_config": fan_control.config.dict(
+            exclude={"alerts": {"email": {"password"}, "telegram": {"token"}, "webhook": {"headers"}}}
+        ),
+        "hwmon": fan_control.discovery.index.describe(),
+        "config": fan_control.config_status(),
+    }
+
+@router.post("/control/curve/preview")
+async def preview_curve(curve: ControlCurve, fan: str = "fan1", days: float = 30,
+                        fan_control: FanControlService = Depends(get_fan_control)):
+    """Simula una curva sobre las temperaturas registradas sin aplicarla (en un executor)"""
+    current = fan_control.curves.get(fan)
+    if current is None:
+        raise HTTPException(status_code=404, detail=f"Ventilador desconocido: {fan}")
+    proposed = CompiledCurve(curve)
+    since = time.time() - days * 86400
+
+    def simulate():
+        temps = as_array(fan_control.history.get_columns(since=since, fields=("temp",))["temp"])
+        return {
+            "samples": len(temps),
+            "current": summarize(current.evaluate_many(temps)),
+            "proposed": summarize(proposed.evaluate_many(temps)),
+        }
+
+    return await asyncio.get_running_loop().run_in_executor(None, simulate)
+
+@router.post("/control/replay")
+async def replay_history(curves: Dict[str, ControlCurve] = Body({}), start: Optional[float] = None,
+                         end: Optional[float] = None, profile: Optional[str] = None,
+                         temp_critical: Optional[float] = None,
+                         high_pwm: int = Query(HIGH_PWM, ge=1, le=255),
+                         max_points: int = Query(1000, ge=0, le=10000),
+                         fan_control: FanControlService = Depends(get_fan_control)):
+    """Reproduce el histórico (por defecto, las últimas 24 h) con otras curvas sin aplicarlas"""
+    end = time.time() if end is None else end
+    start = end - 86400 if start is None else start
+    try:
+        return await fan_control.replay(start, end, curves, profile, temp_critical, high_pwm, max_points)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
@@ -0,0 +1,58 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, WebSocket
+from fastapi.responses import StreamingResponse
+from ..services.cluster import ClusterAggregator
+from ..services.export import DOWNSAMPLING
+from .deps import get_cluster
+from .ws import event_generator, websocket_feed
+
+router = APIRouter(prefix="/cluster")
+
+
+@router.get("")
+async def get_cluster_view(cluster: ClusterAggregator = Depends(get_cluster)):
+    """Última muestra de cada nodo y resumen del clúster"""
+    return cluster.snapshot()
+
+
+@router.get("/peers")
+async def get_peers(cluster: ClusterAggregator = Depends(get_cluster)):
+    """Estado de las conexiones con los nodos"""
+    return cluster.stats()
+
+
+@router.get("/stream")
+async def stream_cluster(cluster: ClusterAggregator = Depends(get_cluster)):
+    """Muestras de todos los nodos por Server-Sent Events ({"node", "sample"})"""
+    return StreamingResponse(
+        event_generator(cluster.hub),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "Connection": "keep-alive"}
+    )
+
+
+@router.websocket("/ws")
+async def websocket_cluster(websocket: WebSocket, cluster: ClusterAggregator = Depends(get_cluster)):
+    """Mismo feed que /cluster/stream por WebSocket"""
+    await websocket_feed(websocket, cluster.hub)
+
+
+@router.get("/history")
+async def get_cluster_history(start: Optional[float] = None, end: Optional[float] = None,
+                              max_points: int = Query(2000, ge=3, le=100_000),
+                              downsample: str = "lttb", field: str = "temp",
+                              nodes: Optional[str] = None,
+                              cluster: ClusterAggregator = Depends(get_cluster)):
+    """Histórico de todos los nodos (o de `nodes`, separados por comas) consultados en paralelo"""
+    if downsample not in DOWNSAMPLING:
+        raise HTTPException(status_code=400, detail=f"downsample debe ser uno de {DOWNSAMPLING}")
+    selected = [name.strip() for name in nodes.split(",")] if nodes else None
+    unknown = [name for name in selected or () if name not in cluster.peers]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Nodos desconocidos: {unknown}")
+    params = {"max_points": str(max_points), "downsample": downsample, "field": field}
+    if start is not None:
+        params["start"] = repr(start)
+    if end is not None:
+        params["end"] = repr(end)
+    return Response(content=await cluster.history(params, selected), media_type="application/json")
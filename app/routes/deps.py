@@ -0,0 +1,35 @@
+from fastapi import HTTPException, WebSocketException, status
+from starlette.requests import HTTPConnection
+from ..services.cluster import ClusterAggregator
+from ..services.container import ServiceContainer
+from ..services.fan_control import FanControlService
+
+# Dependencias async: FastAPI ejecuta las síncronas en el threadpool (un salto de hilo por petición)
+
+
+def _unavailable(connection: HTTPConnection, status_code: int, detail: str) -> Exception:
+    """Error de una dependencia: HTTPException o, en un WebSocket, cierre con código 1008"""
+    if connection.scope["type"] == "websocket":
+        return WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason=detail)
+    return HTTPException(status_code=status_code, detail=detail)
+
+
+async def get_services(connection: HTTPConnection) -> ServiceContainer:
+    """Contenedor creado en el arranque (válido para peticiones HTTP y WebSocket)"""
+    services = getattr(connection.app.state, "services", None)
+    if services is None:
+        raise _unavailable(connection, 503, "Servicio no iniciado")
+    return services
+
+
+async def get_fan_control(connection: HTTPConnection) -> FanControlService:
+    """Instancia única del servicio de control"""
+    return (await get_services(connection)).fan_control
+
+
+async def get_cluster(connection: HTTPConnection) -> ClusterAggregator:
+    """Agregador del modo clúster (404 si FANCONTROL_PEERS no está definido)"""
+    cluster = (await get_services(connection)).cluster
+    if cluster is None:
+        raise _unavailable(connection, 404, "Modo agregador desactivado (FANCONTROL_PEERS)")
+    return cluster
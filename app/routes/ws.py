@@ -1,35 +1,49 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect
 from fastapi.responses import StreamingResponse
-import asyncio
-import json
+from ..services.broadcast import BroadcastHub
 from ..services.fan_control import FanControlService
+from .deps import get_fan_control
 
 router = APIRouter()
 
 
-async def event_generator(fan_control: FanControlService):
+async def event_generator(hub: BroadcastHub):
     """Generador de eventos Server-Sent Events"""
-    while True:
-        try:
-            # Obtener datos actuales
-            last_record = fan_control.history.get_last_record()
-            if last_record:
-                yield f"data: {json.dumps(last_record)}\n\n"
-
-            # Esperar 1 segundo
-            await asyncio.sleep(1)
-        except asyncio.CancelledError:
-            break
-        except Exception as e:
-            print(f"SSE Error: {e}")
-            await asyncio.sleep(5)
+    queue = hub.subscribe()
+    try:
+        while True:
+            # Cada frame llega ya codificado desde el bucle de monitorización
+            frame = await queue.get()
+            yield frame.sse
+    finally:
+        hub.unsubscribe(queue)
+
+
+async def websocket_feed(websocket: WebSocket, hub: BroadcastHub):
+    """Envía los frames de un hub por un WebSocket hasta que el cliente se desconecta"""
+    await websocket.accept()
+    queue = hub.subscribe()
+    try:
+        while True:
+            frame = await queue.get()
+            await websocket.send_text(frame.text)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        hub.unsubscribe(queue)
 
 
 @router.get("/stream")
-async def stream_data(fan_control: FanControlService = Depends()):
+async def stream_data(fan_control: FanControlService = Depends(get_fan_control)):
     """Endpoint para streaming Server-Sent Events"""
     return StreamingResponse(
-        event_generator(fan_control),
+        event_generator(fan_control.hub),
         media_type="text/event-stream",
         headers={"Cache-Control": "no-cache", "Connection": "keep-alive"}
-    )
\ No newline at end of file
+    )
+
+
+@router.websocket("/ws")
+async def websocket_data(websocket: WebSocket, fan_control: FanControlService = Depends(get_fan_control)):
+    """Endpoint WebSocket con los mismos datos que /stream"""
+    await websocket_feed(websocket, fan_control.hub)
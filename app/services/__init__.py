@@ -1,11 +1,25 @@
-from .fan_control import FanControlService
-from .history import HistoryService
-from .alerts import AlertService
-from .profiles import ProfileService
+from importlib import import_module
+
+# Importación bajo demanda: quien sólo necesita el control no carga el resto
+_SERVICES = {
+    "FanControlService": ".fan_control",
+    "HistoryService": ".history",
+    "AlertService": ".alerts",
+    "ProfileService": ".profiles",
+    "ServiceContainer": ".container",
+}
 
 __all__ = [
     "FanControlService",
     "HistoryService",
     "AlertService",
-    "ProfileService"
-]
\ No newline at end of file
+    "ProfileService",
+    "ServiceContainer"
+]
+
+
+def __getattr__(name):
+    module = _SERVICES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(import_module(module, __name__), name)
@@ -0,0 +1,191 @@
+import time
+from array import array
+from typing import Callable, Dict, Optional, Sequence
+
+# Prioridad de las fuentes de peticiones PWM (mayor gana)
+AUTO, MANUAL, WATCHDOG = 0, 1, 2
+SOURCES = {"auto": AUTO, "manual": MANUAL, "watchdog": WATCHDOG}
+
+
+class PwmActuator:
+    """Agrupa las peticiones PWM y escribe como mucho una vez por canal y tick.
+
+    Reglas de prioridad por canal: watchdog > manual > automático.
+    - watchdog: se escribe siempre en el siguiente flush.
+    - manual: persiste durante `hold` segundos (0 = hasta liberarlo) e
+      ignora la histéresis; anula las peticiones automáticas.
+    - automático: las subidas se aplican inmediatamente; las bajadas sólo
+      si la temperatura ha bajado al menos la histéresis de la curva desde
+      la última escritura y ha pasado min_interval.
+    Las peticiones que no cambian el valor escrito no llegan al hardware.
+    Tras un cambio de perfil (start_ramp) las peticiones automáticas se
+    acercan a su objetivo a ramp_rate PWM/s, sin histéresis ni min_interval.
+    """
+
+    def __init__(self, hwmon, channels: Sequence[str], min_pwm: Sequence[int],
+                 hysteresis: Sequence[float], min_interval: float = 0.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.hwmon = hwmon
+        self.clock = clock
+        self.channels = tuple(channels)
+        self.index = {name: k for k, name in enumerate(self.channels)}
+        self.min_interval = min_interval
+        n = len(self.channels)
+        self.min_pwm = array('B', min_pwm)
+        self.hysteresis = array('d', hysteresis)
+        self.written = array('h', [-1] * n)        # -1: valor desconocido
+        self.ref_temp = array('d', bytes(8 * n))   # Temp. de la última escritura auto
+        self.last_write = array('d', bytes(8 * n))
+        self._value = array('h', [-1] * n)         # Petición pendiente del tick
+        self._priority = array('b', [-1] * n)
+        self._temp = array('d', bytes(8 * n))
+        self._manual = array('h', [-1] * n)
+        self._manual_until = array('d', bytes(8 * n))
+        self.ramp_rate = 0.0
+        self.ramp_start = 0.0
+        self.ramp_until = 0.0
+        self.writes_issued = 0
+        self.writes_suppressed = 0
+        self.write_errors = 0
+
+    def start_ramp(self, rate: float):
+        """Suaviza el paso a nuevos objetivos durante el tiempo de recorrer todo el rango"""
+        self.ramp_rate = rate
+        self.ramp_start = self.clock()
+        self.ramp_until = self.ramp_start + 255 / rate
+
+    def reconfigure(self, channels: Sequence[str], min_pwm: Sequence[int],
+                    hysteresis: Sequence[float], min_interval: float = 0.0):
+        """Aplica nuevos límites y canales conservando el estado de los que siguen"""
+        self.min_interval = min_interval
+        channels = tuple(channels)
+        if channels == self.channels:
+            self.min_pwm = array('B', min_pwm)
+            self.hysteresis = array('d', hysteresis)
+            return
+        old = [self.index.get(name) for name in channels]
+
+        def carry(values: array, default) -> array:
+            return array(values.typecode, [default if k is None else values[k] for k in old])
+
+        self.written = carry(self.written, -1)
+        self.ref_temp = carry(self.ref_temp, 0.0)
+        self.last_write = carry(self.last_write, 0.0)
+        self._manual = carry(self._manual, -1)
+        self._manual_until = carry(self._manual_until, 0.0)
+        n = len(channels)
+        self._value = array('h', [-1] * n)
+        self._priority = array('b', [-1] * n)
+        self._temp = array('d', bytes(8 * n))
+        self.channels = channels
+        self.index = {name: k for k, name in enumerate(channels)}
+        self.min_pwm = array('B', min_pwm)
+        self.hysteresis = array('d', hysteresis)
+
+    # --- Peticiones (síncronas, sin locks) -----------------------------------
+
+    def request(self, name: str, value: int, source: str = "auto", temp: float = 0.0):
+        """Registra una petición para el próximo flush; gana la de mayor prioridad"""
+        k = self.index[name]
+        priority = SOURCES[source]
+        if priority >= self._priority[k]:
+            self._value[k] = max(self.min_pwm[k], min(int(value), 255))
+            self._priority[k] = priority
+            self._temp[k] = temp
+
+    def set_manual(self, name: str, value: int, hold: float = 600.0):
+        """Fija un valor manual que anula el control automático"""
+        k = self.index[name]
+        self._manual[k] = max(self.min_pwm[k], min(int(value), 255))
+        self._manual_until[k] = self.clock() + hold if hold > 0 else float("inf")
+
+    def release_manual(self, name: Optional[str] = None):
+        """Devuelve uno o todos los canales al control automático"""
+        for k in ([self.index[name]] if name else range(len(self.channels))):
+            self._manual[k] = -1
+
+    def manual(self) -> Dict[str, int]:
+        return {name: self._manual[k] for k, name in enumerate(self.channels) if self._manual[k] >= 0}
+
+    # --- Escritura -----------------------------------------------------------
+
+    def _resolve(self, k: int, now: float):
+        """(valor, prioridad) a escribir en el canal k, o None si no hay que escribir"""
+        priority, value = self._priority[k], self._value[k]
+        manual = self._manual[k]
+        if manual >= 0:
+            if now >= self._manual_until[k]:
+                self._manual[k] = -1
+            elif priority < WATCHDOG:
+                value, priority = manual, MANUAL
+        if priority < 0:
+            return None
+
+        current = self.written[k]
+        if value == current:
+            return None
+        if priority == AUTO and current >= 0 and now < self.ramp_until:
+            elapsed = now - max(self.last_write[k], self.ramp_start)
+            step = max(1, int(self.ramp_rate * elapsed))
+            return max(current - step, min(current + step, value)), priority
+        if priority == AUTO and 0 <= value < current:
+            # Bajada: respetar histéresis (°C) e intervalo mínimo
+            if self._temp[k] > self.ref_temp[k] - self.hysteresis[k]:
+                return None
+            if now - self.last_write[k] < self.min_interval:
+                return None
+        return value, priority
+
+    def needs_flush(self) -> bool:
+        """Hay una petición del watchdog o una subida pendiente (no deben esperar)"""
+        for k in range(len(self.channels)):
+            priority = self._priority[k]
+            if priority == WATCHDOG and self._value[k] != self.written[k]:
+                return True
+            if priority == AUTO and self._value[k] > self.written[k] and self._manual[k] < 0:
+                return True
+        return False
+
+    async def flush(self) -> Dict[str, int]:
+        """Escribe en un lote los canales que han cambiado; devuelve lo escrito"""
+        now = self.clock()
+        pending: Dict[str, int] = {}
+        sources: Dict[str, int] = {}
+        for k, name in enumerate(self.channels):
+            requested = self._priority[k] >= 0 or self._manual[k] >= 0
+            resolved = self._resolve(k, now)
+            if resolved is not None:
+                pending[name], sources[name] = resolved
+            elif requested:
+                self.writes_suppressed += 1
+
+        errors = await self.hwmon.write(pending) if pending else {}
+        for name, value in pending.items():
+            k = self.index[name]
+            if name in errors:
+                self.write_errors += 1
+                continue
+            self.written[k] = value
+            self.last_write[k] = now
+            # Tras una escritura manual o del watchdog, el automático puede bajar libremente
+            self.ref_temp[k] = self._temp[k] if sources[name] == AUTO else float("inf")
+            self.writes_issued += 1
+
+        # Limpiar las peticiones del tick
+        for k in range(len(self.channels)):
+            self._priority[k] = -1
+        return {name: value for name, value in pending.items() if name not in errors}
+
+    def value(self, name: str) -> int:
+        """Último valor escrito en el hardware (0 si aún no se conoce)"""
+        return max(self.written[self.index[name]], 0)
+
+    def values(self) -> Dict[str, int]:
+        return {name: max(v, 0) for name, v in zip(self.channels, self.written)}
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "writes_issued": self.writes_issued,
+            "writes_suppressed": self.writes_suppressed,
+            "write_errors": self.write_errors,
+        }
@@ -1,47 +1,317 @@
+import asyncio
+import json
 import logging
-from typing import Optional
-from datetime import datetime, timedelta
-from ..models.sensor import SensorData
-from ..models.config import AlertConfig
+import math
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple
+from ..models.config import AlertConfig, AlertRule
+
+
+class Alert:
+    """Transición de una regla: "firing" al activarse, "resolved" al recuperarse"""
+
+    __slots__ = ("rule", "metric", "severity", "state", "value", "timestamp", "message", "notify")
+
+    def __init__(self, rule: AlertRule, state: str, value: float, timestamp: float, message: str):
+        self.rule = rule.name
+        self.metric = rule.metric
+        self.severity = rule.severity
+        self.state = state
+        self.value = value
+        self.timestamp = timestamp
+        self.message = message
+        self.notify = rule.notify
+
+    def to_dict(self) -> Dict:
+        return {
+            "rule": self.rule, "metric": self.metric, "severity": self.severity,
+            "state": self.state, "value": self.value, "timestamp": self.timestamp,
+            "message": self.message,
+        }
+
+
+class _RuleState:
+    """Estado incremental de una regla; update es O(1) amortizado por muestra"""
+
+    __slots__ = ("rule", "cooldown", "since", "window", "ref_value", "active",
+                 "notified", "last_notified", "last_value")
+
+    def __init__(self, rule: AlertRule, cooldown: float):
+        self.rule = rule
+        self.cooldown = cooldown
+        self.since: Optional[float] = None   # Inicio de la condición actual
+        self.window: Deque[Tuple[float, float]] = deque()
+        self.ref_value: Optional[float] = None
+        self.active = False
+        self.notified = False  # La activación actual se ha notificado
+        self.last_notified = -math.inf
+        self.last_value = 0.0
+
+    def update(self, t: float, value: float) -> bool:
+        """Incorpora una muestra y devuelve si la condición se cumple"""
+        rule = self.rule
+        kind = rule.kind
+        self.last_value = value
+        if kind == "above" or kind == "below":
+            hit = value > rule.threshold if kind == "above" else value < rule.threshold
+            if not hit:
+                self.since = None
+                return False
+            if self.since is None:
+                self.since = t
+            return t - self.since >= rule.duration
+
+        if kind == "rate":
+            window = self.window
+            window.append((t, value))
+            while t - window[0][0] > rule.duration:
+                window.popleft()
+            t0, v0 = window[0]
+            return t > t0 and abs(value - v0) / (t - t0) >= rule.threshold
+
+        # stuck: sin cambios mayores que threshold durante duration
+        if self.ref_value is None or abs(value - self.ref_value) > rule.threshold:
+            self.ref_value, self.since = value, t
+            return False
+        return t - self.since >= rule.duration
+
+    def describe(self) -> str:
+        rule, value = self.rule, self.last_value
+        if rule.kind == "above":
+            return f"{rule.metric}={value:g} por encima de {rule.threshold:g} durante {rule.duration:g}s"
+        if rule.kind == "below":
+            return f"{rule.metric}={value:g} por debajo de {rule.threshold:g} durante {rule.duration:g}s"
+        if rule.kind == "rate":
+            return f"{rule.metric} varía más de {rule.threshold:g}/s (ventana {rule.duration:g}s)"
+        return f"{rule.metric} sin cambios ({value:g}) durante {rule.duration:g}s"
+
+
+def default_rules(config: AlertConfig, zones: Iterable[str], fans: Iterable[str],
+                  calibrated: Iterable[str] = ()) -> List[AlertRule]:
+    """Reglas clásicas derivadas de los umbrales de AlertConfig.
+
+    El fallo por RPM bajas sólo se vigila en el primer ventilador (la regla
+    original) y en los calibrados, cuyo min_pwm garantiza que giran: los
+    demás pueden estar parados a propósito (fan2 a PWM 14 por defecto).
+    airflow sólo se crea para la primera zona, la única que puntúa
+    StreamAnalytics.
+    """
+    calibrated = set(calibrated)
+    rules = []
+    for k, zone in enumerate(zones):
+        rules.append(AlertRule(name=f"temp_critical:{zone}", metric=zone, kind="above",
+                               threshold=config.temp_critical, severity="critical"))
+        rules.append(AlertRule(name=f"temp_high:{zone}", metric=zone, kind="above",
+                               threshold=config.temp_threshold))
+        if k == 0:
+            rules.append(AlertRule(name=f"airflow:{zone}", metric=f"{zone}_rise_score", kind="above",
+                                   threshold=config.rise_score, duration=30))
+    for k, fan in enumerate(fans):
+        if k == 0 or fan in calibrated:
+            rules.append(AlertRule(name=f"fan_failure:{fan}", metric=f"{fan}_rpm", kind="below",
+                                   threshold=config.rpm_threshold, duration=config.rpm_duration,
+                                   severity="critical"))
+        rules.append(AlertRule(name=f"fan_degraded:{fan}", metric=f"{fan}_rpm_deviation", kind="below",
+                               threshold=-config.rpm_deviation, duration=60))
+    return rules
 
 
 class AlertService:
-    def __init__(self, config: AlertConfig):
+    """Motor de reglas de alerta sobre el flujo de muestras.
+
+    Cada regla mantiene su propio estado de ventana, deduplicación y
+    cooldown, de modo que una alerta de temperatura no silencia un fallo de
+    ventilador. evaluate es síncrono y barato; las notificaciones se encolan
+    en un Notifier que las envía fuera del bucle de control.
+    """
+
+    def __init__(self, config: AlertConfig, zones: Iterable[str] = ("temp",),
+                 fans: Iterable[str] = ("fan1", "fan2"), calibrated: Iterable[str] = ()):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        rules = default_rules(config, zones, fans, calibrated) if config.default_rules else []
+        rules += config.rules
+        self._states = [
+            _RuleState(rule, config.cooldown if rule.cooldown is None else rule.cooldown)
+            for rule in rules
+        ]
+        self.recent: Deque[Dict] = deque(maxlen=50)
+        self.notifier = Notifier(config)
+
+    @property
+    def rules(self) -> List[AlertRule]:
+        return [state.rule for state in self._states]
+
+    def evaluate(self, timestamp: float, values: Dict[str, float]) -> List[Alert]:
+        """Evalúa todas las reglas con una muestra; devuelve las transiciones"""
+        alerts: List[Alert] = []
+        for state in self._states:
+            value = values.get(state.rule.metric)
+            if value is None or value != value:  # Sin dato o NaN: no altera las ventanas
+                continue
+            hit = state.update(timestamp, value)
+            if hit and not state.active:
+                state.active = True
+                # Dedup: una notificación por activación, y no más de una por cooldown
+                state.notified = timestamp - state.last_notified >= state.cooldown
+                if state.notified:
+                    state.last_notified = timestamp
+                    alerts.append(Alert(state.rule, "firing", value, timestamp, state.describe()))
+            elif not hit and state.active:
+                state.active = False
+                if state.notified:
+                    alerts.append(Alert(state.rule, "resolved", value, timestamp,
+                                        f"{state.rule.metric}={value:g} recuperado"))
+
+        for alert in alerts:
+            self.logger.warning(f"ALERTA [{alert.severity}] {alert.rule}: {alert.message}")
+            self.recent.append(alert.to_dict())
+            self.notifier.submit(alert)
+        return alerts
+
+    def active(self) -> List[Dict]:
+        return [
+            {"rule": s.rule.name, "metric": s.rule.metric, "severity": s.rule.severity,
+             "value": s.last_value}
+            for s in self._states if s.active
+        ]
+
+    async def start(self):
+        await self.notifier.start()
+
+    async def stop(self):
+        await self.notifier.stop()
+
+
+class Notifier:
+    """Cola asíncrona de notificaciones con reintentos.
+
+    Los envíos (SMTP y HTTP bloqueantes) se ejecutan en un pool de hilos
+    propio desde una tarea independiente; submit nunca bloquea y, si la cola
+    está llena, descarta la notificación más antigua.
+    """
+
+    def __init__(self, config: AlertConfig, queue_size: int = 100, timeout: float = 10.0,
+                 backoff: float = 1.0):
         self.config = config
-        self.last_alert_time: Optional[datetime] = None
+        self.timeout = timeout
+        self.backoff = backoff
         self.logger = logging.getLogger(__name__)
+        self.senders: Dict[str, Callable[[Alert], None]] = {}
+        # Correo y Telegram necesitan su sección y su interruptor (email_notifications, ...)
+        if config.email and config.email_notifications:
+            self.senders["email"] = self._send_email
+        if config.telegram and config.telegram_notifications:
+            self.senders["telegram"] = self._send_telegram
+        if config.webhook:
+            self.senders["webhook"] = self._send_webhook
+        self._queue: Deque[Alert] = deque(maxlen=queue_size)
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
 
-    def check_temp_alert(self, temp: float) -> bool:
-        """Verifica alerta de temperatura"""
-        if temp >= self.config.temp_critical:
-            self._send_alert(f"Temperatura CRÍTICA: {temp}°C")
-            return True
-        elif temp >= self.config.temp_threshold:
-            self._send_alert(f"Temperatura ALTA: {temp}°C")
-            return True
-        return False
-
-    def check_rpm_alert(self, rpm: float, fan_name: str) -> bool:
-        """Verifica alerta de RPM bajas"""
-        if rpm <= self.config.rpm_threshold:
-            self._send_alert(f"RPM BAJAS en {fan_name}: {rpm} RPM")
-            return True
-        return False
-
-    def _send_alert(self, message: str):
-        """Envía una alerta (implementación básica)"""
-        now = datetime.now()
-
-        # Evitar spam de alertas
-        if self.last_alert_time and (now - self.last_alert_time) < timedelta(minutes=5):
+    def submit(self, alert: Alert):
+        """Encola una alerta para todos sus notificadores (no bloquea)"""
+        if not self.senders:
             return
+        if len(self._queue) == self._queue.maxlen:
+            self.dropped += 1
+        self._queue.append(alert)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self):
+        if self._task is None and self.senders:
+            self._wakeup = asyncio.Event()
+            self._executor = ThreadPoolExecutor(max_workers=len(self.senders), thread_name_prefix="notify")
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _run(self):
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            alert = self._queue.popleft()
+            names = alert.notify or list(self.senders)
+            await asyncio.gather(*(self._deliver(name, alert) for name in names if name in self.senders))
+
+    async def _deliver(self, name: str, alert: Alert):
+        """Envía por un notificador con reintentos y backoff exponencial"""
+        loop = asyncio.get_running_loop()
+        send = self.senders[name]
+        for attempt in range(self.config.retries + 1):
+            try:
+                await asyncio.wait_for(loop.run_in_executor(self._executor, send, alert), self.timeout)
+                self.sent += 1
+                return
+            except Exception as e:
+                self.logger.warning(f"Notificación {name} fallida (intento {attempt + 1}): {e}")
+                if attempt < self.config.retries:
+                    await asyncio.sleep(self.backoff * 2 ** attempt)
+        self.failed += 1
+
+    @staticmethod
+    def _format(alert: Alert) -> str:
+        state = "RESUELTA" if alert.state == "resolved" else alert.severity.upper()
+        when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(alert.timestamp))
+        return f"[{state}] {alert.rule}: {alert.message} ({when})"
+
+    # smtplib, email y urllib se importan en el hilo del envío: no retrasan el arranque
+
+    def _send_email(self, alert: Alert):
+        import smtplib
+        from email.message import EmailMessage
+
+        settings = self.config.email
+        msg = EmailMessage()
+        msg["Subject"] = f"FanControl: {alert.rule} ({alert.state})"
+        msg["From"] = settings.sender
+        msg["To"] = ", ".join(settings.to)
+        msg.set_content(self._format(alert))
+        with smtplib.SMTP(settings.host, settings.port, timeout=self.timeout) as smtp:
+            if settings.starttls:
+                smtp.starttls()
+            if settings.username:
+                smtp.login(settings.username, settings.password or "")
+            smtp.send_message(msg)
+
+    def _post(self, url: str, payload: Dict, headers: Optional[Dict[str, str]] = None):
+        import urllib.request
+
+        request = urllib.request.Request(
+            url, data=json.dumps(payload).encode(), method="POST",
+            headers={"Content-Type": "application/json", **(headers or {})},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
 
-        self.last_alert_time = now
-        self.logger.warning(f"ALERTA: {message}")
+    def _send_telegram(self, alert: Alert):
+        settings = self.config.telegram
+        self._post(f"{settings.api_url.rstrip('/')}/bot{settings.token}/sendMessage",
+                   {"chat_id": settings.chat_id, "text": self._format(alert)})
 
-        # Aquí se podría implementar notificación por email/Telegram
-        if self.config.email_notifications:
-            pass  # Implementar envío de email
+    def _send_webhook(self, alert: Alert):
+        settings = self.config.webhook
+        self._post(settings.url, alert.to_dict(), settings.headers)
 
-        if self.config.telegram_notifications:
-            pass  # Implementar envío a Telegram
\ No newline at end of file
+    def stats(self) -> Dict[str, int]:
+        return {"sent": self.sent, "failed": self.failed, "dropped": self.dropped,
+                "queued": len(self._queue)}
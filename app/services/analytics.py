@@ -0,0 +1,310 @@
+import math
+from array import array
+from bisect import bisect_right
+from collections import deque
+from typing import Deque, Dict, Optional, Sequence, Tuple
+from ..models.sensor import Sample
+
+# Canales del histórico analizados y su PWM asociado (el que los controla)
+RPM_CHANNELS: Dict[str, str] = {"fan1_rpm": "pwm1", "fan2_rpm": "pwm2"}
+TEMP_CHANNELS: Dict[str, str] = {"temp": "pwm1"}
+PWM_BUCKETS = 32  # Resolución de las líneas base por PWM (8 pasos de PWM por bucket)
+_INDEX = {name: i for i, name in enumerate(Sample._fields)}
+
+
+class _Window:
+    """Media, varianza y mín/máx de las últimas n muestras en O(1) amortizado.
+
+    La media y la varianza se deslizan con la variante de Welford para
+    ventanas (añadir y retirar en un paso); mín/máx usan colas monótonas.
+    """
+
+    __slots__ = ("n", "size", "mean", "m2", "_min", "_max")
+
+    def __init__(self, n: int):
+        self.n = n
+        self.size = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self._min: Deque[Tuple[int, float]] = deque()
+        self._max: Deque[Tuple[int, float]] = deque()
+
+    def update(self, i: int, x: float, old: Optional[float]):
+        if old is None:
+            self.size += 1
+            delta = x - self.mean
+            self.mean += delta / self.size
+            self.m2 += delta * (x - self.mean)
+        else:
+            mean = self.mean
+            self.mean = mean + (x - old) / self.n
+            self.m2 = max(0.0, self.m2 + (x - old) * (x - self.mean + old - mean))
+
+        start = i - self.n + 1
+        lo, hi = self._min, self._max
+        while lo and lo[-1][1] >= x:
+            lo.pop()
+        lo.append((i, x))
+        if lo[0][0] < start:
+            lo.popleft()
+        while hi and hi[-1][1] <= x:
+            hi.pop()
+        hi.append((i, x))
+        if hi[0][0] < start:
+            hi.popleft()
+
+    def summary(self) -> Dict[str, float]:
+        if not self.size:
+            return {"samples": 0}
+        return {
+            "samples": self.size,
+            "mean": self.mean,
+            "std": math.sqrt(self.m2 / self.size),
+            "min": self._min[0][1],
+            "max": self._max[0][1],
+        }
+
+
+class ChannelStats:
+    """Estadísticas deslizantes de un canal sobre varias ventanas y una EWMA.
+
+    Todas las ventanas comparten un único anillo del tamaño de la mayor, así
+    que el coste por muestra depende del número de ventanas, no de su
+    longitud ni del histórico retenido.
+    """
+
+    __slots__ = ("windows", "ewma", "alpha", "_ring", "_count")
+
+    def __init__(self, windows: Sequence[int], alpha: float):
+        self.windows = [_Window(max(1, n)) for n in windows]
+        self.alpha = alpha
+        self.ewma: Optional[float] = None
+        self._ring = array('d', bytes(8 * max(w.n for w in self.windows)))
+        self._count = 0
+
+    def update(self, x: float):
+        ring, i = self._ring, self._count
+        size = len(ring)
+        for w in self.windows:
+            w.update(i, x, ring[(i - w.n) % size] if i >= w.n else None)
+        ring[i % size] = x
+        self._count = i + 1
+        self.ewma = x if self.ewma is None else self.ewma + self.alpha * (x - self.ewma)
+
+    def summary(self, labels: Sequence[str]) -> Dict:
+        return {
+            "ewma": self.ewma,
+            "windows": {label: w.summary() for label, w in zip(labels, self.windows)},
+        }
+
+
+class RpmModel:
+    """Curva PWM -> RPM esperada (interpolación lineal entre puntos de calibración)"""
+
+    __slots__ = ("pwms", "rpms")
+
+    def __init__(self, points: Sequence[Tuple[int, float]]):
+        points = sorted(points)
+        self.pwms = tuple(float(p) for p, _ in points)
+        self.rpms = tuple(float(r) for _, r in points)
+
+    def __call__(self, pwm: float) -> float:
+        pwms, rpms = self.pwms, self.rpms
+        if pwm <= pwms[0]:
+            return rpms[0]
+        if pwm >= pwms[-1]:
+            return rpms[-1]
+        i = bisect_right(pwms, pwm) - 1
+        return rpms[i] + (rpms[i + 1] - rpms[i]) * (pwm - pwms[i]) / (pwms[i + 1] - pwms[i])
+
+
+class _RpmDetector:
+    """Desviación relativa de las RPM frente a lo esperado para el PWM actual.
+
+    Sin modelo de calibración, la línea base se aprende por bucket de PWM
+    durante las primeras `learn` muestras estables de cada bucket y después
+    se congela, para que una degradación lenta no se absorba en ella.
+    """
+
+    __slots__ = ("model", "settle", "learn", "alpha", "deviation", "expected",
+                 "_pwm", "_stable", "_base", "_base_n")
+
+    def __init__(self, model: Optional[RpmModel], settle: int, learn: int, alpha: float):
+        self.model = model
+        self.settle = settle
+        self.learn = learn
+        self.alpha = alpha
+        self.deviation: Optional[float] = None  # EWMA de (rpm - esperado) / esperado
+        self.expected: Optional[float] = None
+        self._pwm = -1.0
+        self._stable = 0
+        self._base = array('d', bytes(8 * PWM_BUCKETS))
+        self._base_n = array('I', bytes(4 * PWM_BUCKETS))
+
+    def update(self, pwm: float, rpm: float):
+        # Las RPM tardan en seguir a un cambio de PWM: esperar a que se asienten
+        if pwm != self._pwm:
+            self._pwm, self._stable = pwm, 0
+            return
+        self._stable += 1
+        if self._stable < self.settle or pwm <= 0:
+            return
+
+        if self.model is not None:
+            expected = self.model(pwm)
+        else:
+            b = min(int(pwm) * PWM_BUCKETS // 256, PWM_BUCKETS - 1)
+            n = self._base_n[b]
+            if n < self.learn:
+                self._base_n[b] = n + 1
+                self._base[b] += (rpm - self._base[b]) / (n + 1)
+                return
+            expected = self._base[b]
+        if expected < 1.0:
+            return
+        self.expected = expected
+        error = (rpm - expected) / expected
+        self.deviation = error if self.deviation is None else self.deviation + self.alpha * (error - self.deviation)
+
+
+class _RiseDetector:
+    """Puntuación de la velocidad de subida de temperatura frente a lo habitual para el PWM.
+
+    Mantiene por bucket de PWM una media y varianza exponenciales de dT/dt;
+    la puntuación es la desviación en sigmas de la subida actual (suavizada).
+    Las muestras anómalas no actualizan la línea base.
+    """
+
+    __slots__ = ("alpha", "base_alpha", "warmup", "threshold", "floor", "rate", "score",
+                 "_last", "_mean", "_var", "_n")
+
+    def __init__(self, alpha: float, base_alpha: float, warmup: int, threshold: float,
+                 floor: float = 0.02):
+        self.alpha = alpha
+        self.base_alpha = base_alpha
+        self.warmup = warmup
+        self.threshold = threshold
+        self.floor = floor  # °C/s: ruido mínimo asumido en la línea base
+        self.rate: Optional[float] = None
+        self.score = 0.0
+        self._last: Optional[Tuple[float, float]] = None
+        self._mean = array('d', bytes(8 * PWM_BUCKETS))
+        self._var = array('d', bytes(8 * PWM_BUCKETS))
+        self._n = array('I', bytes(4 * PWM_BUCKETS))
+
+    def update(self, t: float, temp: float, pwm: float):
+        last = self._last
+        self._last = (t, temp)
+        if last is None or t <= last[0]:
+            return
+        slope = (temp - last[1]) / (t - last[0])
+        rate = self.rate = slope if self.rate is None else self.rate + self.alpha * (slope - self.rate)
+
+        b = min(int(pwm) * PWM_BUCKETS // 256, PWM_BUCKETS - 1)
+        n, mean, var = self._n[b], self._mean[b], self._var[b]
+        sigma = math.sqrt(var) + self.floor
+        self.score = (rate - mean) / sigma if n >= self.warmup else 0.0
+        if self.score < self.threshold:
+            delta = rate - mean
+            a = max(self.base_alpha, 1.0 / (n + 1))
+            self._mean[b] = mean + a * delta
+            self._var[b] = (1 - a) * (var + a * delta * delta)
+            self._n[b] = n + 1
+
+
+class StreamAnalytics:
+    """Analítica incremental del flujo de muestras del histórico.
+
+    Se registra como oyente de HistoryService.add_record. Por cada muestra
+    actualiza las estadísticas deslizantes de cada canal y los detectores de
+    anomalías (RPM frente a PWM y velocidad de subida de temperatura) con un
+    coste constante, independiente del histórico retenido.
+    """
+
+    def __init__(self, sample_rate: float = 1.0, windows: Sequence[float] = (60, 600, 3600),
+                 calibration: Optional[Dict[str, Sequence[Tuple[int, float]]]] = None,
+                 rise_threshold: float = 4.0, extra_windows: Sequence[float] = ()):
+        self.sample_rate = sample_rate
+        self.labels = [f"{w:g}s" for w in windows]
+        # extra_windows (p. ej. las de las reglas de carga) se mantienen pero no salen en summary()
+        windows = list(windows) + [w for w in dict.fromkeys(extra_windows) if w not in windows]
+        self.span = max(windows)  # Segundos de histórico que llenan todas las ventanas
+        self._window = {w: k for k, w in enumerate(windows)}
+        counts = [max(1, int(round(w * sample_rate))) for w in windows]
+        alpha = 1.0 / max(1.0, 10 * sample_rate)  # EWMA con constante de tiempo de ~10 s
+        self.channels: Dict[str, ChannelStats] = {
+            name: ChannelStats(counts, alpha)
+            for name in ("temp", "fan1_rpm", "fan2_rpm", "pwm1", "pwm2")
+        }
+        calibration = calibration or {}
+        settle = max(1, int(round(5 * sample_rate)))
+        slow = 1.0 / max(1.0, 30 * sample_rate)
+        self.rpm: Dict[str, _RpmDetector] = {
+            name: _RpmDetector(
+                RpmModel(calibration[name[:-4]]) if calibration.get(name[:-4]) else None,
+                settle=settle, learn=max(10, int(60 * sample_rate)), alpha=slow,
+            )
+            for name in RPM_CHANNELS
+        }
+        self.rise: Dict[str, _RiseDetector] = {
+            name: _RiseDetector(alpha=slow * 3, base_alpha=1.0 / max(1.0, 3600 * sample_rate),
+                                warmup=max(10, int(300 * sample_rate)), threshold=rise_threshold)
+            for name in TEMP_CHANNELS
+        }
+        # Posiciones en la muestra, resueltas una vez
+        self._channels = [(_INDEX[name], stats) for name, stats in self.channels.items()]
+        self._rpm = [(_INDEX[name], _INDEX[RPM_CHANNELS[name]], d) for name, d in self.rpm.items()]
+        self._rise = [(_INDEX[name], _INDEX[TEMP_CHANNELS[name]], d) for name, d in self.rise.items()]
+        self.samples = 0
+
+    def update(self, sample: Sample):
+        """Incorpora una muestra del histórico (oyente de add_record)"""
+        for i, stats in self._channels:
+            value = sample[i]
+            if value == value:  # Ignorar NaN (lecturas fallidas)
+                stats.update(value)
+        for i, p, detector in self._rpm:
+            rpm = sample[i]
+            if rpm == rpm:
+                detector.update(sample[p], rpm)
+        for i, p, detector in self._rise:
+            temp = sample[i]
+            if temp == temp:
+                detector.update(sample[0], temp, sample[p])
+        self.samples += 1
+
+    def prime(self, columns: Dict[str, Sequence[Sequence[float]]]):
+        """Llena las ventanas deslizantes con columnas del histórico (sin tocar los detectores)"""
+        for name, stats in self.channels.items():
+            for segment in columns.get(name, ()):
+                for value in segment:
+                    if value == value:
+                        stats.update(value)
+
+    def window_mean(self, channel: str, window: float) -> Optional[float]:
+        """Media de un canal en una de las ventanas configuradas (None sin muestras)"""
+        stats = self.channels[channel].windows[self._window[window]]
+        return stats.mean if stats.size else None
+
+    def signals(self) -> Dict[str, float]:
+        """Valores para las reglas de alerta: <canal>_deviation y <canal>_rise_score"""
+        values: Dict[str, float] = {}
+        for name, detector in self.rpm.items():
+            if detector.deviation is not None:
+                values[f"{name}_deviation"] = detector.deviation
+        for name, detector in self.rise.items():
+            values[f"{name}_rise_score"] = detector.score
+        return values
+
+    def summary(self) -> Dict:
+        return {
+            "samples": self.samples,
+            "channels": {name: stats.summary(self.labels) for name, stats in self.channels.items()},
+            "anomalies": {
+                **{name: {"expected_rpm": d.expected, "deviation": d.deviation,
+                          "model": "calibration" if d.model is not None else "learned"}
+                   for name, d in self.rpm.items()},
+                **{name: {"rise_rate": d.rate, "rise_score": d.score}
+                   for name, d in self.rise.items()},
+            },
+        }
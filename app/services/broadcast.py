@@ -0,0 +1,77 @@
+import asyncio
+import time
+from typing import NamedTuple, Optional, Set
+
+
+class Frame(NamedTuple):
+    """Muestra ya codificada, compartida por todos los suscriptores"""
+    seq: int
+    text: str       # JSON para WebSocket
+    sse: bytes      # Evento Server-Sent Events completo
+    payload: bytes  # JSON para /sensors
+    etag: str       # Validador HTTP: época del proceso + seq
+
+
+class BroadcastHub:
+    """Difusión publish/subscribe de muestras a clientes SSE/WebSocket.
+
+    Cada muestra se serializa una sola vez y se entrega la misma Frame a
+    todas las colas. Las colas son acotadas: si un cliente lento se llena,
+    se descarta su frame más antiguo. wait() permite esperar a la siguiente
+    muestra (long-poll) sin suscribirse.
+    """
+
+    def __init__(self, queue_size: int = 8):
+        self.queue_size = queue_size
+        self._subscribers: Set[asyncio.Queue] = set()
+        self.latest: Optional[Frame] = None
+        self.seq = 0
+        self.frames_dropped = 0
+        # seq vuelve a 1 al reiniciar: la época evita que un ETag antiguo coincida
+        self.epoch = "%x" % time.time_ns()
+        self._next: Optional[asyncio.Future] = None  # Compartido por todos los que esperan
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        if self.latest is not None:
+            queue.put_nowait(self.latest)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    async def wait(self, after: int, timeout: float) -> Optional[Frame]:
+        """Primera frame con seq > after, esperando como mucho timeout (None si no llega)"""
+        latest = self.latest
+        # after > seq: el cliente viene de otra época (reinicio), la última le sirve
+        if latest is not None and (latest.seq > after or after > self.seq):
+            return latest
+        if self._next is None:
+            self._next = asyncio.get_running_loop().create_future()
+        try:
+            # shield: el timeout de un cliente no cancela la espera de los demás
+            return await asyncio.wait_for(asyncio.shield(self._next), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def publish(self, payload: bytes) -> Frame:
+        """Encola una muestra ya codificada en JSON para todos los suscriptores"""
+        self.seq += 1
+        frame = Frame(self.seq, payload.decode(), b"id: %d\ndata: %s\n\n" % (self.seq, payload),
+                      payload, '"%s-%d"' % (self.epoch, self.seq))
+        self.latest = frame
+        if self._next is not None:
+            self._next.set_result(frame)
+            self._next = None
+
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+                self.frames_dropped += 1
+            queue.put_nowait(frame)
+        return frame
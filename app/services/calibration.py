@@ -0,0 +1,299 @@
+import asyncio
+import logging
+import math
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+from ..models.config import FanConfig
+
+SPIN_RPM = 50.0  # Por debajo se considera que el ventilador está parado
+# Barrido descendente desde 255 que acota la parada (pasos de ~0,7)
+SWEEP = (255, 144, 100, 70, 52, 38, 28, 20, 14, 10, 7, 5, 3, 2, 1, 0)
+# Puntos del modelo como fracción del tramo entre la parada y 255
+CURVE_STEPS = (0.0, 0.05, 0.15, 0.3, 0.55, 1.0)
+
+
+def fit_power(points: Sequence[Tuple[float, float]], stop: int) -> Tuple[float, float, float]:
+    """Ajusta rpm = a + b·x^g con x = (pwm - stop) / (255 - stop) por mínimos cuadrados.
+
+    Para cada exponente g de una rejilla, a y b salen de una regresión
+    lineal cerrada; se queda el de menor error cuadrático.
+    """
+    span = max(1, 255 - stop)
+    xs = [max(0.0, (pwm - stop) / span) for pwm, _ in points]
+    ys = [rpm for _, rpm in points]
+    n = len(points)
+    if n < 2:
+        return (ys[0] if ys else 0.0), 0.0, 1.0
+    best = (math.inf, sum(ys) / n, 0.0, 1.0)
+    for k in range(20, 301, 2):
+        g = k / 100
+        us = [x ** g for x in xs]
+        mu, my = sum(us) / n, sum(ys) / n
+        suu = sum((u - mu) ** 2 for u in us)
+        if suu <= 0:
+            continue
+        b = sum((u - mu) * (y - my) for u, y in zip(us, ys)) / suu
+        a = my - b * mu
+        sse = sum((a + b * u - y) ** 2 for u, y in zip(us, ys))
+        if sse < best[0]:
+            best = (sse, a, b, g)
+    return best[1:]
+
+
+class CalibrationResult:
+    """Umbrales y modelo PWM -> RPM medidos para un ventilador"""
+
+    __slots__ = ("name", "stop_pwm", "start_pwm", "max_rpm", "points", "model_params",
+                 "elapsed", "error")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.stop_pwm: Optional[int] = None   # PWM mínimo que mantiene el giro
+        self.start_pwm: Optional[int] = None  # PWM mínimo que lo arranca desde parado
+        self.max_rpm = 0.0
+        self.points: List[Tuple[int, float]] = []  # Puntos asentados (pwm, rpm)
+        self.model_params = (0.0, 0.0, 1.0)  # a, b, g de fit_power
+        self.elapsed = 0.0
+        self.error: Optional[str] = None
+
+    def model(self, pwm: float) -> float:
+        """RPM esperadas girando con un PWM >= stop_pwm"""
+        a, b, g = self.model_params
+        x = max(0.0, (pwm - self.stop_pwm) / max(1, 255 - self.stop_pwm))
+        return a + b * x ** g
+
+    def min_pwm(self, margin: int) -> int:
+        """Suelo seguro: arranca desde parado y queda `margin` por encima de la parada"""
+        return min(255, max(self.start_pwm, self.stop_pwm + margin))
+
+    def curve(self, n: int = 8) -> List[Tuple[int, float]]:
+        """Puntos del modelo ajustado entre la parada y 255 (RPM no decrecientes)"""
+        lo = self.stop_pwm
+        pwms = sorted({round(lo + (255 - lo) * k / (n - 1)) for k in range(n)})
+        points, last = [], 0.0
+        for pwm in pwms:
+            last = max(last, self.model(pwm), 0.0)
+            points.append((pwm, round(last, 1)))
+        return points
+
+    def to_dict(self) -> Dict:
+        return {
+            "stop_pwm": self.stop_pwm, "start_pwm": self.start_pwm, "max_rpm": self.max_rpm,
+            "model": dict(zip("abg", self.model_params)), "points": self.points,
+            "elapsed": round(self.elapsed, 2), "error": self.error,
+        }
+
+
+class FanCalibrator:
+    """Calibración no interactiva de un ventilador.
+
+    En lugar de esperas fijas, cada paso espera a que las RPM se asienten.
+    El umbral de parada se acota con un barrido descendente y se afina con
+    búsqueda binaria; el de arranque se busca desde parado con pasos
+    crecientes y búsqueda binaria; por último se miden los puntos del
+    modelo PWM -> RPM subiendo desde la parada hasta 255.
+    """
+
+    def __init__(self, name: str, pwm_path: Path, rpm_path: Path, poll: float = 0.1,
+                 window: float = 0.8, tolerance: float = 0.01, coarse: float = 0.03,
+                 settle_timeout: float = 10.0, start_timeout: float = 1.5):
+        self.name = name
+        self.pwm_path = Path(pwm_path)
+        self.rpm_path = Path(rpm_path)
+        self.enable_path = self.pwm_path.with_name(self.pwm_path.name + "_enable")
+        self.poll = poll
+        self.window = max(2, int(round(window / poll)))  # Lecturas por ventana de asentamiento
+        self.tolerance = tolerance  # Asentamiento de los puntos del modelo
+        self.coarse = coarse        # Asentamiento (en media ventana) para decidir si sigue girando
+        self.settle_timeout = settle_timeout
+        self.start_timeout = start_timeout
+        self.logger = logging.getLogger(__name__)
+
+    def _write(self, pwm: int):
+        self.pwm_path.write_text(str(pwm))
+
+    def _read(self) -> float:
+        return float(self.rpm_path.read_text().strip())
+
+    async def _settle(self, pwm: int, floor: float = SPIN_RPM, coarse: bool = False) -> float:
+        """Fija el PWM y espera a que las RPM se estabilicen; 0 si el ventilador se para.
+
+        Por debajo de `floor` se da por parado sin esperar a que se detenga:
+        bajando desde un punto asentado, un ventilador que sigue girando se
+        acerca a su nuevo equilibrio desde arriba y no cae tan lejos.
+        """
+        tolerance, window = (self.coarse, max(2, self.window // 2)) if coarse else (self.tolerance, self.window)
+        self._write(pwm)
+        readings: List[float] = []
+        half = window // 2
+        deadline = time.monotonic() + self.settle_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll)
+            rpm = self._read()
+            if rpm < floor:
+                return 0.0
+            # Muchos chips refrescan el tacómetro cada ~1 s: una lectura repetida no es nueva
+            if readings and rpm == readings[-1]:
+                continue
+            readings.append(rpm)
+            if len(readings) >= window:
+                recent = readings[-window:]
+                a = sum(recent[:half]) / half
+                b = sum(recent[-half:]) / half
+                # Medias de dos semiventanas: el ruido se promedia, la tendencia no
+                if abs(b - a) <= max(tolerance * b, 3.0):
+                    return sum(recent) / len(recent)
+        self.logger.warning(f"{self.name}: RPM sin estabilizar a PWM={pwm}")
+        recent = readings[-window:] or [self._read()]
+        return sum(recent) / len(recent)
+
+    async def _wait_stopped(self):
+        """PWM 0 hasta que el rotor se detenga (lectura 0)"""
+        self._write(0)
+        deadline = time.monotonic() + self.settle_timeout * 2
+        while self._read() >= 1.0:
+            if time.monotonic() > deadline:
+                raise RuntimeError("el ventilador no se detiene con PWM=0")
+            await asyncio.sleep(self.poll)
+
+    async def _kick(self, rpm: float = SPIN_RPM):
+        """Acelera a máxima potencia hasta superar `rpm`.
+
+        Siempre al menos un intervalo a 255: un rotor que aún gira por
+        inercia tras una parada no está propulsado.
+        """
+        self._write(255)
+        deadline = time.monotonic() + self.start_timeout * 2
+        while True:
+            await asyncio.sleep(self.poll)
+            if self._read() >= rpm:
+                return
+            if time.monotonic() > deadline:
+                raise RuntimeError("el ventilador no arranca con PWM=255")
+
+    async def _starts(self, pwm: int) -> bool:
+        """¿Arranca desde parado con este PWM? (lo deja parado o girando despacio)"""
+        self._write(pwm)
+        deadline = time.monotonic() + self.start_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll)
+            if self._read() >= SPIN_RPM:
+                return True
+        return False
+
+    async def _find_stop(self) -> int:
+        """PWM mínimo que mantiene el giro.
+
+        Sólo importa si sigue girando, así que basta un asentamiento
+        aproximado; los puntos precisos del modelo se miden después.
+        """
+        await self._kick()
+        reference = await self._settle(255, coarse=True)
+        if reference <= 0:
+            raise RuntimeError("sin lectura de RPM a PWM=255")
+        spinning, stopped = 255, None
+        for pwm in SWEEP[1:]:
+            rpm = await self._settle(pwm, max(SPIN_RPM, reference / 2), coarse=True)
+            if rpm <= 0:
+                stopped = pwm
+                break
+            spinning, reference = pwm, rpm
+        if stopped is None:
+            return 0  # Gira incluso con PWM=0
+
+        while spinning - stopped > 1:
+            mid = (spinning + stopped) // 2
+            # Volver a girar por encima de la referencia para bajar de nuevo hacia mid
+            await self._kick(reference)
+            rpm = await self._settle(mid, max(SPIN_RPM, reference / 2), coarse=True)
+            if rpm > 0:
+                spinning, reference = mid, rpm
+            else:
+                stopped = mid
+        return spinning
+
+    async def _find_start(self, stop: int) -> int:
+        """PWM mínimo que arranca el ventilador desde parado (>= stop)"""
+        if stop == 0:
+            return 0
+        await self._wait_stopped()
+        # Pasos crecientes: mientras no arranca, no hace falta volver a pararlo
+        failed, step, pwm = stop - 1, 4, stop
+        while not await self._starts(pwm):
+            if pwm >= 255:
+                raise RuntimeError("no arranca desde parado ni con PWM=255")
+            failed, pwm = pwm, min(255, pwm + step)
+            step *= 2
+        started = pwm
+
+        while started - failed > 1:
+            await self._wait_stopped()
+            mid = (started + failed) // 2
+            if await self._starts(mid):
+                started = mid
+            else:
+                failed = mid
+        return started
+
+    async def _measure_curve(self, result: CalibrationResult):
+        """Puntos precisos del modelo en PWM crecientes.
+
+        Acelerar es mucho más rápido que frenar por rozamiento, así que cada
+        punto se alcanza desde abajo partiendo de un arranque lento.
+        """
+        stop, start = result.stop_pwm, result.start_pwm
+        if self._read() < SPIN_RPM and not await self._starts(max(start, 1)):
+            raise RuntimeError(f"no arranca de nuevo con PWM={start}")
+        for x in CURVE_STEPS:
+            pwm = round(stop + (255 - stop) * x)
+            rpm = await self._settle(pwm)
+            if rpm <= 0:
+                raise RuntimeError(f"se detiene con PWM={pwm}, por encima de la parada medida")
+            result.points.append((pwm, rpm))
+        result.max_rpm = result.points[-1][1]
+
+    async def run(self) -> CalibrationResult:
+        result = CalibrationResult(self.name)
+        begin = time.monotonic()
+        saved_pwm = self.pwm_path.read_text().strip()
+        saved_enable = self.enable_path.read_text().strip() if self.enable_path.exists() else None
+        try:
+            if saved_enable is not None:
+                self.enable_path.write_text("1")  # Control manual durante la calibración
+            result.stop_pwm = await self._find_stop()
+            result.start_pwm = await self._find_start(result.stop_pwm)
+            await self._measure_curve(result)
+            result.model_params = fit_power(result.points, result.stop_pwm)
+        except (OSError, ValueError, RuntimeError) as e:
+            result.error = str(e)
+            self.logger.error(f"{self.name}: calibración fallida: {e}")
+        finally:
+            try:
+                self.pwm_path.write_text(saved_pwm)
+                if saved_enable is not None:
+                    self.enable_path.write_text(saved_enable)
+            except OSError as e:
+                self.logger.error(f"{self.name}: no se pudo restaurar el PWM: {e}")
+            result.elapsed = time.monotonic() - begin
+        return result
+
+
+async def calibrate(fans: Dict[str, Tuple[Path, Path]], **options) -> Dict[str, CalibrationResult]:
+    """Calibra todos los ventiladores a la vez ({nombre: (pwm, rpm)})"""
+    calibrators = [FanCalibrator(name, pwm, rpm, **options) for name, (pwm, rpm) in fans.items()]
+    results = await asyncio.gather(*(c.run() for c in calibrators))
+    return {r.name: r for r in results}
+
+
+def apply_results(config: FanConfig, results: Dict[str, CalibrationResult], margin: int = 4) -> FanConfig:
+    """Configuración con min_pwm y calibration actualizados (validada de nuevo)"""
+    data = config.dict()
+    for name, result in results.items():
+        if result.error is not None:
+            continue
+        curve = data[name] if not data["fans"] else data["fans"][name]["curve"]
+        curve["min_pwm"] = result.min_pwm(margin)
+        curve["max_pwm"] = max(curve["max_pwm"], curve["min_pwm"])
+        data["calibration"][name] = result.curve()
+    return FanConfig(**data)
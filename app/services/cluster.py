@@ -0,0 +1,215 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Mapping, Optional, Tuple
+from .broadcast import BroadcastHub
+
+
+def parse_peers(text: str) -> Dict[str, str]:
+    """Nodos de FANCONTROL_PEERS: "url" o "nombre=url", separados por comas"""
+    peers: Dict[str, str] = {}
+    for item in text.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, sep, url = item.partition("=")
+        if not sep or "://" in name:  # Sin nombre: se usa host:puerto
+            name, url = "", item
+        url = url.rstrip("/")
+        name = name or url.split("://")[-1]
+        if name in peers:
+            raise ValueError(f"Nodo repetido: {name}")
+        peers[name] = url
+    return peers
+
+
+class PeerState:
+    """Última muestra recibida de un nodo y estado de su conexión"""
+
+    __slots__ = ("name", "url", "prefix", "client", "sample", "raw", "received", "connected", "events",
+                 "reconnects", "error")
+
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.url = url
+        self.prefix = b'{"node":%s,"sample":' % json.dumps(name).encode()  # Frame del feed conjunto
+        self.client = None                # httpx.AsyncClient propio (pool keep-alive del nodo)
+        self.sample: Optional[Dict] = None
+        self.raw: Optional[bytes] = None  # JSON tal como llega del nodo
+        self.received = 0.0               # time.monotonic() de la última muestra
+        self.connected = False
+        self.events = 0
+        self.reconnects = 0
+        self.error: Optional[str] = None
+
+    def status(self, now: float, stale_after: float) -> str:
+        if not self.connected:
+            return "down"
+        return "up" if now - self.received <= stale_after else "stale"
+
+
+class ClusterAggregator:
+    """Modo agregador: vista conjunta de varios nodos FanControl.
+
+    Mantiene una suscripción /stream por nodo sobre un pool de conexiones
+    keep-alive (httpx) propio de cada nodo, guarda la última muestra de cada uno y la reenvía
+    por un BroadcastHub propio como {"node": ..., "sample": ...}. Cada nodo
+    tiene su propia tarea con reconexión y backoff, y las consultas al
+    histórico se lanzan en paralelo con un timeout por nodo, así que un nodo
+    lento o caído nunca retrasa a los demás.
+    """
+
+    def __init__(self, peers: Mapping[str, str], timeout: float = 2.0, stale_after: float = 5.0,
+                 read_timeout: float = 15.0, max_backoff: float = 30.0):
+        self.peers: Dict[str, PeerState] = {name: PeerState(name, url) for name, url in peers.items()}
+        self.timeout = timeout            # Consultas puntuales (histórico)
+        self.stale_after = stale_after    # Segundos sin muestras para marcar un nodo como stale
+        self.read_timeout = read_timeout  # Sin datos en el stream durante este tiempo: reconectar
+        self.max_backoff = max_backoff
+        # Cola por cliente proporcional al número de nodos: una ráfaga de todos no descarta frames
+        self.hub = BroadcastHub(queue_size=max(8, 2 * len(self.peers)))
+        self.logger = logging.getLogger(__name__)
+        self._tasks: List[asyncio.Task] = []
+
+    @classmethod
+    def from_env(cls) -> Optional["ClusterAggregator"]:
+        """Agregador configurado con FANCONTROL_PEERS (None si no está definido)"""
+        peers = os.getenv("FANCONTROL_PEERS")
+        if not peers:
+            return None
+        timeout = float(os.getenv("FANCONTROL_PEER_TIMEOUT", "2.0"))
+        return cls(parse_peers(peers), timeout=timeout)
+
+    async def start(self):
+        import ssl
+        import httpx  # Sólo hace falta en modo agregador
+
+        # Un pool pequeño por nodo (el stream y las consultas): httpcore recorre
+        # todas las conexiones del pool en cada petición, y con un pool
+        # compartido cada GET costaba O(nodos)
+        limits = httpx.Limits(max_connections=4, max_keepalive_connections=2)
+        tls = ssl.create_default_context()  # Compartido: crear uno por cliente cuesta ~30 ms
+        for peer in self.peers.values():
+            peer.client = httpx.AsyncClient(base_url=peer.url, limits=limits, timeout=self.timeout,
+                                            verify=tls)
+        self._tasks = [asyncio.create_task(self._follow(peer)) for peer in self.peers.values()]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for peer in self.peers.values():
+            if peer.client is not None:
+                await peer.client.aclose()
+                peer.client = None
+
+    # --- Suscripción a los nodos -------------------------------------------
+
+    async def _follow(self, peer: PeerState):
+        """Sigue el /stream de un nodo indefinidamente, reconectando con backoff"""
+        import httpx
+
+        backoff = 0.5
+        timeout = httpx.Timeout(self.timeout, read=self.read_timeout)
+        while True:
+            try:
+                async with peer.client.stream("GET", "/stream", timeout=timeout) as response:
+                    response.raise_for_status()
+                    peer.connected, peer.error = True, None
+                    backoff = 0.5
+                    async for line in response.aiter_lines():
+                        if line.startswith("data:"):
+                            self._ingest(peer, line[5:].strip().encode())
+                raise ConnectionError("stream cerrado por el nodo")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if peer.connected or peer.error is None:
+                    self.logger.warning(f"Nodo {peer.name} desconectado: {e!r}")
+                peer.connected, peer.error = False, repr(e)
+                peer.reconnects += 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def _ingest(self, peer: PeerState, raw: bytes):
+        try:
+            sample = json.loads(raw)
+        except ValueError:
+            return
+        peer.sample, peer.raw = sample, raw
+        peer.received = time.monotonic()
+        peer.events += 1
+        # Sin volver a serializar la muestra
+        self.hub.publish(peer.prefix + raw + b"}")
+
+    # --- Vista conjunta ------------------------------------------------------
+
+    def snapshot(self) -> Dict:
+        """Última muestra y estado de cada nodo, con un resumen del clúster"""
+        now = time.monotonic()
+        nodes = {}
+        temps: List[Tuple[float, str]] = []
+        counts = {"up": 0, "stale": 0, "down": 0}
+        for name, peer in self.peers.items():
+            status = peer.status(now, self.stale_after)
+            counts[status] += 1
+            nodes[name] = {
+                "status": status,
+                "age": round(now - peer.received, 3) if peer.sample is not None else None,
+                "sample": peer.sample,
+                "error": peer.error,
+            }
+            if status == "up" and peer.sample is not None:
+                temp = peer.sample.get("temp")
+                if isinstance(temp, (int, float)):
+                    temps.append((temp, name))
+        summary = {**counts, "nodes": len(self.peers)}
+        if temps:
+            hottest = max(temps)
+            summary.update(max_temp=hottest[0], hottest=hottest[1],
+                           mean_temp=round(sum(t for t, _ in temps) / len(temps), 2))
+        return {"summary": summary, "nodes": nodes}
+
+    def stats(self) -> Dict[str, Dict]:
+        return {
+            name: {"url": peer.url, "connected": peer.connected, "events": peer.events,
+                   "reconnects": peer.reconnects}
+            for name, peer in self.peers.items()
+        }
+
+    # --- Consultas repartidas ------------------------------------------------
+
+    async def _get(self, peer: PeerState, path: str, params: Mapping[str, str]) -> bytes:
+        # wait_for además del timeout de httpx: cubre también un nodo que envía muy despacio
+        async def fetch() -> bytes:
+            response = await peer.client.get(path, params=params)
+            response.raise_for_status()
+            return response.content
+        return await asyncio.wait_for(fetch(), self.timeout)
+
+    async def fan_out(self, path: str, params: Mapping[str, str],
+                      nodes: Optional[List[str]] = None) -> Tuple[Dict[str, bytes], Dict[str, str]]:
+        """GET en paralelo a todos los nodos (o a `nodes`); devuelve (cuerpos, errores)"""
+        peers = [self.peers[name] for name in nodes] if nodes else list(self.peers.values())
+        results = await asyncio.gather(*(self._get(peer, path, params) for peer in peers),
+                                       return_exceptions=True)
+        bodies: Dict[str, bytes] = {}
+        errors: Dict[str, str] = {}
+        for peer, result in zip(peers, results):
+            if isinstance(result, asyncio.TimeoutError):
+                errors[peer.name] = "timeout"
+            elif isinstance(result, BaseException):
+                errors[peer.name] = repr(result)
+            else:
+                bodies[peer.name] = result
+        return bodies, errors
+
+    async def history(self, params: Mapping[str, str],
+                      nodes: Optional[List[str]] = None) -> bytes:
+        """Histórico JSON de todos los nodos en un solo documento, sin reinterpretarlo"""
+        bodies, errors = await self.fan_out("/history", {**params, "format": "json"}, nodes)
+        parts = [b"%s:%s" % (json.dumps(name).encode(), body) for name, body in bodies.items()]
+        return b'{"nodes":{%s},"errors":%s}' % (b",".join(parts), json.dumps(errors).encode())
@@ -0,0 +1,65 @@
+import asyncio
+import os
+from typing import Optional
+from .cluster import ClusterAggregator
+from .fan_control import FanControlService
+from .history import HistoryService
+from .storage import SegmentStore
+
+# Muestras del histórico persistido agregadas por paso al reconstruir los niveles (~15 ms)
+TIER_REBUILD_CHUNK = 2048
+
+
+class ServiceContainer:
+    """Servicios de la aplicación, creados una sola vez y compartidos por todas las peticiones.
+
+    Se construye en el arranque (lifespan) y se publica en app.state; las
+    rutas lo resuelven con las dependencias de routes/deps.py.
+    """
+
+    def __init__(self, history: HistoryService, fan_control: FanControlService,
+                 cluster: Optional[ClusterAggregator] = None):
+        self.history = history
+        self.fan_control = fan_control
+        self.cluster = cluster
+        self._rebuild: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls) -> "ServiceContainer":
+        """Servicios de producción: FANCONTROL_CONFIG (/etc/fancontrol.json) y las demás FANCONTROL_*"""
+        history_dir = os.getenv("FANCONTROL_HISTORY_DIR")
+        history = HistoryService(backend=SegmentStore(history_dir) if history_dir else None)
+        fan_control = FanControlService(history, config_file=os.getenv("FANCONTROL_CONFIG"))
+        # Modo agregador: sólo si se definen nodos en FANCONTROL_PEERS
+        return cls(history, fan_control, ClusterAggregator.from_env())
+
+    async def start(self, rebuild_tiers: bool = True):
+        """Arranca el control (primera escritura PWM) y después lo demás.
+
+        Con rebuild_tiers=False la reconstrucción de los niveles agregados
+        se deja para una llamada posterior a rebuild_tiers().
+        """
+        await self.fan_control.initialize()
+        if rebuild_tiers:
+            self.rebuild_tiers()
+        if self.cluster is not None:
+            await self.cluster.start()
+
+    def rebuild_tiers(self):
+        """Reconstruye en segundo plano, por tramos, los niveles agregados del histórico persistido"""
+        if self._rebuild is None:
+            self._rebuild = asyncio.create_task(self._rebuild_loop())
+
+    async def _rebuild_loop(self):
+        while not self.history.rebuild_tiers(TIER_REBUILD_CHUNK):
+            await asyncio.sleep(0)
+
+    async def stop(self):
+        if self._rebuild is not None:
+            self._rebuild.cancel()
+            await asyncio.gather(self._rebuild, return_exceptions=True)
+            self._rebuild = None
+        if self.cluster is not None:
+            await self.cluster.stop()
+        await self.fan_control.cleanup()
+        self.history.close()
@@ -0,0 +1,82 @@
+from bisect import bisect_right
+from typing import Dict, Iterable, Sequence
+from ..models.config import ControlCurve
+
+
+class CompiledCurve:
+    """Curva de control precompilada e inmutable.
+
+    Guarda los puntos de corte ordenados y las pendientes de cada tramo, de
+    modo que evaluar una temperatura cuesta un bisect (O(log n)) y una
+    multiplicación. Fuera del rango de la curva se usan los extremos; el
+    resultado siempre se limita a [min_pwm, max_pwm]. Sin lectura (NaN) se
+    devuelve max_pwm: ante un sensor que falla, ventilación máxima.
+    """
+
+    __slots__ = ("temps", "pwms", "slopes", "min_pwm", "max_pwm", "hysteresis")
+
+    def __init__(self, curve: ControlCurve):
+        points = sorted(curve.curve, key=lambda x: x[0])
+        temps = tuple(float(t) for t, _ in points)
+        pwms = tuple(float(p) for _, p in points)
+        slopes = tuple(
+            (pwms[i + 1] - pwms[i]) / (temps[i + 1] - temps[i]) if temps[i + 1] > temps[i] else 0.0
+            for i in range(len(points) - 1)
+        )
+        object.__setattr__(self, "temps", temps)
+        object.__setattr__(self, "pwms", pwms)
+        object.__setattr__(self, "slopes", slopes)
+        object.__setattr__(self, "min_pwm", curve.min_pwm)
+        object.__setattr__(self, "max_pwm", curve.max_pwm)
+        object.__setattr__(self, "hysteresis", curve.hysteresis)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CompiledCurve es inmutable")
+
+    def __call__(self, temp: float) -> int:
+        """PWM para una temperatura"""
+        if temp != temp:
+            return self.max_pwm
+        temps = self.temps
+        if temp <= temps[0]:
+            value = self.pwms[0]
+        elif temp >= temps[-1]:
+            value = self.pwms[-1]
+        else:
+            i = bisect_right(temps, temp) - 1
+            value = self.pwms[i] + self.slopes[i] * (temp - temps[i])
+        return min(max(int(value), self.min_pwm), self.max_pwm)
+
+    def evaluate_many(self, temps):
+        """Evalúa la curva sobre un array de temperaturas (requiere NumPy)"""
+        import numpy as np
+
+        temps = np.asarray(temps, dtype=np.float64)
+        values = np.clip(np.trunc(np.interp(temps, self.temps, self.pwms)), self.min_pwm, self.max_pwm)
+        return np.where(np.isnan(temps), self.max_pwm, values).astype(np.uint8)
+
+
+def as_array(segments: Iterable[Sequence], dtype="float64"):
+    """Concatena los tramos (memoryviews/arrays) de una columna en un array NumPy"""
+    import numpy as np
+
+    # np.asarray respeta el formato del buffer y no copia
+    parts = [np.asarray(seg) for seg in segments]
+    if not parts:
+        return np.empty(0, dtype=dtype)
+    return np.concatenate(parts).astype(dtype, copy=False)
+
+
+def summarize(pwm) -> Dict[str, float]:
+    """Resumen de una traza PWM (media, percentiles y cambios)"""
+    import numpy as np
+
+    if not len(pwm):
+        return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "max": 0, "changes": 0}
+    return {
+        "mean": float(pwm.mean()),
+        "p50": float(np.percentile(pwm, 50)),
+        "p95": float(np.percentile(pwm, 95)),
+        "max": int(pwm.max()),
+        "changes": int(np.count_nonzero(np.diff(pwm.astype(np.int16)))),
+    }
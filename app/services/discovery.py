@@ -0,0 +1,152 @@
+import logging
+import os
+import re
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+HWMON_CLASS = "/sys/class/hwmon"
+
+_CHANNEL_RE = re.compile(r"^(temp|fan|pwm|in|power|curr)(\d+)(?:_input)?$")
+
+
+class HwmonChannel:
+    """Canal de un chip hwmon identificado de forma estable"""
+
+    __slots__ = ("chip", "device", "hwmon", "kind", "number", "label", "path")
+
+    def __init__(self, chip: str, device: str, hwmon: str, kind: str, number: int,
+                 label: Optional[str], path: Path):
+        self.chip = chip        # Contenido de <hwmonN>/name (p.ej. nct6775)
+        self.device = device    # Dispositivo físico (p.ej. nct6775.656, 0000:01:00.0)
+        self.hwmon = hwmon      # hwmonN: cambia entre reinicios
+        self.kind = kind        # temp, fan, pwm...
+        self.number = number
+        self.label = label      # Contenido de <kind>N_label si existe
+        self.path = path        # Fichero a leer/escribir
+
+    @property
+    def channel(self) -> str:
+        return f"{self.kind}{self.number}"
+
+    def to_dict(self) -> Dict:
+        return {
+            "chip": self.chip, "device": self.device, "hwmon": self.hwmon,
+            "channel": self.channel, "label": self.label, "path": str(self.path),
+        }
+
+
+class HwmonIndex:
+    """Índice de canales hwmon por chip, dispositivo y etiqueta.
+
+    Los canales se nombran como "<chip>[@<dispositivo>]/<canal o etiqueta>",
+    por ejemplo "nct6775/fan2", "coretemp/Package id 0" o
+    "nvme@0000:01:00.0/Composite". También se acepta el nombre del
+    directorio ("hwmon0/temp2") por compatibilidad con la configuración antigua.
+    """
+
+    def __init__(self, channels: List[HwmonChannel], fingerprint: Tuple[str, ...]):
+        self.channels = channels
+        self.fingerprint = fingerprint
+
+    def resolve(self, spec: str) -> HwmonChannel:
+        """Resuelve un nombre de canal; lanza KeyError si no existe o es ambiguo"""
+        chip_spec, _, name = spec.rpartition("/")
+        chip, _, device = chip_spec.partition("@")
+        if not chip or not name:
+            raise KeyError(f"Canal hwmon inválido: {spec!r}")
+
+        candidates = [
+            ch for ch in self.channels
+            if (ch.chip == chip or ch.hwmon == chip) and (not device or ch.device == device)
+        ]
+        matches = [ch for ch in candidates if ch.channel == name or ch.label == name]
+        if not matches:
+            raise KeyError(f"Canal hwmon no encontrado: {spec!r}")
+        if len({(ch.device, ch.hwmon) for ch in matches}) > 1:
+            raise KeyError(f"Canal hwmon ambiguo: {spec!r} (especifica <chip>@<dispositivo>)")
+        return matches[0]
+
+    def describe(self) -> List[Dict]:
+        return [ch.to_dict() for ch in self.channels]
+
+
+def _read(path: Path) -> Optional[str]:
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return None
+
+
+def scan(root: str = HWMON_CLASS) -> HwmonIndex:
+    """Recorre root una vez y construye el índice de canales"""
+    channels: List[HwmonChannel] = []
+    base = Path(root)
+    entries = sorted(os.listdir(base)) if base.is_dir() else []
+    for entry in entries:
+        hwmon = base / entry
+        chip = _read(hwmon / "name") or entry
+        device_link = hwmon / "device"
+        device = Path(os.path.realpath(device_link)).name if device_link.exists() else entry
+        for path in sorted(hwmon.iterdir()):
+            m = _CHANNEL_RE.match(path.name)
+            if not m:
+                continue
+            kind, number = m.group(1), int(m.group(2))
+            # Los sensores se leen de *_input; los PWM son el propio fichero pwmN
+            if kind == "pwm" and path.name != f"pwm{number}":
+                continue
+            if kind != "pwm" and not path.name.endswith("_input"):
+                continue
+            label = _read(hwmon / f"{kind}{number}_label")
+            channels.append(HwmonChannel(chip, device, entry, kind, number, label, path))
+    return HwmonIndex(channels, tuple(entries))
+
+
+class HwmonDiscovery:
+    """Mantiene el índice hwmon y sólo lo reconstruye si cambian los directorios"""
+
+    MIN_INTERVAL = 1.0   # s entre comprobaciones del directorio
+    MAX_INTERVAL = 60.0  # Tope del backoff mientras el directorio no cambie
+
+    def __init__(self, root: str = HWMON_CLASS, clock: Callable[[], float] = time.monotonic):
+        self.root = root
+        self.clock = clock
+        self.logger = logging.getLogger(__name__)
+        self._index = scan(root)
+        self._interval = self.MIN_INTERVAL
+        self._next_check = 0.0
+
+    @property
+    def index(self) -> HwmonIndex:
+        return self._index
+
+    def refresh(self) -> bool:
+        """Reconstruye el índice si el conjunto de hwmonN ha cambiado
+
+        Se llama en cada tick con errores de lectura. Un sensor roto no
+        cambia el directorio, así que entre comprobaciones sin cambios el
+        intervalo se duplica hasta MAX_INTERVAL; tras una pausa larga sin
+        llamadas (sin errores) vuelve a MIN_INTERVAL.
+        """
+        now = self.clock()
+        if now < self._next_check:
+            return False
+        if now - self._next_check > self.MAX_INTERVAL:
+            self._interval = self.MIN_INTERVAL
+        try:
+            entries = tuple(sorted(os.listdir(self.root)))
+        except OSError:
+            entries = ()
+        if entries == self._index.fingerprint:
+            self._next_check = now + self._interval
+            self._interval = min(self._interval * 2, self.MAX_INTERVAL)
+            return False
+        self.logger.info(f"Cambios en {self.root}; reconstruyendo índice hwmon")
+        self._index = scan(self.root)
+        self._interval = self.MIN_INTERVAL
+        self._next_check = now + self._interval
+        return True
+
+    def resolve(self, spec: str) -> Path:
+        return self._index.resolve(spec).path
@@ -0,0 +1,108 @@
+import math
+from array import array
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from ..models.config import FanChannel, PredictiveSettings
+from .curves import CompiledCurve
+from .predictive import PredictiveController
+
+
+Plan = Callable[[Sequence[float]], Tuple[int, float]]
+
+
+def _plan(fan: FanChannel, zone_index: Dict[str, int]) -> Plan:
+    """Precompila la regla de un ventilador en una función temps -> (PWM, temp efectiva)"""
+    idx = tuple(zone_index[name] for name in fan.inputs)
+    curve = CompiledCurve(fan.curve)
+
+    if fan.aggregate == "curve_max":
+        curves = tuple(
+            CompiledCurve(fan.input_curves[name]) if name in fan.input_curves else curve
+            for name in fan.inputs
+        )
+        pairs = tuple(zip(idx, curves))
+        # La temperatura efectiva es la de la entrada que fija el PWM
+        return lambda t: max([(c(t[i]), t[i]) for i, c in pairs])
+
+    if fan.aggregate == "mean":
+        weights = tuple(fan.weights) if fan.weights else (1.0,) * len(idx)
+        total = sum(weights)
+        terms = tuple(zip(idx, (w / total for w in weights)))
+
+        def mean(t):
+            temp = sum([t[i] * w for i, w in terms])
+            return curve(temp), temp
+        return mean
+
+    # max (por defecto): con una sola entrada se evita el max()
+    if len(idx) == 1:
+        i = idx[0]
+        return lambda t: (curve(t[i]), t[i])
+
+    def hottest(t):
+        temps = [t[i] for i in idx]
+        temp = max(temps)
+        # max() con NaN depende del orden: una zona sin lectura debe ganar siempre
+        total = sum(temps)
+        if total != total:
+            temp = total
+        return curve(temp), temp
+    return hottest
+
+
+class ControlEngine:
+    """Motor de control para N ventiladores y M zonas de temperatura.
+
+    La configuración se compila una vez en una función por ventilador; cada
+    tick recibe las temperaturas de las zonas en orden y evalúa todos los
+    ventiladores en una sola pasada, escribiendo en un array compacto. Los
+    ventiladores en modo predictivo sustituyen su función por un
+    PredictiveController, que usa además la carga de `load`.
+    """
+
+    def __init__(self, zones: Sequence[str], fans: Dict[str, FanChannel],
+                 predictive: Optional[Dict[str, PredictiveSettings]] = None, period: float = 1.0):
+        self.zones: Tuple[str, ...] = tuple(zones)
+        self.fan_names: Tuple[str, ...] = tuple(fans)
+        zone_index = {name: i for i, name in enumerate(self.zones)}
+        self.curves: Dict[str, CompiledCurve] = {name: CompiledCurve(fan.curve) for name, fan in fans.items()}
+        self._plans: List[Plan] = [_plan(fan, zone_index) for fan in fans.values()]
+        self.temps = array('d', bytes(8 * len(self.zones)))
+        self.targets = array('B', bytes(len(self.fan_names)))
+        # Temperatura que ha determinado el PWM de cada ventilador (para la histéresis)
+        self.inputs = array('d', bytes(8 * len(self.fan_names)))
+        # RPM leídas por ventilador (NaN sin lectura) y su canal en la lectura de hwmon
+        self.rpms = array('d', [math.nan] * len(self.fan_names))
+        self.rpm_channels: Tuple[str, ...] = tuple(f"{name}_rpm" for name in self.fan_names)
+        # Utilización de CPU y carga media por CPU (sólo se leen si hay ventiladores predictivos)
+        self.load = array('d', bytes(16))
+        self.controllers: Dict[str, PredictiveController] = {}
+        for k, name in enumerate(self.fan_names):
+            if predictive and name in predictive:
+                controller = PredictiveController(self._plans[k], self.curves[name], predictive[name],
+                                                  period, self.load)
+                self.controllers[name] = self._plans[k] = controller
+        self.predictive = bool(self.controllers)
+        self._recorders = tuple((self.fan_names.index(name), c) for name, c in self.controllers.items())
+        self.refit_every = min((c.refit_every for c in self.controllers.values()), default=0.0)
+        self.next_refit = 0.0  # Próximo ajuste del modelo térmico (timestamp de muestra)
+
+    def evaluate(self, temps: Sequence[float]) -> array:
+        """Calcula el PWM objetivo de todos los ventiladores (orden de fan_names)"""
+        targets, inputs = self.targets, self.inputs
+        for k, plan in enumerate(self._plans):
+            targets[k], inputs[k] = plan(temps)
+        return targets
+
+    def record(self, written: Sequence[int]):
+        """PWM escrito por canal (orden de fan_names) para el modelo de los predictivos"""
+        for k, controller in self._recorders:
+            controller.record(written[k])
+
+    def adopt(self, other: "ControlEngine"):
+        """Conserva lo aprendido por los controladores predictivos de otra configuración"""
+        for name, controller in self.controllers.items():
+            previous = other.controllers.get(name)
+            if previous is not None and previous is not controller:
+                controller.adopt(previous)
+        self.load[:] = other.load
+        self.next_refit = other.next_refit
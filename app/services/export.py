@@ -0,0 +1,228 @@
+import csv
+import io
+import json
+import struct
+import sys
+from array import array
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Formatos de exportación y su tipo MIME
+FORMATS: Dict[str, str] = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "binary": "application/octet-stream",
+}
+DOWNSAMPLING = ("lttb", "minmax", "none")
+BINARY_MAGIC = b"FCH1"
+CHUNK = 4096  # Filas por bloque al recorrer el histórico
+
+Reader = Callable[[int, int], Tuple[List[float], List[float]]]
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """Formato según la cabecera Accept (JSON si no se reconoce ninguno)"""
+    if accept:
+        for part in accept.split(","):
+            media = part.split(";")[0].strip().lower()
+            for name, mime in FORMATS.items():
+                if media == mime:
+                    return name
+    return "json"
+
+
+# --- Reducción de puntos -----------------------------------------------------
+
+def lttb(read: Reader, n: int, threshold: int) -> List[int]:
+    """Largest-Triangle-Three-Buckets sobre n puntos leídos por tramos.
+
+    read(a, b) devuelve (x, y) de los puntos [a, b); cada bucket se lee una
+    sola vez, así que la memoria es la de dos buckets y no la del rango.
+    Devuelve los índices elegidos (incluye el primero y el último).
+    """
+    if threshold >= n:
+        return list(range(n))
+    if threshold < 3:
+        return [0, n - 1]
+    every = (n - 2) / (threshold - 2)
+    selected = [0]
+    (ax,), (ay,) = read(0, 1)
+
+    def bounds(i: int) -> Tuple[int, int]:
+        return int(i * every) + 1, min(int((i + 1) * every) + 1, n - 1)
+
+    lo, hi = bounds(0)
+    cur = read(lo, hi)
+    for i in range(threshold - 2):
+        # Media del bucket siguiente (el último punto si es el final)
+        nlo, nhi = bounds(i + 1)
+        nxt = read(nlo, nhi) if i < threshold - 3 else read(n - 1, n)
+        nx, ny = nxt
+        avg_x = sum(nx) / len(nx)
+        avg_y = sum(ny) / len(ny)
+
+        best, best_area = 0, -1.0
+        for k, (x, y) in enumerate(zip(*cur)):
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = k, area
+        selected.append(lo + best)
+        ax, ay = cur[0][best], cur[1][best]
+        lo, cur = nlo, nxt
+    selected.append(n - 1)
+    return selected
+
+
+def minmax(read: Reader, n: int, threshold: int) -> List[int]:
+    """Mínimo y máximo de cada bucket (conserva los picos); ~threshold índices"""
+    if threshold >= n:
+        return list(range(n))
+    buckets = max(1, threshold // 2)
+    selected: List[int] = []
+    for b in range(buckets):
+        lo, hi = b * n // buckets, (b + 1) * n // buckets
+        if hi <= lo:
+            continue
+        _, ys = read(lo, hi)
+        pairs = [(y, k) for k, y in enumerate(ys) if y == y]
+        if not pairs:
+            selected.append(lo)
+            continue
+        first, second = sorted((min(pairs)[1], max(pairs)[1]))
+        selected.append(lo + first)
+        if second != first:
+            selected.append(lo + second)
+    return selected
+
+
+# --- Resultado de una consulta ---------------------------------------------
+
+class HistoryExport:
+    """Resultado de una consulta de exportación, recorrido bajo demanda.
+
+    O bien un rango contiguo [lo, hi) del almacenamiento (se lee por
+    bloques de CHUNK filas), o bien un conjunto acotado de filas ya
+    seleccionadas (reducción de puntos o niveles agregados).
+
+    lo y hi son números de secuencia (count del almacenamiento), no índices
+    lógicos: las muestras que llegan mientras se envía la respuesta
+    desplazan los índices. Si el almacenamiento descarta filas del rango
+    antes de enviarlas, la exportación se corta y truncated pasa a True.
+    """
+
+    def __init__(self, fields: Sequence[str], typecodes: Dict[str, str], resolution: float,
+                 source=None, lo: int = 0, hi: int = 0, rows: Optional[List[Tuple]] = None,
+                 next_cursor: Optional[float] = None):
+        self.fields = tuple(fields)
+        self.typecodes = typecodes
+        self.resolution = resolution
+        self.next_cursor = next_cursor
+        self._source = source
+        self._lo, self._hi = lo, hi
+        self._rows = rows
+        self.truncated = False
+
+    def __len__(self) -> int:
+        return len(self._rows) if self._rows is not None else self._hi - self._lo
+
+    def chunks(self) -> Iterator[List[Tuple]]:
+        """Filas en bloques de como mucho CHUNK"""
+        if self._rows is not None:
+            for i in range(0, len(self._rows), CHUNK):
+                yield self._rows[i:i + CHUNK]
+            return
+        yield from self._read(lambda a, b: list(self._source.rows(a, b)))
+
+    def column_chunks(self, k: int) -> Iterator[array]:
+        """Una columna en bloques (para el formato binario columnar)"""
+        name = self.fields[k]
+        code = self.typecodes[name]
+        if self._rows is not None:
+            yield array(code, [row[k] for row in self._rows])
+            return
+        yield from self._read(lambda a, b: array(code, self._source.values(name, a, b)))
+
+    def _read(self, read: Callable[[int, int], Any]) -> Iterator:
+        """Bloques de [lo, hi) leídos con read(a, b) sobre índices lógicos del momento"""
+        source = self._source
+        for start in range(self._lo, self._hi, CHUNK):
+            first = source.count - len(source)  # Secuencia de la fila más antigua retenida
+            if start >= first:
+                data = read(start - first, min(start + CHUNK, self._hi) - first)
+                # Una fila sólo se sobrescribe al descartarse: si start sigue retenida, el bloque vale
+                if source.count - len(source) <= start:
+                    yield data
+                    continue
+            self.truncated = True
+            return
+
+
+# --- Codificación en streaming -------------------------------------------
+
+def _dumps(rows) -> str:
+    # NaN (lectura fallida) no es JSON válido
+    return json.dumps(rows, separators=(",", ":")).replace("NaN", "null")
+
+
+def encode_json(export: HistoryExport) -> Iterator[bytes]:
+    head = {"fields": export.fields, "resolution": export.resolution, "count": len(export),
+            "next_cursor": export.next_cursor}
+    yield (_dumps(head)[:-1] + ',"data":[').encode()
+    first = True
+    for chunk in export.chunks():
+        if not chunk:
+            continue
+        body = _dumps(chunk)[1:-1]
+        yield (body if first else "," + body).encode()
+        first = False
+    yield b"]}"
+
+
+def encode_ndjson(export: HistoryExport) -> Iterator[bytes]:
+    fields = export.fields
+    for chunk in export.chunks():
+        if chunk:
+            # Un solo dumps por bloque; los objetos sólo contienen números
+            body = _dumps([dict(zip(fields, row)) for row in chunk])
+            yield (body[1:-1].replace("},{", "}\n{") + "\n").encode()
+
+
+def encode_csv(export: HistoryExport) -> Iterator[bytes]:
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(export.fields)
+    for chunk in export.chunks():
+        writer.writerows(chunk)
+        yield out.getvalue().encode()
+        out.seek(0)
+        out.truncate()
+    if out.tell():
+        yield out.getvalue().encode()
+
+
+def encode_binary(export: HistoryExport) -> Iterator[bytes]:
+    """Columnas little-endian contiguas.
+
+    Cabecera: b"FCH1", uint32 filas, float64 resolución, uint8 columnas y por
+    columna uint8 longitud + nombre ASCII + código de tipo de array (1 byte).
+    Después, cada columna completa en el orden de la cabecera.
+    """
+    header = bytearray(BINARY_MAGIC)
+    header += struct.pack("<IdB", len(export), float(export.resolution), len(export.fields))
+    for name in export.fields:
+        header += struct.pack("<B", len(name)) + name.encode() + export.typecodes[name].encode()
+    yield bytes(header)
+    swap = sys.byteorder != "little"
+    for k in range(len(export.fields)):
+        for chunk in export.column_chunks(k):
+            if swap:
+                chunk.byteswap()
+            yield chunk.tobytes()
+
+
+ENCODERS: Dict[str, Callable[[HistoryExport], Iterator[bytes]]] = {
+    "json": encode_json,
+    "ndjson": encode_ndjson,
+    "csv": encode_csv,
+    "binary": encode_binary,
+}
@@ -1,176 +1,675 @@
 import os
 import json
+import logging
+import math
+import time
 import asyncio
 from pathlib import Path
-from typing import Dict, Optional
-from ..models.config import FanConfig, ControlCurve, AlertConfig
+from typing import Callable, Dict, List, Optional, Tuple
+from ..models.config import ControlCurve, FanConfig, default_config
+from ..models.sensor import Sample
+from .actuator import PwmActuator
+from .alerts import AlertService
+from .analytics import StreamAnalytics
+from .broadcast import BroadcastHub
+from .discovery import HwmonDiscovery
+from .engine import ControlEngine
+from .hwmon import HwmonIO
+from .metrics import Metrics
+from .predictive import LoadSensor, fit_thermal_model
+from .profiles import ProfileService
+from .scheduler import ProfileScheduler
+from .state import ControlState
+from .watcher import ConfigWatcher
 
 
 class FanControlService:
-    def __init__(self, history_service):
+    FAILSAFE_ERRORS = 3  # Errores consecutivos del bucle antes de forzar PWM máximo
+
+    CONFIG_FILE = "/etc/fancontrol.json"
+
+    def __init__(self, history_service, config: Optional[FanConfig] = None,
+                 clock: Optional[Callable[[], float]] = None, config_file: Optional[str] = None):
+        """config y clock permiten ejecutar el servicio sobre un árbol simulado y en tiempo virtual"""
+        self.logger = logging.getLogger(__name__)
         self.history = history_service
-        self.config_file = Path("/etc/fancontrol.json")
-        self.config = self._load_default_config()
-        self.current_pwm = {"fan1": 90, "fan2": 14}
-        self.lock = asyncio.Lock()
+        self.config_file = Path(config_file or self.CONFIG_FILE)
+        # Sólo se vigila el fichero si la configuración sale de él
+        self.watch_config = config is None
+        config = config or self._load_default_config()
+        self.clock = clock or time.time             # Marcas de tiempo de las muestras
+        self._monotonic = clock or time.monotonic   # Intervalos del actuador
+        self.hub = BroadcastHub()
+        self.metrics = Metrics()
+        self.discovery = HwmonDiscovery(config.hwmon_root, self._monotonic)
+        self.load_sensor = LoadSensor(config.proc_root)  # Sólo se lee con ventiladores predictivos
+        self.profiles = ProfileService()
+        # state: última configuración publicada; _active: la que usa el bucle;
+        # _confirmed: la última con la que el bucle completó un tick (rollback)
+        self.state = self._build_state(config)
+        self._active = self._confirmed = self.state
+        self.unresolved = list(self.state.unresolved)
+        # Rutas absolutas resueltas por discovery bajo hwmon_root
+        self.hwmon = HwmonIO(config.hwmon_root, self.state.inputs, self.state.outputs)
+        self.actuator = self._build_actuator()
+        self.watcher = ConfigWatcher(self.config_file, self.reload_config)
+        self.reloads = 0
+        self.reload_errors = 0
+        self.rollbacks = 0
+        self.last_reload_error: Optional[str] = None
+        self._apply_lock = asyncio.Lock()
+        self._listener = None
+        self._background = set()
+        self._monitor_task: Optional[asyncio.Task] = None
+        self._scheduled = None  # Último perfil elegido por el planificador
+        self._alert_values: Dict[str, float] = {}
+
+    def _read_config(self) -> FanConfig:
+        with open(self.config_file, 'r') as f:
+            return FanConfig(**json.load(f))
 
     def _load_default_config(self) -> FanConfig:
         """Carga la configuración por defecto o desde archivo"""
-        default_config = FanConfig(
-            fan1=ControlCurve(
-                min_pwm=22,
-                max_pwm=255,
-                curve=[(50, 90), (80, 255)],
-                hysteresis=3
-            ),
-            fan2=ControlCurve(
-                min_pwm=4,
-                max_pwm=100,
-                curve=[(0, 14)],
-                hysteresis=0
-            ),
-            alerts=AlertConfig(
-                temp_threshold=85,
-                rpm_threshold=500,
-                temp_critical=95
-            )
+        if self.config_file.exists():
+            try:
+                return self._read_config()
+            except Exception as e:
+                self.logger.error(f"Error loading config: {e}")
+
+        return default_config()
+
+    def _save_config(self, config: FanConfig):
+        """Escritura atómica: el watcher nunca lee un fichero a medias.
+
+        Necesita escribir en el directorio de config_file (OSError si no puede).
+        """
+        tmp = self.config_file.with_name(f".{self.config_file.name}.tmp")
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(json.loads(config.json()), f, indent=2)
+            os.replace(tmp, self.config_file)
+        except OSError as e:
+            tmp.unlink(missing_ok=True)
+            raise OSError(e.errno, f"No se puede guardar la configuración en {self.config_file}: "
+                                   f"{e.strerror}") from e
+
+    # --- Configuración compilada ---------------------------------------------
+
+    @property
+    def config(self) -> FanConfig:
+        return self._active.config
+
+    @property
+    def engine(self) -> ControlEngine:
+        return self._active.engine
+
+    @property
+    def curves(self):
+        return self._active.curves
+
+    @property
+    def alerts(self) -> AlertService:
+        return self._active.alerts
+
+    @property
+    def analytics(self) -> StreamAnalytics:
+        return self._active.analytics
+
+    def _build_state(self, base: FanConfig, previous: Optional[ControlState] = None,
+                     profile: Optional[str] = None, ramp: bool = False) -> ControlState:
+        """Valida y compila una configuración (con un perfil encima) sin tocar el servicio.
+
+        Se ejecuta fuera del bucle; cualquier excepción deja intacta la configuración activa.
+        """
+        config = self.profiles.apply(base, profile) if profile is not None else base
+        if previous is not None and config.hwmon_root != previous.config.hwmon_root:
+            raise ValueError("hwmon_root sólo se puede cambiar reiniciando el servicio")
+        if previous is not None and config.proc_root != previous.config.proc_root:
+            raise ValueError("proc_root sólo se puede cambiar reiniciando el servicio")
+        zones, fans = config.control_layout()
+        engine = ControlEngine(list(zones), fans, config.predictive, 1.0 / config.sample_rate)
+        inputs, outputs, unresolved = self._resolve_channels(config)
+        if previous is not None:
+            missing = sorted(set(unresolved) - set(previous.unresolved))
+            if missing:
+                raise ValueError(f"Canales sin resolver: {missing}")
+
+        # Alertas y analítica guardan estado: sólo se recrean si cambia lo que usan
+        alerts_key = self._alerts_key(config)
+        if previous is not None and alerts_key == self._alerts_key(previous.config):
+            alerts = previous.alerts
+        else:
+            alerts = AlertService(*alerts_key)
+        if previous is not None and self._analytics_key(config) == self._analytics_key(previous.config):
+            analytics, names = previous.analytics, previous.signal_names
+        else:
+            analytics, names = self._build_analytics(config, engine)
+            analytics.prime(self.history.get_columns(since=self.clock() - analytics.span))
+        if previous is not None and config.schedule == previous.config.schedule:
+            scheduler = previous.scheduler
+        else:
+            scheduler = ProfileScheduler(config.schedule, self.profiles.profiles)
+        version = previous.version + 1 if previous is not None else 1
+        # Rampa sólo al cambiar de perfil, no al editar la configuración
+        changed = ramp and previous is not None and profile != previous.profile
+        return ControlState(version, config, engine, inputs, outputs, tuple(unresolved),
+                            alerts, analytics, names, scheduler, profile, base,
+                            config.schedule.ramp_rate if changed else 0.0)
+
+    @staticmethod
+    def _alerts_key(config: FanConfig):
+        zones, fans = config.control_layout()
+        return (config.alerts, list(zones), [name for name, fan in fans.items() if fan.rpm],
+                sorted(config.calibration))
+
+    @staticmethod
+    def _analytics_key(config: FanConfig):
+        zones, fans = config.control_layout()
+        return (config.sample_rate, config.stats_windows, config.calibration, config.alerts.rise_score,
+                list(zones)[:1], list(fans)[:2], FanControlService._load_windows(config))
+
+    @staticmethod
+    def _load_windows(config: FanConfig) -> List[float]:
+        """Ventanas de las reglas de carga del planificador"""
+        return [rule.window for rule in config.schedule.rules if rule.above is not None]
+
+    def _build_actuator(self) -> PwmActuator:
+        state = self.state
+        return PwmActuator(
+            self.hwmon, state.engine.fan_names,
+            min_pwm=state.min_pwm,
+            hysteresis=state.hysteresis,
+            min_interval=state.min_interval,
+            clock=self._monotonic,
         )
 
-        if self.config_file.exists():
+    @staticmethod
+    def _build_analytics(config: FanConfig, engine: ControlEngine) -> Tuple[StreamAnalytics, Dict[str, str]]:
+        """Analítica sobre las columnas del histórico y nombres de sus señales para las alertas"""
+        zone = engine.zones[0] if engine.zones else "temp"
+        fan_a, fan_b = (engine.fan_names + ("", ""))[:2]
+        columns = {"fan1": fan_a, "fan2": fan_b}
+        calibration = {col: config.calibration[name] for col, name in columns.items()
+                       if name in config.calibration}
+        analytics = StreamAnalytics(config.sample_rate, config.stats_windows, calibration,
+                                    config.alerts.rise_score, FanControlService._load_windows(config))
+        names = {f"{col}_rpm_deviation": f"{name}_rpm_deviation" for col, name in columns.items()}
+        names["temp_rise_score"] = f"{zone}_rise_score"
+        return analytics, names
+
+    async def apply_config(self, config: FanConfig, save: bool = False) -> ControlState:
+        """Valida y compila una configuración base fuera del bucle y la publica para el siguiente tick.
+
+        El perfil activo se sigue aplicando encima. Si no es válida lanza
+        ValueError y la configuración activa no cambia. Con save también se
+        escribe en config_file.
+        """
+        return await self._publish(config, self.state.profile, save=save)
+
+    async def apply_profile(self, profile: Optional[str], ramp: bool = True) -> ControlState:
+        """Aplica un perfil (None: ninguno) sobre la configuración base, con rampa de PWM"""
+        if profile is not None and profile not in self.profiles.profiles:
+            raise ValueError(f"Perfil desconocido: {profile}")
+        return await self._publish(self.state.base, profile, ramp=ramp)
+
+    async def replay(self, start: float, end: float, curves: Optional[Dict[str, ControlCurve]] = None,
+                     profile: Optional[str] = None, temp_critical: Optional[float] = None,
+                     high_pwm: Optional[int] = None, max_points: int = 1000) -> Dict:
+        """What-if: reproduce [start, end] del histórico con otras curvas, perfil o watchdog.
+
+        Parte de la configuración activa (su perfil, si no se indica otro) y
+        no aplica nada. La copia de [start, end] y la reproducción se hacen
+        en un executor. ValueError si la candidata no es válida.
+        """
+        # Sólo para el what-if: no entra en el arranque del control
+        from .replay import HIGH_PWM, history_columns, what_if
+
+        if profile is not None and profile not in self.profiles.profiles:
+            raise ValueError(f"Perfil desconocido: {profile}")
+        state = self.state
+        profile = profile if profile is not None else state.profile
+        config = self.profiles.apply(state.base, profile) if profile is not None else state.base
+        alerts = {"temp_critical": temp_critical} if temp_critical is not None else {}
+        if curves or alerts:
+            config = config.with_curves(curves or {}, **alerts)
+        high_pwm = HIGH_PWM if high_pwm is None else high_pwm
+
+        def run():
+            return what_if(config, history_columns(self.history, start, end), high_pwm, max_points)
+
+        return await asyncio.get_running_loop().run_in_executor(None, run)
+
+    async def _publish(self, base: FanConfig, profile: Optional[str], save: bool = False,
+                       ramp: bool = False) -> ControlState:
+        async with self._apply_lock:
+            current = self.state
+            loop = asyncio.get_running_loop()
+            if base == current.base and profile == current.profile:
+                if save:
+                    await loop.run_in_executor(None, self._save_config, base)
+                return current
             try:
-                with open(self.config_file, 'r') as f:
-                    return FanConfig(**json.load(f))
+                state = await loop.run_in_executor(None, self._build_state, base, current, profile, ramp)
             except Exception as e:
-                print(f"Error loading config: {e}")
+                raise ValueError(str(e)) from e
+            if save:
+                # Antes de publicar: la recarga que provoca en el watcher no cambia nada
+                await loop.run_in_executor(None, self._save_config, base)
+            if state.alerts is not current.alerts:
+                await state.alerts.start()
+            if current is not self._active and current.alerts not in (self._active.alerts, state.alerts):
+                # Publicada pero sustituida antes de llegar al bucle
+                await current.alerts.stop()
+            self.state = state
+            self.reloads += 1
+            return state
+
+    async def reload_config(self) -> bool:
+        """Relee config_file y lo aplica; si no es válido se mantiene la configuración activa"""
+        loop = asyncio.get_running_loop()
+        try:
+            config = await loop.run_in_executor(None, self._read_config)
+            await self.apply_config(config)
+        except Exception as e:
+            self.reload_errors += 1
+            self.last_reload_error = str(e)
+            self.logger.error(f"Error reloading config: {e}")
+            return False
+        self.last_reload_error = None
+        return True
 
-        return default_config
+    def _wire(self, state: ControlState):
+        """Ajusta actuador, ficheros hwmon y oyente de analítica a un estado"""
+        if state.engine is not self._active.engine:
+            state.engine.adopt(self._active.engine)
+        self.actuator.reconfigure(state.engine.fan_names, state.min_pwm, state.hysteresis,
+                                  state.min_interval)
+        if state.inputs != self.hwmon.inputs or state.outputs != self.hwmon.outputs:
+            self.hwmon.rebind(state.inputs, state.outputs)
+        if state.ramp_rate:
+            self.actuator.start_ramp(state.ramp_rate)
+        listener = state.analytics.update
+        if self._listener is not None and listener != self._listener:
+            listeners = self.history.listeners
+            if self._listener in listeners:
+                listeners.remove(self._listener)
+            listeners.append(listener)
+            self._listener = listener
+
+    def _activate(self, state: ControlState) -> ControlState:
+        """Pasa el bucle a una configuración publicada (entre dos ticks)"""
+        previous = self._active
+        try:
+            self._wire(state)
+        except Exception as e:
+            self.logger.error(f"Error applying config v{state.version}: {e}")
+            self._wire(previous)
+            if self.state is state:
+                self.state = previous
+            self.rollbacks += 1
+            return previous
+        self._active = state
+        self.unresolved = list(state.unresolved)
+        if previous is not self._confirmed and previous.alerts not in (state.alerts, self._confirmed.alerts):
+            self._retire(previous.alerts)
+        return state
+
+    def _confirm(self, state: ControlState):
+        """El bucle ha completado un tick con state: ya no se vuelve a la anterior"""
+        previous, self._confirmed = self._confirmed, state
+        if previous.alerts is not state.alerts:
+            self._retire(previous.alerts)
+
+    def _rollback(self):
+        """Tras un error, vuelve a la última configuración que completó un tick"""
+        failed = self._active
+        if failed is self._confirmed:
+            return
+        self.logger.warning(f"Config v{failed.version} failed, rolling back to v{self._confirmed.version}")
+        if self.state is failed:
+            self.state = self._confirmed
+        self.rollbacks += 1
+
+    def _retire(self, alerts: AlertService):
+        self._spawn(alerts.stop())
+
+    def _spawn(self, coro):
+        """Tarea en segundo plano que cleanup() espera antes de cerrar"""
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def config_status(self) -> Dict:
+        return {
+            **self._active.describe(),
+            "published": self.state.version,
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+            "rollbacks": self.rollbacks,
+            "last_error": self.last_reload_error,
+            "watcher": self.watcher.stats() if self.watch_config else None,
+            "schedule": self._active.scheduler.describe(),
+        }
+
+    @property
+    def current_pwm(self) -> Dict[str, int]:
+        """Último PWM escrito en el hardware por ventilador"""
+        return self.actuator.values()
+
+    def _resolve_channels(self, config: FanConfig) -> Tuple[Dict[str, str], Dict[str, str], List[str]]:
+        """Traduce los canales de la configuración a rutas usando el índice hwmon"""
+        zones, fans = config.control_layout()
+        wanted = [("inputs", name, spec) for name, spec in zones.items()]
+        for name, fan in fans.items():
+            wanted.append(("outputs", name, fan.pwm))
+            if fan.rpm:
+                wanted.append(("inputs", f"{name}_rpm", fan.rpm))
+
+        resolved: Dict[str, Dict[str, str]] = {"inputs": {}, "outputs": {}}
+        unresolved = []
+        for group, name, spec in wanted:
+            try:
+                resolved[group][name] = str(self.discovery.resolve(spec))
+            except KeyError as e:
+                self.logger.warning(f"Error resolving {name}: {e}")
+                unresolved.append(name)
+        return resolved["inputs"], resolved["outputs"], unresolved
 
     async def initialize(self):
         """Inicialización del controlador"""
-        await self._apply_pwm("fan1", self.current_pwm["fan1"])
-        await self._apply_pwm("fan2", self.current_pwm["fan2"])
-        asyncio.create_task(self._monitor_loop())
+        # Valores iniciales clásicos; los ventiladores nuevos arrancan a su máximo
+        initial = {"fan1": 90, "fan2": 14}
+        for name in self.engine.fan_names:
+            self.actuator.request(name, initial.get(name, self.curves[name].max_pwm), "watchdog")
+        await self.actuator.flush()
+        await self.alerts.start()
+        self._listener = self.analytics.update
+        self.history.listeners.append(self._listener)
+        if self.watch_config:
+            await self.watcher.start()
+        # Perfil inicial del planificador, sin rampa: aún no hay PWM automático que suavizar
+        scheduler = self.state.scheduler
+        if scheduler.enabled:
+            self._scheduled = scheduler.evaluate(self.clock(), self.analytics.window_mean)
+            if self._scheduled is not None:
+                await self._switch_profile(self._scheduled, ramp=False)
+        self._monitor_task = asyncio.create_task(self._monitor_loop())
 
     async def cleanup(self):
         """Limpieza al detener el servicio"""
-        pass
+        # Primero el bucle: no debe tocar el hardware ni las alertas que se cierran después
+        if self._monitor_task is not None:
+            self._monitor_task.cancel()
+            await asyncio.gather(self._monitor_task, return_exceptions=True)
+            self._monitor_task = None
+        await self.watcher.stop()
+        # Cambios de perfil y retiradas de alertas en curso: son cortos, se dejan terminar
+        await asyncio.gather(*self._background, return_exceptions=True)
+        for alerts in {self.state.alerts, self._active.alerts, self._confirmed.alerts}:
+            await alerts.stop()
+        if self._listener in self.history.listeners:
+            self.history.listeners.remove(self._listener)
+        self.hwmon.close()
+        self.load_sensor.close()
 
     async def _monitor_loop(self):
-        """Bucle principal de monitorización"""
+        """Bucle principal de monitorización, planificado sobre deadlines monótonos.
+
+        Los sensores se muestrean a sample_rate Hz y los PWM se escriben a
+        control_rate Hz (las subidas y el watchdog no esperan). Si un ciclo se
+        pasa de su deadline se saltan los ticks perdidos en vez de acumularlos.
+        Los periodos salen de la configuración activa, así que una recarga
+        los cambia a partir del tick siguiente.
+        """
+        metrics = self.metrics
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        tick = 0
+        errors = 0
         while True:
             try:
-                await self._update_sensors()
-                await self._check_alerts()
-                await asyncio.sleep(1)
+                await self.step(control=tick % self._active.control_every == 0)
+                errors = 0
             except Exception as e:
-                print(f"Monitor error: {e}")
-                await asyncio.sleep(5)
-
-    async def _update_sensors(self):
-        """Actualiza los valores de los sensores"""
-        temp = await self._read_sensor("temp2")
-        fan1_rpm = await self._read_sensor("fan1")
-        fan2_rpm = await self._read_sensor("fan2")
-
-        # Control automático de fan1 basado en temperatura
-        new_pwm = self._calculate_pwm(temp)
-        await self._apply_pwm("fan1", new_pwm)
-
-        # Mantener fan2 constante
-        await self._apply_pwm("fan2", self.current_pwm["fan2"])
-
-        # Guardar histórico
-        self.history.add_record({
-            "timestamp": int(time.time()),
-            "temp": temp,
-            "fan1_rpm": fan1_rpm,
-            "fan2_rpm": fan2_rpm,
-            "pwm1": self.current_pwm["fan1"],
-            "pwm2": self.current_pwm["fan2"]
-        })
-
-    def _calculate_pwm(self, temp: float) -> int:
-        """Calcula el valor PWM basado en la curva de control"""
-        curve = self.config.fan1.curve
-        current_pwm = self.current_pwm["fan1"]
-
-        # Ordenar puntos de la curva por temperatura
-        curve_sorted = sorted(curve, key=lambda x: x[0])
-
-        # Encontrar el segmento adecuado
-        for i in range(len(curve_sorted) - 1):
-            t1, pwm1 = curve_sorted[i]
-            t2, pwm2 = curve_sorted[i + 1]
-
-            if t1 <= temp <= t2:
-                # Interpolación lineal
-                ratio = (temp - t1) / (t2 - t1)
-                new_pwm = pwm1 + (pwm2 - pwm1) * ratio
-                return min(max(int(new_pwm), self.config.fan1.min_pwm), self.config.fan1.max_pwm)
-
-        # Fuera de rango - usar extremos
-        if temp < curve_sorted[0][0]:
-            return curve_sorted[0][1]
-        return curve_sorted[-1][1]
-
-    async def _apply_pwm(self, fan: str, value: int):
-        """Aplica un valor PWM al ventilador con seguridad"""
-        async with self.lock:
-            # Aplicar límites de hardware
-            if fan == "fan1":
-                value = max(self.config.fan1.min_pwm, min(value, 255))
-            elif fan == "fan2":
-                value = max(self.config.fan2.min_pwm, min(value, 255))
-
-            # Aplicar histeresis para evitar oscilaciones
-            current = self.current_pwm[fan]
-            if abs(value - current) < 5:  # Pequeño umbral de cambio
-                return
+                errors += 1
+                self.logger.error(f"Monitor error: {e}")
+                self._rollback()
+                if errors >= self.FAILSAFE_ERRORS:
+                    await self._failsafe()
+
+            tick += 1
+            period = self._active.period
+            deadline += period
+            now = loop.time()
+            if now >= deadline:
+                # Overrun: descartar los ticks perdidos y reanclar al siguiente
+                missed = int((now - deadline) // period) + 1
+                metrics.loop_overruns += missed
+                tick += missed
+                deadline += missed * period
+            await asyncio.sleep(deadline - now)
+
+    async def step(self, control: bool = True) -> Sample:
+        """Un ciclo del bucle: sensores, control, difusión y alertas"""
+        # Única lectura de la configuración publicada en todo el tick
+        state = self.state
+        if state is not self._active:
+            state = self._activate(state)
+        sample = await self._update_sensors(state, control)
+        self.hub.publish(self.history.get_last_json())
+        t = time.perf_counter()
+        self._check_alerts(state, sample.timestamp)
+        self.metrics.observe("alerts", time.perf_counter() - t)
+        self.metrics.ticks += 1
+        if state is not self._confirmed:
+            self._confirm(state)
+        # Perfiles: un solo timestamp por tick; las reglas se evalúan sólo en el próximo cambio
+        if sample.timestamp >= state.scheduler.next_at:
+            self._run_schedule(state.scheduler, sample.timestamp)
+        engine = state.engine
+        if engine.predictive and sample.timestamp >= engine.next_refit:
+            engine.next_refit = sample.timestamp + engine.refit_every
+            self._spawn(self._refit(engine))
+        return sample
 
-            # Escribir al hardware (necesita sudo)
-            pwm_file = f"/sys/class/hwmon/hwmon0/pwm{1 if fan == 'fan1' else 2}"
+    async def _refit(self, engine: ControlEngine):
+        """Reajusta el modelo térmico de los ventiladores predictivos en un executor"""
+        loop = asyncio.get_running_loop()
+        for name, controller in engine.controllers.items():
             try:
-                with open(pwm_file, 'w') as f:
-                    f.write(str(value))
-                self.current_pwm[fan] = value
+                data = controller.snapshot()
+                if data is None:
+                    continue
+                result = await loop.run_in_executor(None, fit_thermal_model, *data, controller.period,
+                                                    controller.setpoint)
+            except ImportError:
+                self.logger.warning("NumPy no disponible: los ventiladores predictivos siguen su curva")
+                engine.next_refit = math.inf
+                return
             except Exception as e:
-                print(f"Error writing PWM {fan}: {e}")
+                self.logger.error(f"Error fitting thermal model for {name}: {e}")
+                continue
+            if result is not None:
+                controller.set_model(*result)
+
+    def _run_schedule(self, scheduler: ProfileScheduler, now: float):
+        """Evalúa el planificador y, si cambia su perfil, lo aplica fuera del bucle"""
+        profile = scheduler.evaluate(now, self.analytics.window_mean)
+        if profile == self._scheduled:
+            return
+        # Un perfil aplicado a mano se respeta hasta que cambia el del planificador
+        self._scheduled = profile
+        if profile != self.state.profile:
+            self.logger.info(f"Profile {profile or '(base)'} ({scheduler.reason})")
+            self._spawn(self._switch_profile(profile))
+
+    async def _switch_profile(self, profile: Optional[str], ramp: bool = True):
+        try:
+            await self.apply_profile(profile, ramp)
+        except ValueError as e:
+            self.logger.error(f"Error applying profile {profile}: {e}")
 
-    async def _read_sensor(self, sensor: str) -> float:
-        """Lee un valor del sensor del hardware"""
+    async def _failsafe(self):
+        """Tras varios errores seguidos: PWM máximo en todos los ventiladores"""
         try:
-            if sensor.startswith("temp"):
-                path = f"/sys/class/hwmon/hwmon0/{sensor}_input"
-            else:  # fan
-                path = f"/sys/class/hwmon/hwmon0/{sensor}_input"
-
-            with open(path, 'r') as f:
-                value = float(f.read().strip())
-
-            # Convertir temperatura a °C (si es necesario)
-            if sensor.startswith("temp"):
-                return value / 1000
-            return value
+            for name in self.engine.fan_names:
+                self.actuator.request(name, 255, "watchdog")
+            await self.actuator.flush()
         except Exception as e:
-            print(f"Error reading {sensor}: {e}")
-            return 0.0
+            self.logger.error(f"Failsafe error: {e}")
 
-    async def _check_alerts(self):
-        """Verifica condiciones de alerta"""
-        last_record = self.history.get_last_record()
-        if not last_record:
-            return
+    async def _update_sensors(self, state: ControlState, control: bool = True) -> Sample:
+        """Actualiza los valores de los sensores y devuelve la muestra"""
+        observe = self.metrics.observe
+        perf = time.perf_counter
+
+        # Un único lote de lecturas por tick, fuera del event loop
+        t0 = perf()
+        snapshot = await self.hwmon.read()
+        if snapshot.errors and self.discovery.refresh():
+            # Los hwmonN han cambiado: volver a resolver los canales
+            inputs, outputs, self.unresolved = self._resolve_channels(state.config)
+            self.hwmon.rebind(inputs, outputs)
+        engine = state.engine
+        temps = engine.temps
+        for k, zone in enumerate(engine.zones):
+            temps[k] = snapshot.get(zone)
+        rpms = engine.rpms
+        for k, channel in enumerate(engine.rpm_channels):
+            rpms[k] = snapshot.get(channel)
+        if engine.predictive:
+            self.load_sensor.read(engine.load)
+
+        # Control automático de todos los ventiladores en una pasada
+        t1 = perf()
+        observe("read", t1 - t0)
+        targets = engine.evaluate(temps)
+        request = self.actuator.request
+        for name, value, temp in zip(engine.fan_names, targets, engine.inputs):
+            request(name, value, "auto", temp)
+
+        # Watchdog: PWM máximo en todos los ventiladores si se alcanza la temperatura crítica
+        if max(temps, default=0.0) >= state.temp_critical:
+            for name in engine.fan_names:
+                request(name, 255, "watchdog")
+
+        # Una única escritura por canal en los ticks de control; las subidas
+        # y el watchdog se aplican en el mismo tick de muestreo
+        t2 = perf()
+        observe("evaluate", t2 - t1)
+        if control or self.actuator.needs_flush():
+            await self.actuator.flush()
+        if engine.predictive:
+            engine.record(self.actuator.written)
+        t3 = perf()
+        observe("write", t3 - t2)
+
+        # Guardar histórico (columnas clásicas: primera zona y dos primeros ventiladores)
+        fan_a, fan_b = (engine.fan_names + ("", ""))[:2]
+        sample = Sample(
+            round(self.clock(), 3),
+            temps[0] if temps else 0.0,
+            rpms[0] if fan_a else math.nan,
+            rpms[1] if fan_b else math.nan,
+            self.actuator.value(fan_a) if fan_a else 0,
+            self.actuator.value(fan_b) if fan_b else 0,
+        )
+        self.history.add_record(sample)
+        observe("history", perf() - t3)
+        return sample
+
+    def _calculate_pwm(self, temp: float, fan: str = "fan1") -> int:
+        """Calcula el valor PWM basado en la curva de control"""
+        return self.curves[fan](temp)
+
+    def set_manual_pwm(self, fan: str, value: int, hold: float = 600.0):
+        """Fija un PWM manual; se aplica en el siguiente tick sin esperar al bucle"""
+        self.actuator.set_manual(fan, value, hold)
+
+    def release_manual_pwm(self, fan: Optional[str] = None):
+        """Devuelve uno o todos los ventiladores al control automático"""
+        self.actuator.release_manual(fan)
+
+    def collect_metrics(self):
+        """Valores actuales para /metrics: (nombre, tipo, ayuda, labels, valor)"""
+        engine, actuator, hub = self.engine, self.actuator, self.hub
+        for zone, temp in zip(engine.zones, engine.temps):
+            yield ("fancontrol_temperature_celsius", "gauge", "Temperatura por zona",
+                   {"zone": zone}, temp)
+        for name, target, rpm in zip(engine.fan_names, engine.targets, engine.rpms):
+            yield ("fancontrol_fan_rpm", "gauge", "RPM por ventilador",
+                   {"fan": name}, rpm)
+            yield ("fancontrol_pwm", "gauge", "PWM escrito en el hardware",
+                   {"fan": name}, actuator.value(name))
+            yield ("fancontrol_pwm_target", "gauge", "PWM calculado por la curva",
+                   {"fan": name}, target)
+        for result, value in (("issued", actuator.writes_issued),
+                              ("suppressed", actuator.writes_suppressed),
+                              ("error", actuator.write_errors)):
+            yield ("fancontrol_pwm_writes_total", "counter", "Escrituras PWM por resultado",
+                   {"result": result}, value)
+        if engine.predictive:
+            yield ("fancontrol_cpu_utilization", "gauge", "Utilización de CPU (0-1, /proc/stat)",
+                   {}, engine.load[0])
+            yield ("fancontrol_load_per_cpu", "gauge", "Carga media de 1 minuto por CPU",
+                   {}, engine.load[1])
+            for name, controller in engine.controllers.items():
+                yield ("fancontrol_predictive_feedforward_pwm", "gauge",
+                       "PWM de feed-forward del control predictivo", {"fan": name}, controller.feedforward)
+                yield ("fancontrol_predictive_model_r2", "gauge", "R² del modelo térmico ajustado",
+                       {"fan": name}, controller.r2)
+        yield ("fancontrol_config_version", "gauge", "Versión de la configuración activa",
+               {}, self._active.version)
+        for result, value in (("applied", self.reloads), ("failed", self.reload_errors),
+                              ("rolled_back", self.rollbacks)):
+            yield ("fancontrol_config_reloads_total", "counter", "Recargas de configuración por resultado",
+                   {"result": result}, value)
+        yield ("fancontrol_loop_ticks_total", "counter", "Ciclos del bucle de monitorización",
+               {}, self.metrics.ticks)
+        yield ("fancontrol_loop_overruns_total", "counter", "Ciclos que superaron el periodo",
+               {}, self.metrics.loop_overruns)
+        yield ("fancontrol_sensor_read_failures_total", "counter", "Lecturas de sensor fallidas",
+               {}, self.hwmon.read_failures)
+        yield ("fancontrol_hwmon_timeouts_total", "counter", "Operaciones hwmon que superaron el timeout",
+               {}, self.hwmon.timeouts)
+        names = self._active.signal_names
+        for signal, value in self.analytics.signals().items():
+            name = names[signal]
+            if signal.endswith("_rpm_deviation"):
+                yield ("fancontrol_rpm_deviation", "gauge", "Desviación relativa de RPM frente a lo esperado",
+                       {"fan": name[:-len("_rpm_deviation")]}, value)
+            else:
+                yield ("fancontrol_temperature_rise_score", "gauge", "Subida de temperatura anómala (sigmas)",
+                       {"zone": name[:-len("_rise_score")]}, value)
+        yield ("fancontrol_alerts_active", "gauge", "Reglas de alerta activas",
+               {}, len(self.alerts.active()))
+        notifier = self.alerts.notifier
+        for result, value in (("sent", notifier.sent), ("failed", notifier.failed),
+                              ("dropped", notifier.dropped)):
+            yield ("fancontrol_notifications_total", "counter", "Notificaciones de alerta por resultado",
+                   {"result": result}, value)
+        yield ("fancontrol_sse_clients", "gauge", "Clientes de streaming conectados",
+               {}, hub.subscribers)
+        yield ("fancontrol_sse_frames_dropped_total", "counter", "Frames descartados por clientes lentos",
+               {}, hub.frames_dropped)
 
-        # Alerta de temperatura crítica (watchdog)
-        if last_record["temp"] >= self.config.alerts.temp_critical:
-            await self._apply_pwm("fan1", 255)
-            await self._apply_pwm("fan2", 255)
-            # TODO: Disparar alerta urgente
+    async def check_sensors_access(self) -> bool:
+        """Comprueba que los ficheros de sensores son legibles"""
+        return not self.unresolved and self.hwmon.check_access()
 
-        # Alerta de temperatura alta
-        elif last_record["temp"] >= self.config.alerts.temp_threshold:
-            pass  # TODO: Disparar alerta
+    async def check_pwm_access(self) -> bool:
+        """Comprueba que los ficheros PWM son escribibles"""
+        return self.hwmon.check_access(outputs=True)
 
-        # Alerta de RPM bajas
-        if last_record["fan1_rpm"] <= self.config.alerts.rpm_threshold:
-            pass  # TODO: Verificar duración y disparar alerta
\ No newline at end of file
+    def _check_alerts(self, state: ControlState, timestamp: float):
+        """Evalúa las reglas de alerta con la última muestra (el envío es asíncrono)"""
+        values = self._alert_values
+        engine = state.engine
+        for zone, temp in zip(engine.zones, engine.temps):
+            values[zone] = temp
+        for channel, rpm in zip(engine.rpm_channels, engine.rpms):
+            values[channel] = rpm
+        names = state.signal_names
+        for signal, value in state.analytics.signals().items():
+            values[names[signal]] = value
+        state.alerts.evaluate(timestamp, values)
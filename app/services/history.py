@@ -1,31 +1,262 @@
-import time
-from typing import List, Dict, Optional
-from ..models.sensor import SensorData
+from typing import Callable, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+from ..models.sensor import Sample, SensorData
+from .export import HistoryExport, lttb, minmax
+from .ringbuffer import RingBuffer
+from .rollup import DEFAULT_TIERS, ROLLUP_FIELDS, RollupTier
+
+# Columnas del histórico y su tipo en memoria (ver módulo array)
+FIELDS: Tuple[str, ...] = ("timestamp", "temp", "fan1_rpm", "fan2_rpm", "pwm1", "pwm2")
+TYPECODES: Dict[str, str] = {
+    "timestamp": "d",  # segundos epoch (precisión de ms)
+    "temp": "d",       # °C
+    "fan1_rpm": "f",   # las RPM son enteras, float32 es exacto
+    "fan2_rpm": "f",
+    "pwm1": "B",       # 0-255
+    "pwm2": "B",
+}
+assert Sample._fields == FIELDS and FIELDS[1:] == ROLLUP_FIELDS
+# Tipos al exportar medias de los niveles agregados (el PWM medio no es entero)
+_TIER_TYPECODES: Dict[str, str] = {**TYPECODES, "pwm1": "f", "pwm2": "f"}
+# Con lttb/minmax, muestras crudas por punto pedido a partir de las cuales se
+# reduce desde un nivel agregado en vez de recorrer el rango crudo
+RAW_OVERSAMPLING = 10
+
+
+class HistoryWindow(Sequence):
+    """Ventana de histórico que construye los SensorData bajo demanda"""
+
+    def __init__(self, buffer: RingBuffer, last_n: int):
+        self._buffer = buffer
+        self._len = max(0, min(last_n, len(buffer)))
+        self._offset = len(buffer) - self._len
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._len))]
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError("índice fuera de rango")
+        return SensorData(**dict(zip(FIELDS, self._buffer.row(self._offset + i))))
+
+    def __iter__(self) -> Iterator[SensorData]:
+        for i in range(self._len):
+            yield self[i]
+
+    def column(self, name: str) -> List[memoryview]:
+        """Vistas sin copia de una columna de la ventana"""
+        return self._buffer.segments(name, self._len)
 
 
 class HistoryService:
-    def __init__(self, max_records: int = 3600):
-        """Servicio para mantener histórico de datos"""
-        self.max_records = max_records  # 1 hora de datos a 1Hz
-        self._data: List[SensorData] = []
+    def __init__(self, max_records: int = 3 * 86400,
+                 tiers: Sequence[Tuple[int, int]] = DEFAULT_TIERS,
+                 backend=None, tier_replay: int = 86400):
+        """Servicio para mantener histórico de datos.
+
+        backend puede ser un SegmentStore para persistir en disco; por
+        defecto se usa un RingBuffer en memoria de max_records muestras.
+        """
+        self.max_records = max_records  # 3 días de datos a 1Hz
+        self._buffer = backend if backend is not None else RingBuffer(max_records, TYPECODES)
+        self.tiers: List[RollupTier] = [
+            RollupTier(resolution, capacity) for resolution, capacity in sorted(tiers)
+        ]
+        self._last: Optional[SensorData] = None
+        self._last_seq = -1
+        self._sample: Optional[Sample] = None
+        self._json: Optional[bytes] = None
+        self._json_seq = -1
+        # Funciones llamadas con cada muestra nueva (p.ej. analítica en streaming)
+        self.listeners: List[Callable[[Sample], None]] = []
+
+        # Los niveles agregados se reconstruyen con la cola del histórico persistido
+        # en rebuild_tiers(), después del arranque: es la siguiente muestra a agregar
+        # (número de secuencia), o None si están al día
+        size = len(self._buffer)
+        self._tier_seq: Optional[int] = self._buffer.count - min(size, tier_replay) \
+            if size and self.tiers else None
+        # Lo anterior a la cola reconstruida no está en los niveles
+        self._tiers_since = self._buffer.row(size - tier_replay)[0] \
+            if self.tiers and size > tier_replay else float("-inf")
+
+    def add_record(self, record: Union[Sample, Mapping]):
+        """Añade una muestra al histórico (se aceptan dicts por compatibilidad)"""
+        if not isinstance(record, Sample):
+            record = Sample(**record)
+        self._buffer.append(record)
+        self._sample = record
+        for listener in self.listeners:
+            listener(record)
+
+        # Actualizar incrementalmente los niveles agregados (si se están reconstruyendo,
+        # la reconstrucción llegará hasta esta muestra)
+        if self._tier_seq is None:
+            timestamp = record[0]
+            values = record[1:]
+            for tier in self.tiers:
+                tier.add(timestamp, values)
+
+    def rebuild_tiers(self, max_rows: Optional[int] = None) -> bool:
+        """Avanza la reconstrucción de los niveles agregados; True cuando están al día.
 
-    def add_record(self, record_data: Dict):
-        """Añade un nuevo registro al histórico"""
-        record = SensorData(**record_data)
-        self._data.append(record)
+        Con max_rows se procesa por tramos, para no bloquear el bucle de
+        eventos. Las consultas que usan los niveles la completan antes.
+        """
+        if self._tier_seq is None:
+            return True
+        buf = self._buffer
+        first = buf.count - len(buf)  # Secuencia de la muestra más antigua retenida
+        lo = max(self._tier_seq, first) - first
+        hi = len(buf) if max_rows is None else min(len(buf), lo + max_rows)
+        for row in buf.rows(lo, hi):
+            values = row[1:]
+            for tier in self.tiers:
+                tier.add(row[0], values)
+        self._tier_seq = first + hi if hi < len(buf) else None
+        return self._tier_seq is None
 
-        # Mantener sólo los últimos max_records
-        if len(self._data) > self.max_records:
-            self._data.pop(0)
+    def _select_tier(self, start: float, end: float, raw_points: int, raw: bool,
+                     max_points: int) -> Optional[RollupTier]:
+        """Nivel agregado que responde a [start, end] (None: las muestras crudas).
+
+        Las crudas si siguen cubriendo start y no pasan de RAW_OVERSAMPLING
+        veces max_points; si no, el nivel más fino que cubra start dentro de
+        ese mismo presupuesto de buckets, o el más grueso que lo cubra. Si
+        nada cubre start y las crudas tampoco, el nivel más grueso.
+        """
+        if not self.tiers or (raw and raw_points <= max_points * RAW_OVERSAMPLING):
+            return None
+        self.rebuild_tiers()
+        span = max(end - start, 0)
+        covering = [] if start < self._tiers_since else \
+            [t for t in self.tiers if t.buffer.covers("timestamp", start)]
+        for tier in covering:
+            if span / tier.resolution <= max_points * RAW_OVERSAMPLING:
+                return tier
+        if covering:
+            return covering[-1]
+        return None if raw else self.tiers[-1]
+
+    def get_last_sample(self) -> Optional[Sample]:
+        """Última muestra sin validar (también tras reabrir un histórico persistido)"""
+        if self._sample is None:
+            if not len(self._buffer):
+                return None
+            self._sample = Sample(*self._buffer.row(-1))
+        return self._sample
+
+    def get_last_json(self) -> Optional[bytes]:
+        """Última muestra codificada en JSON, una sola vez por muestra"""
+        if self._json_seq != self._buffer.count:
+            sample = self.get_last_sample()
+            if sample is None:
+                return None
+            self._json = sample.to_json()
+            self._json_seq = self._buffer.count
+        return self._json
 
     def get_last_record(self) -> Optional[SensorData]:
-        """Obtiene el último registro"""
-        return self._data[-1] if self._data else None
+        """Obtiene el último registro como modelo de la API"""
+        if not len(self._buffer):
+            return None
+        # Construir el modelo sólo una vez por muestra
+        if self._last_seq != self._buffer.count:
+            self._last = self.get_last_sample().to_model()
+            self._last_seq = self._buffer.count
+        return self._last
 
-    def get_history(self, last_n: int = 60) -> List[SensorData]:
+    def get_history(self, last_n: int = 60) -> HistoryWindow:
         """Obtiene los últimos N registros"""
-        return self._data[-last_n:] if self._data else []
+        return HistoryWindow(self._buffer, last_n)
+
+    def get_columns(self, last_n: Optional[int] = None, since: Optional[float] = None,
+                    fields: Sequence[str] = FIELDS,
+                    until: Optional[float] = None) -> Dict[str, List[memoryview]]:
+        """Obtiene las columnas de las últimas N muestras (o de [since, until]) como vistas sin copia"""
+        buf = self._buffer
+        stop = len(buf) if until is None else buf.bisect("timestamp", until + 1e-9)
+        if since is not None:
+            last_n = max(0, stop - buf.bisect("timestamp", since))
+        return {name: buf.segments(name, last_n, stop) for name in fields}
+
+    def export(self, start: float, end: float, max_points: int = 2000, downsample: str = "lttb",
+               field: str = "temp", cursor: Optional[float] = None,
+               limit: Optional[int] = None) -> HistoryExport:
+        """Prepara la exportación de [start, end] sin materializar el rango.
+
+        downsample="none" exporta las muestras crudas retenidas, paginadas
+        con cursor/limit si se indica limit. Con lttb/minmax se devuelven como
+        mucho ~max_points filas elegidas sobre la columna field, partiendo de
+        las muestras crudas o de las medias por bucket del nivel agregado que
+        elija _select_tier.
+        """
+        buf = self._buffer
+        if cursor is not None:
+            start = max(start, cursor + 1e-6)
+        lo = buf.bisect("timestamp", start)
+        hi = buf.bisect("timestamp", end + 1e-9)
+        # Las muestras nuevas desplazan los índices lógicos: fuera de aquí se usan
+        # números de secuencia (seq - first() es el índice lógico del momento)
+        base = buf.count - len(buf)
+
+        def first() -> int:
+            return buf.count - len(buf)
+
+        if downsample == "none":
+            next_cursor = None
+            if limit is not None and hi - lo > limit:
+                hi = lo + limit
+                next_cursor = buf.row(hi - 1)[0]
+            return HistoryExport(FIELDS, TYPECODES, 0, source=buf, lo=base + lo, hi=base + hi,
+                                 next_cursor=next_cursor)
+
+        select = lttb if downsample == "lttb" else minmax
+        n = hi - lo
+        tier = self._select_tier(start, end, n, buf.covers("timestamp", start), max_points)
+        if tier is None:
+            if n <= max_points:
+                return HistoryExport(FIELDS, TYPECODES, 0, source=buf, lo=base + lo, hi=base + hi)
+
+            def read(a: int, b: int):
+                shift = base + lo - first()
+                return (buf.values("timestamp", shift + a, shift + b),
+                        buf.values(field, shift + a, shift + b))
+            selected = select(read, n, max_points)
+            shift = base + lo - first()
+            rows = [buf.row(shift + i) for i in selected if shift + i >= 0]
+            return HistoryExport(FIELDS, TYPECODES, 0, rows=rows)
+
+        # Rango largo o muestras crudas ya descartadas: medias del nivel agregado
+        span = max(end - start, 0)
+        result = tier.query(start, end)
+        columns = [result["timestamp"]] + [result[name]["mean"] for name in ROLLUP_FIELDS]
+        n = len(columns[0])
+        if n > max_points and span:
+            k = FIELDS.index(field)
+            selected = select(lambda a, b: (columns[0][a:b], columns[k][a:b]), n, max_points)
+        else:
+            selected = range(n)
+        rows = [tuple(col[i] for col in columns) for i in selected]
+        return HistoryExport(FIELDS, _TIER_TYPECODES, tier.resolution, rows=rows)
 
     def clear(self):
         """Limpia el histórico"""
-        self._data = []
\ No newline at end of file
+        self._buffer.clear()
+        for tier in self.tiers:
+            tier.clear()
+        self._tier_seq = None
+        self._tiers_since = float("-inf")
+        self._last = None
+        self._last_seq = -1
+        self._sample = None
+        self._json_seq = -1
+
+    def close(self):
+        """Cierra el almacenamiento persistente, si lo hay"""
+        close = getattr(self._buffer, "close", None)
+        if close is not None:
+            close()
@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional
+
+HWMON_ROOT = "/sys/class/hwmon/hwmon0"
+
+
+class HwmonSnapshot:
+    """Lectura de todos los canales de entrada en un mismo tick"""
+
+    __slots__ = ("timestamp", "values", "errors", "stale", "latency")
+
+    def __init__(self, timestamp: float, values: Dict[str, float],
+                 errors: Dict[str, str], stale: bool = False, latency: float = 0.0):
+        self.timestamp = timestamp
+        self.values = values
+        self.errors = errors
+        self.stale = stale      # True si se reutilizan valores por timeout
+        self.latency = latency  # Segundos que tardó el lote
+
+    def get(self, name: str, default: float = math.nan) -> float:
+        """Valor de un canal; NaN si la lectura ha fallado (nunca 0, que parecería frío)"""
+        return self.values.get(name, default)
+
+
+class HwmonIO:
+    """Acceso por lotes y no bloqueante a ficheros hwmon de sysfs.
+
+    Mantiene los descriptores abiertos, lee con os.pread en el offset 0 y
+    ejecuta cada lote en un hilo dedicado para no bloquear el event loop.
+    inputs/outputs asocian un nombre lógico a un fichero dentro de root
+    (o a una ruta absoluta, como las que resuelve HwmonDiscovery).
+    """
+
+    def __init__(self, root: str = HWMON_ROOT, inputs: Optional[Dict[str, str]] = None,
+                 outputs: Optional[Dict[str, str]] = None, timeout: float = 0.5):
+        self.root = Path(root)
+        self.inputs = dict(inputs or {})
+        self.outputs = dict(outputs or {})
+        self.timeout = timeout
+        self.logger = logging.getLogger(__name__)
+        # Hilos separados: una lectura bloqueada no retrasa las escrituras PWM
+        self._reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hwmon-read")
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hwmon-write")
+        self._in_fds: Dict[str, int] = {}
+        self._out_fds: Dict[str, int] = {}
+        self._pending: Optional[asyncio.Future] = None
+        self._current: Optional[str] = None  # Canal en curso (diagnóstico de bloqueos)
+        self.last: Optional[HwmonSnapshot] = None
+        self.read_failures = 0
+        self.timeouts = 0
+
+    # --- Descriptores --------------------------------------------------------
+
+    def _fd(self, fds: Dict[str, int], name: str, filename: str, flags: int) -> int:
+        fd = fds.get(name)
+        if fd is None:
+            fd = os.open(self.root / filename, flags)
+            fds[name] = fd
+        return fd
+
+    def _drop(self, fds: Dict[str, int], name: str):
+        fd = fds.pop(name, None)
+        if fd is not None:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    # --- Lectura -------------------------------------------------------------
+
+    def _read_batch(self) -> HwmonSnapshot:
+        """Lee todos los canales de entrada (se ejecuta en el hilo hwmon)"""
+        start = time.monotonic()
+        values: Dict[str, float] = {}
+        errors: Dict[str, str] = {}
+        for name, filename in self.inputs.items():
+            self._current = name
+            try:
+                fd = self._fd(self._in_fds, name, filename, os.O_RDONLY)
+                value = float(os.pread(fd, 32, 0))
+                # Las temperaturas vienen en miligrados
+                values[name] = value / 1000 if Path(filename).name.startswith("temp") else value
+            except (OSError, ValueError) as e:
+                errors[name] = str(e)
+                self._drop(self._in_fds, name)
+        self._current = None
+        return HwmonSnapshot(time.time(), values, errors, latency=time.monotonic() - start)
+
+    async def read(self) -> HwmonSnapshot:
+        """Lee un snapshot de todos los canales sin bloquear el event loop.
+
+        Si el lote anterior sigue bloqueado o este supera el timeout, se
+        devuelve el último snapshot marcado como stale.
+        """
+        loop = asyncio.get_running_loop()
+        if self._pending is None or self._pending.done():
+            self._pending = loop.run_in_executor(self._reader, self._read_batch)
+        try:
+            snapshot = await asyncio.wait_for(asyncio.shield(self._pending), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self.logger.warning(f"Lectura hwmon bloqueada en {self._current} ({self.root})")
+            return self._stale_snapshot()
+
+        if snapshot.errors:
+            self.read_failures += len(snapshot.errors)
+            for name, error in snapshot.errors.items():
+                self.logger.error(f"Error reading {name}: {error}")
+        self.last = snapshot
+        return snapshot
+
+    def _stale_snapshot(self) -> HwmonSnapshot:
+        last = self.last
+        values = dict(last.values) if last else {}
+        errors = {name: "timeout" for name in self.inputs if name not in values}
+        return HwmonSnapshot(time.time(), values, errors, stale=True, latency=self.timeout)
+
+    # --- Escritura -----------------------------------------------------------
+
+    def _write_batch(self, values: Dict[str, int]) -> Dict[str, str]:
+        errors: Dict[str, str] = {}
+        for name, value in values.items():
+            try:
+                fd = self._fd(self._out_fds, name, self.outputs[name], os.O_WRONLY)
+                # Con salto de línea, como echo: el valor queda delimitado también
+                # en ficheros normales (árboles simulados), donde no se trunca
+                os.pwrite(fd, b"%d\n" % int(value), 0)
+            except (OSError, KeyError) as e:
+                errors[name] = str(e)
+                self._drop(self._out_fds, name)
+        return errors
+
+    async def write(self, values: Dict[str, int]) -> Dict[str, str]:
+        """Escribe varios canales de salida en un lote; devuelve los errores"""
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._writer, self._write_batch, values)
+        try:
+            errors = await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return {name: "timeout" for name in values}
+        for name, error in errors.items():
+            self.logger.error(f"Error writing PWM {name}: {error}")
+        return errors
+
+    def rebind(self, inputs: Dict[str, str], outputs: Dict[str, str]):
+        """Cambia los ficheros de los canales (p.ej. tras renumerarse hwmonN)"""
+        self.inputs = dict(inputs)
+        self.outputs = dict(outputs)
+        # Cada descriptor se cierra en el hilo que lo usa
+        self._reader.submit(self._close_all, self._in_fds)
+        self._writer.submit(self._close_all, self._out_fds)
+
+    def _close_all(self, fds: Dict[str, int]):
+        for name in list(fds):
+            self._drop(fds, name)
+
+    # --- Diagnóstico ---------------------------------------------------------
+
+    def check_access(self, outputs: bool = False) -> bool:
+        """Comprueba que todos los ficheros de entrada (o salida) son accesibles"""
+        files = self.outputs if outputs else self.inputs
+        mode = os.W_OK if outputs else os.R_OK
+        return all(os.access(self.root / filename, mode) for filename in files.values())
+
+    def close(self):
+        self._close_all(self._in_fds)
+        self._close_all(self._out_fds)
+        self._reader.shutdown(wait=False)
+        self._writer.shutdown(wait=False)
@@ -0,0 +1,90 @@
+from array import array
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Límites (segundos) de los histogramas de latencia por etapa
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+)
+STAGES: Tuple[str, ...] = ("read", "evaluate", "write", "history", "alerts")
+
+
+class Histogram:
+    """Histograma con buckets preasignados; observe no reserva memoria nueva"""
+
+    __slots__ = ("bounds", "counts", "total", "count")
+
+    def __init__(self, bounds: Sequence[float] = DEFAULT_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = array('Q', bytes(8 * (len(self.bounds) + 1)))  # último: +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class Metrics:
+    """Instrumentación del bucle de control en formato Prometheus/OpenMetrics.
+
+    Los contadores e histogramas se actualizan en el bucle sin reservar
+    memoria; el texto expuesto se regenera como mucho una vez por tick y se
+    sirve desde caché al resto de peticiones.
+    """
+
+    def __init__(self, stages: Sequence[str] = STAGES):
+        self.stages: Dict[str, Histogram] = {name: Histogram() for name in stages}
+        self.ticks = 0
+        self.loop_overruns = 0
+        self._cache: Optional[bytes] = None
+        self._cache_tick = -1
+
+    def observe(self, stage: str, seconds: float):
+        self.stages[stage].observe(seconds)
+
+    def render(self, collect: Callable[[], List[Tuple[str, str, str, Dict[str, str], float]]]) -> bytes:
+        """Texto de exposición; collect devuelve (nombre, tipo, ayuda, labels, valor)"""
+        if self._cache is not None and self._cache_tick == self.ticks:
+            return self._cache
+
+        # Agrupar las muestras por familia (el formato exige que sean contiguas)
+        families: Dict[str, List[str]] = {}
+        for name, kind, help_text, labels, value in collect():
+            family = families.get(name)
+            if family is None:
+                family = families[name] = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            family.append(f"{name}{_labels(labels)} {_number(value)}")
+        lines: List[str] = [line for family in families.values() for line in family]
+
+        name = "fancontrol_stage_duration_seconds"
+        lines.append(f"# HELP {name} Duración de cada etapa del bucle de monitorización")
+        lines.append(f"# TYPE {name} histogram")
+        for stage, hist in self.stages.items():
+            cumulative = 0
+            for bound, count in zip(hist.bounds + (float("inf"),), hist.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {_number(hist.total)}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {hist.count}')
+
+        self._cache = ("\n".join(lines) + "\n").encode()
+        self._cache_tick = self.ticks
+        return self._cache
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in labels.items()
+    )
+    return "{" + inner + "}"
+
+
+def _number(value: float) -> str:
+    if value is None:
+        return "NaN"
+    return repr(float(value)) if isinstance(value, float) else str(value)
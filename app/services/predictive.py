@@ -0,0 +1,247 @@
+import logging
+import os
+from array import array
+from pathlib import Path
+from typing import Callable, Optional, Sequence, Tuple
+from ..models.config import PredictiveSettings
+from .curves import CompiledCurve
+
+# Regresores del modelo térmico: dT/dt = c·[1, T, u, u·T, cpu, carga]
+MODEL_TERMS = ("bias", "temp", "pwm", "pwm_temp", "cpu", "loadavg")
+MIN_R2 = 0.3  # Ajustes que explican menos de esto no sustituyen al modelo anterior
+GAIN_EPS = 1e-6  # Ganancia del PWM (°C/s por unidad de PWM) a partir de la que no enfría
+
+
+class LoadSensor:
+    """Utilización de CPU (/proc/stat) y carga media por CPU (/proc/loadavg).
+
+    Mantiene los descriptores abiertos y relee con pread, como HwmonIO. La
+    utilización es la fracción de jiffies ocupados entre dos lecturas. Los
+    valores se escriben en un array de dos posiciones (cpu, carga) que
+    comparte el motor de control.
+    """
+
+    def __init__(self, root: str = "/proc"):
+        self.root = Path(root)
+        self.logger = logging.getLogger(__name__)
+        self._stat: Optional[int] = None
+        self._loadavg: Optional[int] = None
+        self.cpus = 1
+        self._busy = self._total = 0
+        self.errors = 0
+
+    def _open(self):
+        self._stat = os.open(self.root / "stat", os.O_RDONLY)
+        self._loadavg = os.open(self.root / "loadavg", os.O_RDONLY)
+        cpus = os.pread(self._stat, 65536, 0).count(b"\ncpu")
+        self.cpus = max(1, cpus)
+
+    def read(self, out: array):
+        """Actualiza out[0] (CPU, 0-1) y out[1] (loadavg de 1 min / CPUs)"""
+        try:
+            if self._stat is None:
+                self._open()
+            line = os.pread(self._stat, 256, 0).split(b"\n", 1)[0].split()
+            # user nice system idle iowait irq softirq steal
+            idle = int(line[4]) + int(line[5])
+            total = sum(int(x) for x in line[1:9])
+            busy = total - idle
+            if total > self._total:
+                out[0] = (busy - self._busy) / (total - self._total)
+            self._busy, self._total = busy, total
+            out[1] = float(os.pread(self._loadavg, 64, 0).split(None, 1)[0]) / self.cpus
+        except (OSError, ValueError, IndexError) as e:
+            if not self.errors:
+                self.logger.warning(f"No se puede leer la carga de {self.root}: {e}")
+            self.errors += 1
+            self.close()
+
+    def close(self):
+        for fd in (self._stat, self._loadavg):
+            if fd is not None:
+                os.close(fd)
+        self._stat = self._loadavg = None
+
+
+def fit_thermal_model(temps, pwms, cpu, loadavg, period: float,
+                      setpoint: Optional[float] = None) -> Optional[Tuple[Tuple[float, ...], float]]:
+    """Ajuste por mínimos cuadrados de dT/dt sobre los regresores de MODEL_TERMS (requiere NumPy).
+
+    Devuelve (coeficientes, R²), o None si el modelo no es utilizable: más
+    PWM debe enfriar en todo el rango de temperaturas observado y en el
+    setpoint, donde se calcula el feed-forward. Se ejecuta en un executor,
+    fuera del bucle de control.
+    """
+    import numpy as np
+
+    t, u = temps[:-1], pwms[:-1]
+    y = np.diff(temps) / period
+    X = np.column_stack((np.ones_like(t), t, u, u * t, cpu[:-1], loadavg[:-1]))
+    coef, _, rank, _ = np.linalg.lstsq(X, y, rcond=None)
+    residual = y - X @ coef
+    variance = float(np.var(y))
+    r2 = 1.0 - float(np.var(residual)) / variance if variance > 0 else 0.0
+    checked = [t.min(), t.max()] + ([setpoint] if setpoint is not None else [])
+    gain = coef[2] + coef[3] * np.array(checked)
+    if rank < 4 or not np.all(gain < -GAIN_EPS) or r2 < MIN_R2:
+        return None
+    return tuple(float(c) for c in coef), r2
+
+
+class PredictiveController:
+    """PID con feed-forward de carga para un ventilador, evaluado sin crear objetos por tick.
+
+    u = ff + kp·e + I + kd·de/dt, con e = T - setpoint y ff el PWM de
+    equilibrio en el setpoint según el modelo térmico y la carga actual.
+    Sin modelo se comporta como la curva. Las muestras para el ajuste se
+    guardan en arrays circulares preasignados; el ajuste (fit_thermal_model)
+    se hace fuera del bucle y se publica con set_model.
+    """
+
+    __slots__ = ("plan", "load", "period", "setpoint", "lo", "hi", "kp", "ki", "kd", "deadband",
+                 "window", "refit_every", "min_samples", "model", "r2", "ready", "fits", "integral",
+                 "error", "derivative", "alpha", "output", "feedforward", "temp", "_bumpless", "_temps",
+                 "_pwms", "_cpu", "_loadavg", "_pos", "_count")
+
+    def __init__(self, plan: Callable[[Sequence[float]], Tuple[int, float]], curve: CompiledCurve,
+                 settings: PredictiveSettings, period: float, load: array):
+        self.plan = plan    # temps -> (PWM de la curva, temperatura efectiva)
+        self.load = load    # (cpu, carga), compartido con el motor
+        self.period = period
+        self.lo = float(curve(curve.temps[0]))
+        self.hi = float(curve.max_pwm)
+        self.setpoint = settings.setpoint if settings.setpoint is not None else self._midpoint(curve)
+        self.kp, self.ki, self.kd = settings.kp, settings.ki, settings.kd
+        self.deadband = settings.deadband
+        self.window = settings.window
+        self.refit_every = settings.refit_every
+        self.min_samples = settings.min_samples
+        self.model = array('d', bytes(8 * len(MODEL_TERMS)))
+        self.r2 = 0.0
+        self.ready = False
+        self.fits = 0
+        self.integral = 0.0
+        self.error = 0.0
+        self.derivative = 0.0
+        self.alpha = min(1.0, period / 10.0)  # Filtro de la derivada (~10 s)
+        self.output = -1
+        self.feedforward = 0.0
+        self.temp = 0.0
+        self._bumpless = False
+        n = max(2, int(settings.window / period))
+        self._temps = array('d', bytes(8 * n))
+        self._pwms = array('d', bytes(8 * n))
+        self._cpu = array('d', bytes(8 * n))
+        self._loadavg = array('d', bytes(8 * n))
+        self._pos = 0
+        self._count = 0
+
+    @staticmethod
+    def _midpoint(curve: CompiledCurve) -> float:
+        """Temperatura a la que la curva alcanza la mitad de su recorrido de PWM"""
+        temps, pwms = curve.temps, curve.pwms
+        target = (pwms[0] + curve.max_pwm) / 2
+        for i in range(len(temps) - 1):
+            if pwms[i] <= target <= pwms[i + 1] and pwms[i + 1] > pwms[i]:
+                return temps[i] + (target - pwms[i]) / curve.slopes[i]
+        raise ValueError("La curva no tiene tramo de subida: indica predictive.setpoint")
+
+    def __call__(self, temps: Sequence[float]) -> Tuple[int, float]:
+        pwm, temp = self.plan(temps)
+        self.temp = temp
+        if temp != temp:
+            # Sin lectura: la curva da el máximo; el estado del PID no se toca
+            return pwm, temp
+        error = temp - self.setpoint
+        self.derivative += ((error - self.error) / self.period - self.derivative) * self.alpha
+        self.error = error
+        if not self.ready:
+            self.output = pwm
+            return pwm, temp
+
+        m, load = self.model, self.load
+        s = self.setpoint
+        # PWM (0-1) con el que dT/dt = 0 en el setpoint para la carga actual. Si el
+        # modelo no enfría en el setpoint no hay equilibrio: se usa el PWM de la curva
+        gain = m[2] + m[3] * s
+        if gain < -GAIN_EPS:
+            ff = -(m[0] + m[1] * s + m[4] * load[0] + m[5] * load[1]) / gain * 255.0
+        else:
+            ff = float(pwm)
+        ff = self.lo if ff < self.lo else self.hi if ff > self.hi else ff
+        self.feedforward = ff
+        pd = ff + self.kp * error + self.kd * self.derivative
+        if self._bumpless:
+            # Primera salida con modelo: continuar desde el último PWM de la curva
+            self.integral = self.output - pd
+            self._bumpless = False
+        u = pd + self.integral
+        # Anti-windup: no integrar hacia la saturación
+        if not ((u >= self.hi and error > 0) or (u <= self.lo and error < 0)):
+            self.integral += self.ki * error * self.period
+            u = pd + self.integral
+        u = self.lo if u < self.lo else self.hi if u > self.hi else u
+        if u == self.lo or u == self.hi or not -self.deadband < u - self.output < self.deadband:
+            self.output = int(u)
+        return self.output, temp
+
+    def record(self, written: int):
+        """Guarda la muestra del tick con el PWM realmente escrito (para el ajuste)"""
+        if written < 0 or self.temp != self.temp:
+            return
+        k = self._pos
+        self._temps[k] = self.temp
+        self._pwms[k] = written / 255.0
+        self._cpu[k] = self.load[0]
+        self._loadavg[k] = self.load[1]
+        self._pos = (k + 1) % len(self._temps)
+        if self._count < len(self._temps):
+            self._count += 1
+
+    def snapshot(self):
+        """Copia cronológica de la ventana para ajustar fuera del bucle (None si no basta)"""
+        if self._count < self.min_samples:
+            return None
+        import numpy as np
+
+        columns = []
+        for values in (self._temps, self._pwms, self._cpu, self._loadavg):
+            data = np.frombuffer(values, dtype=np.float64)
+            if self._count < len(values):
+                columns.append(data[:self._count].copy())
+            else:
+                columns.append(np.concatenate((data[self._pos:], data[:self._pos])))
+        return columns
+
+    def set_model(self, coefficients: Sequence[float], r2: float):
+        for k, value in enumerate(coefficients):
+            self.model[k] = value
+        self.r2 = r2
+        self.fits += 1
+        if not self.ready:
+            self.ready = self._bumpless = True
+
+    def adopt(self, other: "PredictiveController"):
+        """Hereda el modelo, la ventana y el estado del PID de otra configuración del mismo ventilador"""
+        if len(other._temps) == len(self._temps) and other.period == self.period:
+            for name in ("_temps", "_pwms", "_cpu", "_loadavg"):
+                getattr(self, name)[:] = getattr(other, name)
+            self._pos, self._count = other._pos, other._count
+        if other.ready:
+            self.model[:] = other.model
+            self.r2, self.fits, self.ready = other.r2, other.fits, True
+            self._bumpless = other._bumpless
+            self.integral = other.integral
+        self.error, self.derivative, self.output = other.error, other.derivative, other.output
+
+    def describe(self):
+        return {
+            "setpoint": round(self.setpoint, 2),
+            "model": dict(zip(MODEL_TERMS, self.model)) if self.ready else None,
+            "r2": round(self.r2, 3) if self.ready else None,
+            "fits": self.fits,
+            "samples": self._count,
+            "feedforward": round(self.feedforward, 1) if self.ready else None,
+            "integral": round(self.integral, 2),
+            "output": self.output,
+        }
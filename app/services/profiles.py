@@ -1,54 +1,60 @@
 from typing import Dict, Any, Optional
-from datetime import datetime, time
-from ..models.config import FanConfig
+from ..models.config import ControlCurve, FanConfig, default_config
 
 
 class ProfileService:
+    """Perfiles predefinidos: curvas por ventilador y umbrales de alerta.
+
+    Un perfil se aplica sobre la configuración activa, así que conserva los
+    canales, zonas y demás ajustes; sólo cambia las curvas de los
+    ventiladores que define y los umbrales.
+    """
+
     def __init__(self):
         self.profiles: Dict[str, Dict[str, Any]] = {
             "default": {
                 "description": "Perfil predeterminado",
-                "config": FanConfig(
-                    fan1=ControlCurve(
+                "curves": {
+                    "fan1": ControlCurve(
                         min_pwm=22,
                         max_pwm=255,
                         curve=[(50, 90), (80, 255)],
                         hysteresis=3
                     ),
-                    fan2=ControlCurve(
+                    "fan2": ControlCurve(
                         min_pwm=4,
                         max_pwm=100,
                         curve=[(0, 14)],
                         hysteresis=0
                     ),
-                    alerts=AlertConfig(
-                        temp_threshold=85,
-                        rpm_threshold=500,
-                        temp_critical=95
-                    )
-                )
+                },
+                "alerts": {
+                    "temp_threshold": 85,
+                    "rpm_threshold": 500,
+                    "temp_critical": 95
+                }
             },
             "silent": {
                 "description": "Modo silencioso (menos enfriamiento)",
-                "config": FanConfig(
-                    fan1=ControlCurve(
+                "curves": {
+                    "fan1": ControlCurve(
                         min_pwm=22,
                         max_pwm=180,
                         curve=[(60, 70), (85, 180)],
                         hysteresis=5
                     ),
-                    fan2=ControlCurve(
+                    "fan2": ControlCurve(
                         min_pwm=4,
                         max_pwm=80,
                         curve=[(0, 10)],
                         hysteresis=0
                     ),
-                    alerts=AlertConfig(
-                        temp_threshold=90,
-                        rpm_threshold=400,
-                        temp_critical=100
-                    )
-                )
+                },
+                "alerts": {
+                    "temp_threshold": 90,
+                    "rpm_threshold": 400,
+                    "temp_critical": 100
+                }
             }
         }
 
@@ -56,16 +62,16 @@ class ProfileService:
         """Obtiene los perfiles disponibles"""
         return {name: data["description"] for name, data in self.profiles.items()}
 
+    def apply(self, config: FanConfig, profile_name: str) -> FanConfig:
+        """Configuración resultante de aplicar un perfil (KeyError si no existe)"""
+        profile = self.profiles[profile_name]
+        _, fans = config.control_layout()
+        curves = {name: curve for name, curve in profile["curves"].items() if name in fans}
+        return config.with_curves(curves, **profile["alerts"])
+
     def get_profile_config(self, profile_name: str) -> Optional[FanConfig]:
         """Obtiene la configuración de un perfil"""
-        profile = self.profiles.get(profile_name)
-        return profile["config"] if profile else None
-
-    def get_time_based_profile(self) -> str:
-        """Obtiene el perfil basado en la hora actual"""
-        now = datetime.now().time()
+        if profile_name not in self.profiles:
+            return None
+        return self.apply(default_config(), profile_name)
 
-        # Modo silencioso entre 22:00 y 07:00
-        if time(22, 0) <= now or now <= time(7, 0):
-            return "silent"
-        return "default"
\ No newline at end of file
@@ -0,0 +1,255 @@
+import json
+import struct
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+from ..models.config import FanConfig
+from .curves import CompiledCurve, as_array, summarize
+from .export import BINARY_MAGIC
+from .history import FIELDS
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Tipos NumPy de los códigos de array del formato binario
+_DTYPES = {"d": "<f8", "f": "<f4", "B": "u1"}
+HIGH_PWM = 192          # PWM a partir del cual se cuenta como ruidoso (75%)
+_FIRST_BLOCK = 64       # Muestras de la primera búsqueda tras cada escritura
+_MAX_BLOCK = 1 << 16
+
+
+def read_export(data: bytes) -> Dict[str, "np.ndarray"]:
+    """Columnas de un fichero exportado por /history (binary, json, ndjson o csv)"""
+    import numpy as np
+
+    if data[:4] == BINARY_MAGIC:
+        rows, _, ncols = struct.unpack_from("<IdB", data, 4)
+        offset = 4 + struct.calcsize("<IdB")
+        layout = []
+        for _ in range(ncols):
+            (length,) = struct.unpack_from("<B", data, offset)
+            name = data[offset + 1:offset + 1 + length].decode()
+            layout.append((name, np.dtype(_DTYPES[chr(data[offset + 1 + length])])))
+            offset += length + 2
+        columns = {}
+        for name, dtype in layout:
+            columns[name] = np.frombuffer(data, dtype, rows, offset)
+            offset += rows * dtype.itemsize
+        return columns
+
+    text = data.lstrip()
+    if text.startswith(b'{"fields"'):
+        export = json.loads(text)
+        values = np.array(export["data"], dtype=np.float64).reshape(-1, len(export["fields"]))
+        return dict(zip(export["fields"], values.T))
+    if text.startswith(b"{"):
+        rows = [json.loads(line) for line in text.splitlines() if line.strip()]
+        return {name: np.array([row.get(name) for row in rows], dtype=np.float64) for name in FIELDS}
+    header, _, body = text.partition(b"\n")
+    names = header.decode().strip().split(",")
+    values = np.loadtxt(body.decode().splitlines(), delimiter=",", ndmin=2) if body.strip() \
+        else np.empty((0, len(names)))
+    return dict(zip(names, values.T))
+
+
+def history_columns(history, start: float, end: float) -> Dict[str, "np.ndarray"]:
+    """Copia de las columnas del histórico en [start, end] (las muestras crudas retenidas)"""
+    return {name: as_array(segments)
+            for name, segments in history.get_columns(since=start, until=end).items()}
+
+
+def _writes(ts, temps, values, watchdog, control_every: int, hysteresis: Sequence[float],
+            min_interval: float) -> List[Tuple["np.ndarray", "np.ndarray"]]:
+    """Escrituras (índices y valores) que haría PwmActuator para cada ventilador.
+
+    values tiene una fila por ventilador con su petición en cada muestra
+    (-1: ninguna). Las reglas son las de _resolve: el watchdog y las
+    subidas se escriben al momento; las bajadas automáticas sólo en un
+    flush, si la temperatura ha caído la histéresis desde la última
+    escritura automática y ha pasado min_interval. Como en el bucle, hay
+    flush en los ticks de control y cuando algún ventilador tiene una
+    subida pendiente (needs_flush), y ese flush también aplica las bajadas
+    de los demás. Una escritura sin lectura (NaN) deja bajar libremente,
+    como en el actuador (NaN no bloquea la comparación de la histéresis).
+    Entre dos escrituras el estado no cambia, así que en vez de recorrer
+    muestra a muestra se busca la siguiente escritura con operaciones
+    vectoriales sobre bloques de tamaño creciente.
+    """
+    import numpy as np
+
+    values = np.atleast_2d(values)
+    fans, n = values.shape
+    control = np.zeros(n, dtype=bool)
+    control[::control_every] = True
+    if control_every > 1:
+        # Una petición del watchdog que no escribe (ya en 255) queda pendiente hasta el
+        # siguiente flush y en ese tick de control tapa la automática: no se baja
+        ticks = np.arange(0, n, control_every)
+        count = np.cumsum(watchdog, dtype=np.int64)
+        pending = count[ticks - 1] - np.where(ticks >= control_every, count[ticks - control_every], 0)
+        pending[0] = 0
+        control[ticks[pending > 0]] = False
+
+    index: List[List[int]] = [[] for _ in range(fans)]
+    written: List[List[int]] = [[] for _ in range(fans)]
+    current = np.full((fans, 1), -1, dtype=np.int16)
+    margin = np.asarray(hysteresis, dtype=np.float64).reshape(fans, 1)
+    floor = -margin  # Temperatura de la última escritura automática menos la histéresis
+    last = np.zeros((fans, 1))
+    flushed = -1  # Último tick con escrituras (un flush)
+    i, block = 0, _FIRST_BLOCK
+    while i < n:
+        j = min(n, i + block)
+        v = values[:, i:j]
+        change = (v != current) & (v >= 0)
+        urgent = change & (watchdog[i:j] | (v > current))
+        due = urgent | (change & control[i:j] & (temps[i:j] <= floor) & (ts[i:j] - last >= min_interval))
+        hits = due.any(axis=0)
+        hit = int(hits.argmax())
+        if not hits[hit]:
+            i, block = j, min(block * 2, _MAX_BLOCK)
+            continue
+        k = i + hit
+        t, temp = ts[k], temps[k]
+        # Flush fuera de tick de control por la subida de otro ventilador: las bajadas
+        # sólo si no queda una petición del watchdog desde el flush anterior
+        free = control[k] or not watchdog[max(flushed, (k - 1) // control_every * control_every) + 1:k].any()
+        for f in range(fans):
+            if not (urgent[f, hit] or (free and change[f, hit] and temp <= floor[f, 0]
+                                       and t - last[f, 0] >= min_interval)):
+                continue
+            current[f] = values[f, k]
+            last[f] = t
+            # Tras una escritura del watchdog o sin lectura el automático puede bajar libremente
+            floor[f] = np.inf if watchdog[k] or temp != temp else temp - margin[f, 0]
+            index[f].append(k)
+            written[f].append(int(values[f, k]))
+        flushed = k
+        if control_every > 1:
+            # Esta escritura vacía lo pendiente: en el próximo tick de control sólo
+            # cuentan las peticiones del watchdog posteriores
+            c = -(-(k + 1) // control_every) * control_every
+            if c < n:
+                control[c] = not watchdog[k + 1:c].any()
+        i, block = k + 1, _FIRST_BLOCK
+    return [(np.array(ix, dtype=np.int64), np.array(w, dtype=np.int16)) for ix, w in zip(index, written)]
+
+
+def _trace(index, written, n: int):
+    """PWM escrito en cada muestra (0 antes de la primera escritura)"""
+    import numpy as np
+
+    trace = np.zeros(n, dtype=np.uint8)
+    if len(index):
+        counts = np.diff(np.append(index, n))
+        trace[index[0]:] = np.repeat(written.astype(np.uint8), counts)
+    return trace
+
+
+def _episodes(mask) -> int:
+    """Número de tramos consecutivos a True"""
+    import numpy as np
+
+    return int(np.count_nonzero(np.diff(mask.astype(np.int8), prepend=0) == 1))
+
+
+def _durations(ts):
+    """Segundos que representa cada muestra (los huecos cuentan como un periodo)"""
+    import numpy as np
+
+    if len(ts) < 2:
+        return np.ones(len(ts))
+    dt = np.diff(ts)
+    period = float(np.median(dt))
+    return np.append(np.where(dt > 5 * period, period, dt), period)
+
+
+def replay(config: FanConfig, columns: Dict[str, "np.ndarray"], high_pwm: int = HIGH_PWM) -> Dict:
+    """Reproduce un histórico con las curvas, histéresis y watchdog de una configuración.
+
+    La entrada de todos los ventiladores es la temperatura registrada (la
+    primera zona) y comparten los flush del actuador (ver _writes); los
+    ventiladores predictivos se simulan con su curva. En
+    las muestras sin lectura la curva pide max_pwm, como en el servicio.
+    Devuelve por ventilador la traza PWM (array "pwm"), las escrituras, el
+    tiempo por encima de high_pwm y, para los dos primeros, lo mismo de la
+    traza registrada.
+    """
+    import numpy as np
+
+    ts = np.asarray(columns["timestamp"], dtype=np.float64)
+    temps = np.asarray(columns["temp"], dtype=np.float64)
+    n = len(ts)
+    valid = ~np.isnan(temps)
+    seconds = _durations(ts)
+    critical = config.alerts.temp_critical
+    watchdog = valid & (temps >= critical)
+    control_every = max(1, round(config.sample_rate / config.control_rate))
+
+    _, fans = config.control_layout()
+    result = {
+        "samples": n,
+        "start": float(ts[0]) if n else None,
+        "end": float(ts[-1]) if n else None,
+        "seconds": float(seconds.sum()),
+        "watchdog": {
+            "temp_critical": critical,
+            "episodes": _episodes(watchdog),
+            "seconds": float(seconds[watchdog].sum()),
+        },
+        "fans": {},
+    }
+    # Todos los ventiladores a la vez: comparten los flush del actuador
+    curves = [CompiledCurve(fan.curve) for fan in fans.values()]
+    values = np.empty((len(curves), n), dtype=np.int16)
+    for f, curve in enumerate(curves):
+        values[f] = curve.evaluate_many(temps)
+    values[:, watchdog] = 255
+    writes = _writes(ts, temps, values, watchdog, control_every,
+                     [float(curve.hysteresis) for curve in curves], config.min_write_interval)
+    for k, (name, (index, written)) in enumerate(zip(fans, writes)):
+        pwm = _trace(index, written, n)
+        high = pwm >= high_pwm
+        fan_result = {
+            "pwm": pwm,
+            "writes": len(index),
+            "watchdog_writes": int(np.count_nonzero(watchdog[index])),
+            "seconds_high": float(seconds[high].sum()),
+            "episodes_high": _episodes(high),
+            **summarize(pwm),
+        }
+        recorded = columns.get(f"pwm{k + 1}")
+        if recorded is not None and k < 2:
+            recorded = np.nan_to_num(np.asarray(recorded, dtype=np.float64)).astype(np.uint8)
+            fan_result["recorded"] = {
+                "seconds_high": float(seconds[recorded >= high_pwm].sum()),
+                "episodes_high": _episodes(recorded >= high_pwm),
+                **summarize(recorded),
+            }
+        result["fans"][name] = fan_result
+    return result
+
+
+def downsample_trace(ts, pwm, max_points: int) -> Dict[str, list]:
+    """Traza reducida a ~max_points puntos: mínimo y máximo de cada bucket, como minmax()"""
+    import numpy as np
+
+    n = len(pwm)
+    if n <= max_points:
+        selected = range(n)
+    else:
+        bounds = np.linspace(0, n, max(1, max_points // 2) + 1).astype(np.int64)
+        selected = []
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            bucket = pwm[lo:hi]
+            selected.extend(sorted({lo + int(bucket.argmin()), lo + int(bucket.argmax())}))
+    return {"timestamp": [float(ts[i]) for i in selected], "pwm": [int(pwm[i]) for i in selected]}
+
+
+def what_if(config: FanConfig, columns: Dict[str, "np.ndarray"], high_pwm: int = HIGH_PWM,
+            max_points: Optional[int] = 1000) -> Dict:
+    """replay() listo para JSON: la traza de cada ventilador reducida a max_points"""
+    result = replay(config, columns, high_pwm)
+    for fan in result["fans"].values():
+        pwm = fan.pop("pwm")
+        if max_points:
+            fan["trace"] = downsample_trace(columns["timestamp"], pwm, max_points)
+    return result
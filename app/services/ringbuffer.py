@@ -0,0 +1,103 @@
+from array import array
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+class RingBuffer:
+    """Buffer circular columnar de capacidad fija (un array tipado por campo)"""
+
+    def __init__(self, capacity: int, typecodes: Dict[str, str]):
+        if capacity <= 0:
+            raise ValueError("capacity debe ser positiva")
+        self.capacity = capacity
+        self.fields = tuple(typecodes)
+        self.columns: Dict[str, array] = {
+            name: array(code, bytes(array(code).itemsize * capacity))
+            for name, code in typecodes.items()
+        }
+        self._cols = tuple(self.columns[name] for name in self.fields)
+        self._head = 0  # Próxima posición de escritura
+        self._size = 0
+        self.count = 0  # Total de muestras añadidas (número de secuencia)
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def bytes_per_sample(self) -> int:
+        return sum(col.itemsize for col in self._cols)
+
+    def append(self, values: Sequence) -> None:
+        """Añade una muestra en O(1); los valores siguen el orden de las columnas"""
+        head = self._head
+        for col, value in zip(self._cols, values):
+            col[head] = value
+        head += 1
+        self._head = 0 if head == self.capacity else head
+        if self._size < self.capacity:
+            self._size += 1
+        self.count += 1
+
+    def physical_index(self, i: int) -> int:
+        """Convierte un índice lógico (0 = más antiguo) en posición física"""
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError("índice fuera de rango")
+        return (self._head - self._size + i) % self.capacity
+
+    def row(self, i: int) -> Tuple:
+        """Devuelve la muestra lógica i como tupla"""
+        p = self.physical_index(i)
+        return tuple(col[p] for col in self._cols)
+
+    def bisect(self, name: str, value: float) -> int:
+        """Primer índice lógico cuyo valor en la columna (ordenada) es >= value"""
+        col = self.columns[name]
+        lo, hi = 0, self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if col[self.physical_index(mid)] < value:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def values(self, name: str, start: int, stop: int) -> List:
+        """Valores de una columna entre dos índices lógicos"""
+        out: List = []
+        for view in self._slice(name, start, stop):
+            out.extend(view.tolist())
+        return out
+
+    def rows(self, start: int, stop: int) -> Iterator[Tuple]:
+        """Muestras entre dos índices lógicos como tuplas"""
+        return zip(*(self.values(name, start, stop) for name in self.fields))
+
+    def _slice(self, name: str, start: int, stop: int) -> List[memoryview]:
+        start = max(0, start)
+        stop = min(stop, self._size)
+        if stop <= start:
+            return []
+        view = memoryview(self.columns[name])
+        p = self.physical_index(start)
+        end = p + (stop - start)
+        if end <= self.capacity:
+            return [view[p:end]]
+        return [view[p:], view[:end - self.capacity]]
+
+    def segments(self, name: str, last_n: Optional[int] = None,
+                 stop: Optional[int] = None) -> List[memoryview]:
+        """Vistas sin copia de las últimas N muestras de una columna antes de stop (1 o 2 tramos)"""
+        stop = self._size if stop is None else max(0, min(stop, self._size))
+        n = stop if last_n is None else max(0, min(last_n, stop))
+        return self._slice(name, stop - n, stop)
+
+    def covers(self, name: str, value: float) -> bool:
+        """Indica si no se ha descartado ningún dato posterior a value"""
+        if self._size < self.capacity:
+            return True
+        return self.columns[name][self.physical_index(0)] <= value
+
+    def clear(self) -> None:
+        self._head = 0
+        self._size = 0
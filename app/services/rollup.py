@@ -0,0 +1,110 @@
+import math
+from typing import Dict, List, Sequence, Tuple
+from .ringbuffer import RingBuffer
+
+# Campos agregados en cada bucket
+ROLLUP_FIELDS: Tuple[str, ...] = ("temp", "fan1_rpm", "fan2_rpm", "pwm1", "pwm2")
+
+# Resolución (segundos) y número de buckets de cada nivel por defecto
+DEFAULT_TIERS: Tuple[Tuple[int, int], ...] = (
+    (10, 2 * 8640),     # 2 días a 10 s
+    (60, 30 * 1440),    # 30 días a 1 min
+    (900, 365 * 96),    # 1 año a 15 min
+)
+
+
+def _tier_typecodes() -> Dict[str, str]:
+    codes = {"timestamp": "q", "count": "I"}
+    for name in ROLLUP_FIELDS:
+        codes[f"{name}_min"] = "f"
+        codes[f"{name}_max"] = "f"
+        codes[f"{name}_sum"] = "d"
+        codes[f"{name}_count"] = "I"  # Muestras válidas (sin NaN) del campo
+    return codes
+
+
+class RollupTier:
+    """Nivel de agregación con buckets min/max/media/count de resolución fija.
+
+    Las lecturas fallidas (NaN) no cuentan: cada campo guarda su número de
+    muestras válidas y su media es NaN sólo si no tiene ninguna.
+    """
+
+    def __init__(self, resolution: int, capacity: int):
+        self.resolution = resolution
+        self.buffer = RingBuffer(capacity, _tier_typecodes())
+        # Bucket abierto: se acumula en listas y se vuelca al cerrarse
+        self._current = None
+        self._count = 0
+        self._min: List[float] = []
+        self._max: List[float] = []
+        self._sum: List[float] = []
+        self._valid: List[int] = []
+
+    def add(self, timestamp: float, values: Sequence[float]) -> None:
+        """Incorpora una muestra al bucket que le corresponde (O(1))"""
+        bucket = int(timestamp // self.resolution) * self.resolution
+        if bucket != self._current:
+            self._flush()
+            n = len(values)
+            self._current = bucket
+            self._count = 0
+            self._min = [math.nan] * n
+            self._max = [math.nan] * n
+            self._sum = [0.0] * n
+            self._valid = [0] * n
+
+        self._count += 1
+        mins, maxs, sums, valid = self._min, self._max, self._sum, self._valid
+        for i, value in enumerate(values):
+            if value != value:
+                continue
+            if not valid[i]:
+                mins[i] = maxs[i] = value
+            elif value < mins[i]:
+                mins[i] = value
+            elif value > maxs[i]:
+                maxs[i] = value
+            sums[i] += value
+            valid[i] += 1
+
+    def _flush(self) -> None:
+        if self._current is None:
+            return
+        self.buffer.append(self._open_row())
+
+    def _open_row(self) -> List:
+        row = [self._current, self._count]
+        for stats in zip(self._min, self._max, self._sum, self._valid):
+            row.extend(stats)
+        return row
+
+    def query(self, start: float, end: float) -> Dict:
+        """Buckets cuyo inicio cae en [start, end], incluido el bucket abierto"""
+        buf = self.buffer
+        lo = buf.bisect("timestamp", int(start // self.resolution) * self.resolution)
+        hi = buf.bisect("timestamp", end + 1e-9)
+        columns = {name: buf.values(name, lo, hi) for name in buf.fields}
+        if self._current is not None and start - self.resolution < self._current <= end:
+            for name, value in zip(buf.fields, self._open_row()):
+                columns[name].append(value)
+
+        counts = columns["count"]
+        result: Dict = {
+            "resolution": self.resolution,
+            "timestamp": columns["timestamp"],
+            "count": counts,
+        }
+        for name in ROLLUP_FIELDS:
+            result[name] = {
+                "min": columns[f"{name}_min"],
+                "max": columns[f"{name}_max"],
+                "mean": [s / c if c else math.nan
+                         for s, c in zip(columns[f"{name}_sum"], columns[f"{name}_count"])],
+            }
+        return result
+
+    def clear(self) -> None:
+        self.buffer.clear()
+        self._current = None
+
@@ -0,0 +1,180 @@
+import math
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, List, Optional, Tuple
+from ..models.config import ScheduleConfig, ScheduleRule
+from .history import FIELDS
+
+# Campos de una expresión cron: (mínimo, máximo)
+_CRON_FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+_HORIZON = 4 * 366  # Días que se exploran buscando un disparo (cubre el 29 de febrero)
+
+WindowMean = Callable[[str, float], Optional[float]]  # (columna, segundos) -> media
+
+
+def _parse_field(text: str, low: int, high: int) -> Tuple[int, ...]:
+    values = set()
+    for part in text.split(","):
+        body, _, step = part.partition("/")
+        if body == "*":
+            start, stop = low, high
+        elif "-" in body:
+            start, stop = (int(x) for x in body.split("-", 1))
+        else:
+            start = stop = int(body)
+            if step:
+                stop = high
+        step = int(step) if step else 1
+        if not (low <= start <= stop <= high) or step < 1:
+            raise ValueError(f"campo cron fuera de rango: {part!r} ({low}-{high})")
+        values.update(range(start, stop + 1, step))
+    return tuple(sorted(values))
+
+
+class CronSpec:
+    """Expresión cron de 5 campos (hora local) con búsqueda del disparo siguiente y anterior.
+
+    Admite *, listas, rangos y pasos (*/15, 1-5, 8-18/2). Día de la semana
+    0-7 con 0 y 7 = domingo; si se restringen día del mes y de la semana
+    basta con que coincida uno de los dos, como en cron.
+    """
+
+    __slots__ = ("text", "minutes", "hours", "days", "months", "weekdays", "_any_day", "_any_weekday")
+
+    def __init__(self, text: str):
+        fields = text.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron necesita 5 campos: {text!r}")
+        self.text = text
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            _parse_field(field, *limits) for field, limits in zip(fields, _CRON_FIELDS)
+        )
+        # cron: 0 = domingo; datetime.weekday(): 0 = lunes
+        self.weekdays = frozenset((d - 1) % 7 for d in weekdays)
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def _day_matches(self, day: datetime) -> bool:
+        if day.month not in self.months:
+            return False
+        dom, dow = day.day in self.days, day.weekday() in self.weekdays
+        if self._any_day or self._any_weekday:
+            return dom and dow
+        return dom or dow
+
+    def next_after(self, t: datetime) -> Optional[datetime]:
+        """Primer disparo estrictamente posterior a t"""
+        t = t.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = t.replace(hour=0, minute=0)
+        for _ in range(_HORIZON):
+            if self._day_matches(day):
+                for hour in self.hours:
+                    for minute in self.minutes:
+                        candidate = day.replace(hour=hour, minute=minute)
+                        if candidate >= t:
+                            return candidate
+            day += timedelta(days=1)
+        return None
+
+    def last_before(self, t: datetime) -> Optional[datetime]:
+        """Último disparo anterior o igual a t"""
+        t = t.replace(second=0, microsecond=0)
+        day = t.replace(hour=0, minute=0)
+        for _ in range(_HORIZON):
+            if self._day_matches(day):
+                for hour in reversed(self.hours):
+                    for minute in reversed(self.minutes):
+                        candidate = day.replace(hour=hour, minute=minute)
+                        if candidate <= t:
+                            return candidate
+            day -= timedelta(days=1)
+        return None
+
+
+class ProfileScheduler:
+    """Calendario precalculado de cambios de perfil.
+
+    evaluate() decide el perfil que rige en un instante (carga > calendario >
+    cron > default) y calcula next_at, el próximo instante en que puede
+    cambiar: el siguiente disparo cron o límite de calendario, o la próxima
+    comprobación de las reglas de carga. Entre medias el bucle sólo compara
+    el timestamp de la muestra con next_at.
+    """
+
+    def __init__(self, config: ScheduleConfig, profiles: Iterable[str]):
+        known = set(profiles)
+        for name in [config.default] + [rule.profile for rule in config.rules]:
+            if name is not None and name not in known:
+                raise ValueError(f"Perfil desconocido en schedule: {name}")
+        for rule in config.rules:
+            if rule.above is not None and rule.metric not in FIELDS[1:]:
+                raise ValueError(f"metric debe ser una columna del histórico {FIELDS[1:]}")
+        self.config = config
+        self.default = config.default
+        self.cron: List[Tuple[CronSpec, ScheduleRule]] = [
+            (CronSpec(rule.cron), rule) for rule in config.rules if rule.cron is not None
+        ]
+        self.calendar = [rule for rule in config.rules if rule.start is not None]
+        self.load = [rule for rule in config.rules if rule.above is not None]
+        self.enabled = bool(config.rules) or config.default is not None
+        self.next_at = 0.0 if self.enabled else math.inf
+        self.profile: Optional[str] = None
+        self.reason = "default"
+        self._time_profile: Optional[str] = None
+        self._time_reason = "default"
+        self._time_next = 0.0
+        self._load_since: List[Optional[float]] = [None] * len(self.load)  # Activación de cada regla
+
+    def _evaluate_time(self, now: float):
+        """Perfil de las reglas de calendario y cron, y su próximo cambio"""
+        t = datetime.fromtimestamp(now)
+        boundaries = []
+        profile, reason = self.default, "default"
+        for rule in self.calendar:
+            start, end = rule.start.timestamp(), rule.end.timestamp()
+            boundaries += [b for b in (start, end) if b > now]
+            if reason != "calendar" and start <= now < end:
+                profile, reason = rule.profile, "calendar"
+        latest = None
+        for spec, rule in self.cron:
+            fired = spec.last_before(t)
+            if fired is not None and (latest is None or fired >= latest):
+                latest = fired
+                if reason != "calendar":
+                    profile, reason = rule.profile, "cron"
+            following = spec.next_after(t)
+            if following is not None:
+                boundaries.append(following.timestamp())
+        self._time_profile, self._time_reason = profile, reason
+        self._time_next = min(boundaries, default=math.inf)
+
+    def evaluate(self, now: float, mean: WindowMean) -> Optional[str]:
+        """Perfil que rige en `now` (None: configuración base); actualiza next_at"""
+        if now >= self._time_next:
+            self._evaluate_time(now)
+        profile, reason = self._time_profile, self._time_reason
+        next_at = self._time_next
+        if self.load:
+            chosen = False
+            for k, rule in enumerate(self.load):
+                since = self._load_since[k]
+                value = mean(rule.metric, rule.window)
+                if since is None:
+                    if value is not None and value > rule.above:
+                        since = now
+                elif now - since >= rule.hold and (value is None or value <= rule.above - rule.hysteresis):
+                    since = None
+                self._load_since[k] = since
+                if since is not None and not chosen:
+                    profile, reason, chosen = rule.profile, f"load:{rule.metric}>{rule.above:g}", True
+            next_at = min(next_at, now + self.config.load_check)
+        self.profile, self.reason = profile, reason
+        self.next_at = next_at
+        return profile
+
+    def describe(self):
+        return {
+            "enabled": self.enabled,
+            "profile": self.profile,
+            "reason": self.reason,
+            "next_at": self.next_at if self.next_at != math.inf else None,
+        }
@@ -0,0 +1,269 @@
+import logging
+import math
+import random
+import threading
+import time
+from bisect import bisect_right
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+
+class SimulatedFan:
+    """Ventilador con inercia, umbrales de arranque/parada y curva PWM -> RPM no lineal.
+
+    Parado, sólo arranca con PWM >= start_pwm; girando, se detiene con
+    PWM < stop_pwm (stop_pwm <= start_pwm). Las RPM siguen al objetivo con
+    una respuesta de primer orden (tau_up al acelerar, tau_down al frenar).
+    """
+
+    __slots__ = ("max_rpm", "min_rpm", "start_pwm", "stop_pwm", "gamma", "tau_up", "tau_down",
+                 "noise", "rpm", "spinning", "pwm")
+
+    def __init__(self, max_rpm: float = 1800.0, min_rpm: float = 400.0, start_pwm: int = 60,
+                 stop_pwm: int = 40, gamma: float = 0.8, tau_up: float = 0.6, tau_down: float = 1.2,
+                 noise: float = 0.005):
+        self.max_rpm = max_rpm
+        self.min_rpm = min_rpm    # RPM a stop_pwm
+        self.start_pwm = start_pwm
+        self.stop_pwm = stop_pwm
+        self.gamma = gamma
+        self.tau_up = tau_up
+        self.tau_down = tau_down
+        self.noise = noise
+        self.rpm = 0.0
+        self.spinning = False
+        self.pwm = 0
+
+    def target_rpm(self, pwm: int) -> float:
+        """RPM de equilibrio girando con un PWM >= stop_pwm (sin ruido)"""
+        x = (pwm - self.stop_pwm) / max(1, 255 - self.stop_pwm)
+        return self.min_rpm + (self.max_rpm - self.min_rpm) * x ** self.gamma
+
+    def step(self, dt: float) -> float:
+        """Avanza dt segundos con el PWM actual; devuelve las RPM reales"""
+        pwm = self.pwm
+        if self.spinning and pwm < self.stop_pwm:
+            self.spinning = False
+        elif not self.spinning and pwm >= self.start_pwm:
+            self.spinning = True
+        target = self.target_rpm(pwm) if self.spinning else 0.0
+        tau = self.tau_up if target > self.rpm else self.tau_down
+        self.rpm += (target - self.rpm) * (1 - math.exp(-dt / tau))
+        if self.rpm < 50 and not self.spinning:
+            self.rpm = max(0.0, self.rpm - 200 * dt)
+        return self.rpm
+
+    def reading(self, rng: random.Random) -> int:
+        """Lectura del tacómetro (con ruido)"""
+        if self.rpm <= 0:
+            return 0
+        return int(max(0.0, self.rpm * (1 + rng.gauss(0, self.noise))))
+
+
+# --- Carga y modelo térmico ---------------------------------------------------
+
+LoadProfile = Callable[[float], float]  # Segundos -> carga en [0, 1]
+
+
+def steady(level: float = 0.5) -> LoadProfile:
+    return lambda t: level
+
+
+def steps(period: float = 600.0, levels: Sequence[float] = (0.1, 0.9)) -> LoadProfile:
+    """Escalones que alternan entre niveles cada `period` segundos"""
+    return lambda t: levels[int(t // period) % len(levels)]
+
+
+def diurnal(day: float = 86400.0, low: float = 0.1, high: float = 0.8) -> LoadProfile:
+    """Variación sinusoidal lenta (un ciclo por `day` segundos)"""
+    return lambda t: low + (high - low) * 0.5 * (1 - math.cos(2 * math.pi * t / day))
+
+
+def bursty(seed: int = 0, base: float = 0.2, mean_gap: float = 300.0,
+           mean_burst: float = 60.0) -> LoadProfile:
+    """Ráfagas de carga aleatorias (reproducibles con `seed`) sobre una base"""
+    rng = random.Random(seed)
+    edges: List[float] = []   # Inicio y fin alternos de cada ráfaga
+    levels: List[float] = []
+    t = 0.0
+
+    def load(now: float) -> float:
+        nonlocal t
+        while t <= now:
+            t += rng.expovariate(1 / mean_gap)
+            edges.append(t)
+            levels.append(rng.uniform(0.6, 1.0))
+            t += rng.expovariate(1 / mean_burst)
+            edges.append(t)
+        i = bisect_right(edges, now)
+        return levels[i // 2] if i % 2 else base
+    return load
+
+
+# Perfiles predefinidos por nombre (reciben una semilla)
+PROFILES: Dict[str, Callable[[int], LoadProfile]] = {
+    "steady": lambda seed: steady(),
+    "steps": lambda seed: steps(),
+    "diurnal": lambda seed: diurnal(day=4 * 3600.0),
+    "bursty": bursty,
+}
+
+
+class ThermalModel:
+    """Modelo térmico de primer orden: C·dT/dt = P(carga) - G(caudal)·(T - T_amb).
+
+    La conductancia G crece linealmente con el caudal de aire relativo
+    (0 = ventiladores parados, 1 = todos a sus RPM máximas), así que la
+    constante de tiempo C/G y la temperatura de equilibrio dependen de los
+    ventiladores.
+    """
+
+    __slots__ = ("capacity", "ambient", "idle_power", "max_power", "conductance",
+                 "airflow_gain", "temp")
+
+    def __init__(self, capacity: float = 400.0, ambient: float = 25.0, idle_power: float = 20.0,
+                 max_power: float = 150.0, conductance: float = 0.6, airflow_gain: float = 3.4):
+        self.capacity = capacity          # J/K
+        self.ambient = ambient            # °C
+        self.idle_power = idle_power      # W
+        self.max_power = max_power        # W
+        self.conductance = conductance    # W/K sin caudal (convección natural)
+        self.airflow_gain = airflow_gain  # W/K adicionales con caudal máximo
+        self.temp = ambient + idle_power / conductance / 4
+
+    def step(self, dt: float, load: float, airflow: float) -> float:
+        power = self.idle_power + (self.max_power - self.idle_power) * load
+        g = self.conductance + self.airflow_gain * airflow
+        # Solución exacta en el paso (estable con cualquier dt)
+        target = self.ambient + power / g
+        self.temp = target + (self.temp - target) * math.exp(-dt * g / self.capacity)
+        return self.temp
+
+
+class HwmonSimulator:
+    """Árbol hwmon simulado en un directorio.
+
+    Crea <root>/hwmon0 con name, temp1_input (ambiente), temp2_input (la
+    zona del modelo térmico), pwmN, pwmN_enable y fanN_input, y <root>/proc
+    con stat y loadavg según la carga (para proc_root). En cada paso lee los
+    PWM escritos por el servicio, integra los ventiladores y la temperatura
+    y publica las lecturas. step(dt) avanza en tiempo virtual (benchmarks);
+    start() lo hace en tiempo real desde un hilo.
+    """
+
+    def __init__(self, root, fans: Optional[List[SimulatedFan]] = None, chip: str = "fansim",
+                 thermal: Optional[ThermalModel] = None, load: Optional[LoadProfile] = None,
+                 dt: float = 0.05, seed: int = 0, cpus: int = 4):
+        self.root = Path(root)
+        self.dir = self.root / "hwmon0"
+        self.proc = self.root / "proc"
+        self.cpus = cpus
+        self.busy = 0.0      # Jiffies acumulados (USER_HZ = 100)
+        self.idle = 0.0
+        self.loadavg = 0.0   # Media exponencial de 1 minuto de los procesos activos
+        self.fans = fans if fans is not None else [SimulatedFan()]
+        self.chip = chip
+        self.thermal = thermal or ThermalModel()
+        self.load = load or steady(0.3)
+        self.dt = dt
+        self.t = 0.0  # Tiempo simulado (s)
+        self.logger = logging.getLogger(__name__)
+        self._rng = random.Random(seed)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._create()
+
+    def _create(self):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        (self.dir / "name").write_text(f"{self.chip}\n")
+        for name, value in (("temp1_input", int(self.thermal.ambient * 1000)),
+                            ("temp2_input", int(self.thermal.temp * 1000))):
+            (self.dir / name).write_bytes(b"%-11d\n" % value)
+        for n, fan in enumerate(self.fans, 1):
+            (self.dir / f"pwm{n}").write_text(f"{fan.pwm}\n")
+            (self.dir / f"pwm{n}_enable").write_text("2\n")
+            (self.dir / f"fan{n}_input").write_bytes(b"%-11d\n" % 0)
+        self.proc.mkdir(exist_ok=True)
+        # Sólo se actualiza la primera línea; las de cada CPU indican cuántas hay
+        (self.proc / "stat").write_bytes(self._stat_line() + b"".join(
+            b"cpu%d 0 0 0 0 0 0 0 0 0 0\n" % k for k in range(self.cpus)))
+        (self.proc / "loadavg").write_bytes(self._loadavg_line())
+
+    def _stat_line(self) -> bytes:
+        return b"cpu  %-15d 0 0 %-15d 0 0 0 0 0 0\n" % (self.busy, self.idle)
+
+    def _loadavg_line(self) -> bytes:
+        return b"%-8.2f 0.00 0.00 1/100 1      \n" % self.loadavg
+
+    @staticmethod
+    def _write(path: Path, value: int):
+        # En el sitio y con ancho fijo, como un atributo de sysfs: HwmonIO mantiene
+        # los descriptores abiertos y relee con pread, así que no se puede
+        # sustituir el fichero, y un valor más corto no debe dejar restos
+        with open(path, "r+b") as f:
+            f.write(b"%-11d\n" % value)
+
+    @staticmethod
+    def _overwrite(path: Path, line: bytes):
+        # Mismo ancho siempre: quien lee con pread sobre un descriptor abierto ve la línea completa
+        with open(path, "r+b") as f:
+            f.write(line)
+
+    @staticmethod
+    def _read_pwm(path: Path) -> int:
+        # Sólo la primera línea: las escrituras (pwrite "<valor>\n") no truncan
+        return int(path.read_bytes().split(b"\n", 1)[0])
+
+    @property
+    def airflow(self) -> float:
+        """Caudal relativo: media de RPM / RPM máximas de los ventiladores"""
+        if not self.fans:
+            return 0.0
+        return sum(min(1.0, fan.rpm / fan.max_rpm) for fan in self.fans) / len(self.fans)
+
+    def step(self, dt: float):
+        """Avanza dt segundos (en subpasos de self.dt) y publica las lecturas"""
+        for n, fan in enumerate(self.fans, 1):
+            try:
+                # Un fichero vacío es una escritura a medias (en sysfs son atómicas): se ignora
+                fan.pwm = max(0, min(255, self._read_pwm(self.dir / f"pwm{n}")))
+            except (OSError, ValueError):
+                pass
+        steps = max(1, int(math.ceil(dt / self.dt - 1e-9)))
+        h = dt / steps
+        thermal, fans = self.thermal, self.fans
+        decay = 1 - math.exp(-h / 60.0)
+        for _ in range(steps):
+            for fan in fans:
+                fan.step(h)
+            load = self.load(self.t)
+            thermal.step(h, load, self.airflow)
+            self.busy += 100 * self.cpus * h * load
+            self.idle += 100 * self.cpus * h * (1 - load)
+            self.loadavg += (load * self.cpus - self.loadavg) * decay
+            self.t += h
+        for n, fan in enumerate(fans, 1):
+            self._write(self.dir / f"fan{n}_input", fan.reading(self._rng))
+        self._write(self.dir / "temp2_input", int(thermal.temp * 1000))
+        self._overwrite(self.proc / "stat", self._stat_line())
+        self._overwrite(self.proc / "loadavg", self._loadavg_line())
+
+    def _run(self):
+        last = time.monotonic()
+        while not self._stop.wait(self.dt):
+            now = time.monotonic()
+            self.step(now - last)
+            last = now
+
+    def start(self) -> "HwmonSimulator":
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="hwmon-sim", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,68 @@
+from typing import Dict, Optional, Tuple
+from ..models.config import FanConfig
+from .alerts import AlertService
+from .analytics import StreamAnalytics
+from .curves import CompiledCurve
+from .engine import ControlEngine
+from .scheduler import ProfileScheduler
+
+
+class ControlState:
+    """Configuración compilada e inmutable que usa el bucle de control.
+
+    Reúne todo lo que depende de la configuración: el motor con las curvas
+    precompiladas, los límites del actuador, las rutas hwmon resueltas y las
+    reglas de alertas y analítica. Se construye y valida fuera del bucle y se
+    publica con una sola asignación; el bucle lee la referencia una vez por
+    tick, así que nunca mezcla dos configuraciones ni vuelve a interpretarlas.
+    """
+
+    __slots__ = ("version", "config", "engine", "curves", "min_pwm", "hysteresis", "min_interval",
+                 "temp_critical", "period", "control_every", "inputs", "outputs", "unresolved",
+                 "alerts", "analytics", "signal_names", "profile", "base", "scheduler", "ramp_rate")
+
+    def __init__(self, version: int, config: FanConfig, engine: ControlEngine,
+                 inputs: Dict[str, str], outputs: Dict[str, str], unresolved: Tuple[str, ...],
+                 alerts: AlertService, analytics: StreamAnalytics, signal_names: Dict[str, str],
+                 scheduler: ProfileScheduler, profile: Optional[str] = None,
+                 base: Optional[FanConfig] = None, ramp_rate: float = 0.0):
+        names = engine.fan_names
+        curves: Dict[str, CompiledCurve] = engine.curves
+        fields = {
+            "version": version,
+            "config": config,
+            "engine": engine,
+            "curves": curves,
+            "min_pwm": tuple(curves[name].min_pwm for name in names),
+            "hysteresis": tuple(float(curves[name].hysteresis) for name in names),
+            "min_interval": config.min_write_interval,
+            "temp_critical": config.alerts.temp_critical,
+            "period": 1.0 / config.sample_rate,
+            "control_every": max(1, round(config.sample_rate / config.control_rate)),
+            "inputs": inputs,
+            "outputs": outputs,
+            "unresolved": unresolved,
+            "alerts": alerts,
+            "analytics": analytics,
+            "signal_names": signal_names,
+            "scheduler": scheduler,
+            "profile": profile,         # Perfil aplicado sobre la configuración base
+            "base": base or config,     # Configuración sin perfil (fichero o API)
+            "ramp_rate": ramp_rate,     # PWM/s al activarlo (0: sin rampa)
+        }
+        for name, value in fields.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ControlState es inmutable")
+
+    def describe(self) -> Dict:
+        return {
+            "version": self.version,
+            "profile": self.profile,
+            "fans": list(self.engine.fan_names),
+            "zones": list(self.engine.zones),
+            "sample_rate": self.config.sample_rate,
+            "control_rate": self.config.control_rate,
+            "unresolved": list(self.unresolved),
+        }
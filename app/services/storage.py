@@ -0,0 +1,298 @@
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+import zlib
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Registro de ancho fijo: timestamp, temp, fan1_rpm, fan2_rpm, pwm1, pwm2 + CRC32
+BODY = struct.Struct("<ddffBB2x")
+ROW = struct.Struct("<ddffBB2x4x")  # Registro completo sin el CRC
+RECORD_SIZE = ROW.size
+# Posición de cada campo dentro del registro (lectura por columnas)
+OFFSETS: Dict[str, int] = {
+    "timestamp": 0, "temp": 8, "fan1_rpm": 16, "fan2_rpm": 20, "pwm1": 24, "pwm2": 25,
+}
+SEGMENT_SUFFIX = ".seg2"
+# Formato anterior (timestamp entero en segundos), se convierte al abrir
+LEGACY_BODY = struct.Struct("<qdffBB2x")
+LEGACY_SUFFIX = ".seg"
+
+
+class _Segment:
+    """Fichero de segmento: start es el número de secuencia de su primer registro"""
+
+    def __init__(self, path: Path, start: int, count: int):
+        self.path = path
+        self.start = start
+        self.count = count
+
+
+class SegmentStore:
+    """Histórico persistente en segmentos binarios de solo-añadir leídos con mmap.
+
+    Implementa la misma interfaz que RingBuffer para que HistoryService pueda
+    usar cualquiera de los dos como almacenamiento.
+    """
+
+    fields: Tuple[str, ...] = ("timestamp", "temp", "fan1_rpm", "fan2_rpm", "pwm1", "pwm2")
+    typecodes: Dict[str, str] = {
+        "timestamp": "d", "temp": "d", "fan1_rpm": "f", "fan2_rpm": "f", "pwm1": "B", "pwm2": "B",
+    }
+
+    def __init__(self, directory, segment_records: int = 86400, max_segments: int = 400,
+                 max_mapped: int = 16):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_records = segment_records  # 1 día por segmento a 1Hz
+        self.max_segments = max_segments
+        self.max_mapped = max_mapped
+        self.logger = logging.getLogger(__name__)
+        self._field_index = {name: i for i, name in enumerate(self.fields)}
+        self._segments: List[_Segment] = []
+        self._starts: List[int] = []
+        self._maps: "OrderedDict[Path, Tuple[mmap.mmap, int]]" = OrderedDict()
+        # Las lecturas largas (exportaciones) se hacen desde un executor
+        self._maps_lock = threading.RLock()
+        self._fd: Optional[int] = None
+        self._load()
+
+    # --- Apertura y recuperación -------------------------------------------
+
+    def _migrate(self, path: Path):
+        """Convierte un segmento del formato anterior al actual"""
+        data = path.read_bytes()
+        out = bytearray()
+        for offset in range(0, len(data) - RECORD_SIZE + 1, RECORD_SIZE):
+            raw = data[offset:offset + RECORD_SIZE]
+            if zlib.crc32(raw[:LEGACY_BODY.size]) != int.from_bytes(raw[LEGACY_BODY.size:], "little"):
+                break
+            body = BODY.pack(*LEGACY_BODY.unpack_from(raw))
+            out += body + zlib.crc32(body).to_bytes(4, "little")
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(out)
+        os.replace(tmp, path.with_suffix(SEGMENT_SUFFIX))
+        path.unlink()
+        self.logger.info(f"Segmento {path.name} convertido al formato actual")
+
+    def _load(self):
+        for path in sorted(self.directory.glob(f"*{LEGACY_SUFFIX}")):
+            self._migrate(path)
+        for path in sorted(self.directory.glob(f"*{SEGMENT_SUFFIX}")):
+            try:
+                start = int(path.stem)
+            except ValueError:
+                continue
+            count = path.stat().st_size // RECORD_SIZE
+            self._segments.append(_Segment(path, start, count))
+
+        if self._segments:
+            self._recover(self._segments[-1])
+            # Descartar segmentos vacíos que hayan quedado al final
+            while self._segments and self._segments[-1].count == 0 and len(self._segments) > 1:
+                self._segments.pop().path.unlink()
+        else:
+            self._segments.append(self._create_segment(0))
+
+        self._starts = [seg.start for seg in self._segments]
+        self._fd = os.open(self._segments[-1].path, os.O_WRONLY | os.O_APPEND)
+
+    def _recover(self, seg: _Segment):
+        """Trunca un final de segmento escrito a medias o corrupto"""
+        size = seg.path.stat().st_size
+        valid = size // RECORD_SIZE
+        with open(seg.path, "rb") as f:
+            while valid > 0:
+                f.seek((valid - 1) * RECORD_SIZE)
+                if self._check(f.read(RECORD_SIZE)):
+                    break
+                valid -= 1
+        if valid * RECORD_SIZE != size:
+            self.logger.warning(
+                f"Recuperando {seg.path.name}: descartados {size - valid * RECORD_SIZE} bytes")
+            os.truncate(seg.path, valid * RECORD_SIZE)
+        seg.count = valid
+
+    @staticmethod
+    def _check(raw: bytes) -> bool:
+        return (len(raw) == RECORD_SIZE
+                and zlib.crc32(raw[:BODY.size]) == int.from_bytes(raw[BODY.size:], "little"))
+
+    def _create_segment(self, start: int) -> _Segment:
+        path = self.directory / f"{start:012d}{SEGMENT_SUFFIX}"
+        path.touch()
+        return _Segment(path, start, 0)
+
+    # --- Escritura -----------------------------------------------------------
+
+    def append(self, values: Sequence) -> None:
+        """Añade un registro al segmento activo, rotando si está lleno"""
+        seg = self._segments[-1]
+        if seg.count >= self.segment_records:
+            seg = self._rotate()
+        body = BODY.pack(*values)
+        os.write(self._fd, body + zlib.crc32(body).to_bytes(4, "little"))
+        seg.count += 1
+
+    def _rotate(self) -> _Segment:
+        os.fsync(self._fd)
+        os.close(self._fd)
+        last = self._segments[-1]
+        seg = self._create_segment(last.start + last.count)
+        self._fd = os.open(seg.path, os.O_WRONLY | os.O_APPEND)
+        # Los lectores de los executors localizan segmentos con el mismo lock
+        with self._maps_lock:
+            self._segments.append(seg)
+            self._starts.append(seg.start)
+
+            # Retención: eliminar los segmentos más antiguos
+            while len(self._segments) > self.max_segments:
+                old = self._segments.pop(0)
+                self._starts.pop(0)
+                self._unmap(old.path)
+                old.path.unlink()
+        return seg
+
+    # --- Lectura -------------------------------------------------------------
+
+    @property
+    def count(self) -> int:
+        """Total de muestras escritas (número de secuencia)"""
+        last = self._segments[-1]
+        return last.start + last.count
+
+    def __len__(self) -> int:
+        return self.count - self._segments[0].start
+
+    def _view(self, seg: _Segment) -> memoryview:
+        """Vista mmap del segmento, remapeando si el fichero ha crecido"""
+        length = seg.count * RECORD_SIZE
+        with self._maps_lock:
+            cached = self._maps.get(seg.path)
+            if cached is None or cached[1] < length:
+                self._unmap(seg.path)
+                with open(seg.path, "rb") as f:
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps[seg.path] = (mm, len(mm))
+                while len(self._maps) > self.max_mapped:
+                    self._unmap(next(iter(self._maps)))
+                cached = self._maps[seg.path]
+            self._maps.move_to_end(seg.path)
+            return memoryview(cached[0])[:length]
+
+    def _unmap(self, path: Path):
+        with self._maps_lock:
+            cached = self._maps.pop(path, None)
+        if cached is not None:
+            try:
+                cached[0].close()
+            except BufferError:
+                pass  # Aún hay vistas exportadas; se liberará con ellas
+
+    def _locate(self, i: int) -> Tuple[memoryview, int]:
+        """Vista del segmento con la muestra lógica i y la posición de ésta en él.
+
+        Localizar y mapear se hace con _maps_lock: _rotate no puede retirar
+        el segmento entre medias. La vista sigue siendo válida después.
+        """
+        with self._maps_lock:
+            seq = self._segments[0].start + i
+            seg = self._segments[bisect_right(self._starts, seq) - 1]
+            return self._view(seg), seq - seg.start
+
+    def row(self, i: int) -> Tuple:
+        """Devuelve la muestra lógica i (0 = más antigua) como tupla"""
+        size = len(self)
+        if i < 0:
+            i += size
+        if not 0 <= i < size:
+            raise IndexError("índice fuera de rango")
+        view, offset = self._locate(i)
+        return BODY.unpack_from(view, offset * RECORD_SIZE)
+
+    def rows(self, start: int, stop: int) -> Iterator[Tuple]:
+        """Muestras entre dos índices lógicos, leídas tramo a tramo del mmap"""
+        start = max(0, start)
+        stop = min(stop, len(self))
+        while start < stop:
+            view, offset = self._locate(start)
+            n = min(stop - start, len(view) // RECORD_SIZE - offset)
+            yield from ROW.iter_unpack(view[offset * RECORD_SIZE:(offset + n) * RECORD_SIZE])
+            start += n
+
+    def bisect(self, name: str, value: float) -> int:
+        """Primer índice lógico cuyo valor en la columna (ordenada) es >= value"""
+        idx = self._field_index[name]
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.row(mid)[idx] < value:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def column(self, name: str, start: int, stop: int) -> array:
+        """Columna entre dos índices lógicos, copiada del mmap sin desempaquetar registros.
+
+        Cada byte del campo se recoge con un slice de paso RECORD_SIZE y se
+        intercala en su posición: todo el trabajo es de slicing en C.
+        """
+        out = array(self.typecodes[name])
+        size, offset = out.itemsize, OFFSETS[name]
+        start = max(0, start)
+        stop = min(stop, len(self))
+        while start < stop:
+            view, first = self._locate(start)
+            n = min(stop - start, len(view) // RECORD_SIZE - first)
+            view = view[first * RECORD_SIZE:(first + n) * RECORD_SIZE]
+            raw = bytearray(n * size)
+            for j in range(size):
+                raw[j::size] = view[offset + j::RECORD_SIZE]
+            out.frombytes(raw)
+            start += n
+        if sys.byteorder != "little":
+            out.byteswap()
+        return out
+
+    def values(self, name: str, start: int, stop: int) -> List:
+        """Valores de una columna entre dos índices lógicos"""
+        return self.column(name, start, stop).tolist()
+
+    def segments(self, name: str, last_n: Optional[int] = None,
+                 stop: Optional[int] = None) -> List[array]:
+        """Últimas N muestras de una columna antes de stop (copia: en disco no son contiguas)"""
+        stop = len(self) if stop is None else max(0, min(stop, len(self)))
+        n = stop if last_n is None else max(0, min(last_n, stop))
+        return [self.column(name, stop - n, stop)]
+
+    def covers(self, name: str, value: float) -> bool:
+        """Indica si no se ha descartado ningún dato posterior a value"""
+        if self._segments[0].start == 0 or not len(self):
+            return True
+        return self.row(0)[self._field_index[name]] <= value
+
+    def clear(self) -> None:
+        os.close(self._fd)
+        with self._maps_lock:
+            for seg in self._segments:
+                self._unmap(seg.path)
+                seg.path.unlink()
+            start = self.count
+            self._segments = [self._create_segment(start)]
+            self._starts = [start]
+        self._fd = os.open(self._segments[0].path, os.O_WRONLY | os.O_APPEND)
+
+    def close(self) -> None:
+        for path in list(self._maps):
+            self._unmap(path)
+        if self._fd is not None:
+            os.fsync(self._fd)
+            os.close(self._fd)
+            self._fd = None
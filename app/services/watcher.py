@@ -0,0 +1,136 @@
+import asyncio
+import ctypes
+import ctypes.util
+import logging
+import os
+import struct
+from pathlib import Path
+from typing import Awaitable, Callable, Optional, Tuple
+
+# Constantes de <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len (seguido del nombre)
+
+
+def _inotify_libc():
+    """libc con inotify, o None si la plataforma no lo ofrece"""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    except OSError:
+        return None
+    return libc if hasattr(libc, "inotify_init1") and hasattr(libc, "inotify_add_watch") else None
+
+
+class ConfigWatcher:
+    """Vigila un fichero y ejecuta `callback` (una corrutina) cuando cambia.
+
+    Usa inotify sobre el directorio padre, porque los editores y
+    scripts/calibrate.py sustituyen el fichero con un rename; si inotify no
+    está disponible, sondea mtime, tamaño e inodo cada `poll` segundos. Las
+    ráfagas de eventos se agrupan durante `debounce` segundos y sólo se llama
+    a callback si el fichero ha cambiado de verdad.
+    """
+
+    def __init__(self, path, callback: Callable[[], Awaitable], poll: float = 2.0,
+                 debounce: float = 0.2):
+        self.path = Path(path)
+        self.callback = callback
+        self.poll = poll
+        self.debounce = debounce
+        self.mode: Optional[str] = None  # "inotify" o "poll" una vez iniciado
+        self.changes = 0
+        self.logger = logging.getLogger(__name__)
+        self._fd: Optional[int] = None
+        self._event: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last = self._signature()
+
+    def _signature(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def _open_inotify(self) -> bool:
+        libc = _inotify_libc()
+        if libc is None:
+            return False
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return False
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+        if libc.inotify_add_watch(fd, os.fsencode(self.path.parent), mask) < 0:
+            self.logger.warning(f"inotify no disponible para {self.path.parent}: "
+                                f"{os.strerror(ctypes.get_errno())}")
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def _on_readable(self):
+        """Lee los eventos pendientes y avisa si alguno afecta al fichero vigilado"""
+        try:
+            data = os.read(self._fd, 65536)
+        except BlockingIOError:
+            return
+        name = os.fsencode(self.path.name)
+        offset = 0
+        while offset < len(data):
+            _, _, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            if data[offset:offset + length].rstrip(b"\0") == name:
+                self._event.set()
+            offset += length
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._event = asyncio.Event()
+        if self._open_inotify():
+            asyncio.get_running_loop().add_reader(self._fd, self._on_readable)
+            self.mode = "inotify"
+        else:
+            self.mode = "poll"
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._fd is not None:
+            asyncio.get_running_loop().remove_reader(self._fd)
+            os.close(self._fd)
+            self._fd = None
+
+    async def _run(self):
+        while True:
+            if self._fd is not None:
+                await self._event.wait()
+                await asyncio.sleep(self.debounce)
+                self._event.clear()
+            else:
+                await asyncio.sleep(self.poll)
+            signature = self._signature()
+            if signature == self._last or signature is None:
+                # Sin cambios, o el fichero ha desaparecido: se mantiene la configuración
+                continue
+            self._last = signature
+            self.changes += 1
+            try:
+                await self.callback()
+            except Exception as e:
+                self.logger.error(f"Error recargando {self.path}: {e}")
+
+    def stats(self):
+        return {"path": str(self.path), "mode": self.mode, "changes": self.changes}
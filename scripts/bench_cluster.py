@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""Benchmark del modo agregador con N nodos locales.
+
+Arranca N nodos sustitutos (apps FastAPI con /stream y /history servidas por
+uvicorn en el mismo proceso, en un hilo con su propio event loop) y apunta
+un ClusterAggregator a ellos. Algunos nodos responden al histórico más
+despacio que el timeout (--slow) y otros no escuchan (--down). Mide:
+
+- el tiempo hasta tener la primera muestra de todos los nodos sanos,
+- los frames del feed conjunto y su latencia desde que los publica el nodo,
+- la CPU del hilo del agregador por frame,
+- la latencia de /cluster y de /cluster/history (reparto en paralelo con
+  timeout por nodo: los nodos lentos o caídos no deben retrasar al resto).
+
+Sale con código 1 si algún nodo sano no llega, se pierden frames o el
+reparto del histórico tarda más que el timeout más un margen.
+
+Uso (desde la raíz del repositorio):
+    python scripts/bench_cluster.py [--nodes 100] [--rate 1] [--seconds 10] [--slow 5] [--down 5]
+"""
+import argparse
+import asyncio
+import logging
+import socket
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from fastapi import FastAPI, Response  # noqa: E402
+from fastapi.responses import StreamingResponse  # noqa: E402
+
+from app.models.sensor import Sample  # noqa: E402
+from app.routes import cluster as cluster_routes  # noqa: E402
+from app.routes.deps import get_cluster  # noqa: E402
+from app.routes.ws import event_generator  # noqa: E402
+from app.services.broadcast import BroadcastHub  # noqa: E402
+from app.services.cluster import ClusterAggregator  # noqa: E402
+from app.services.export import ENCODERS  # noqa: E402
+from app.services.history import HistoryService  # noqa: E402
+
+
+def node_app(k: int, rate: float, history_delay: float) -> FastAPI:
+    """Nodo sustituto: publica muestras sintéticas a `rate` Hz y sirve su histórico"""
+    hub = BroadcastHub()
+    history = HistoryService(max_records=4000, tiers=())
+    now = time.time()
+    for i in range(3600):
+        history.add_record(Sample(now - 3600 + i, 40.0 + k % 20 + i % 7, 1200.0, 800.0, 90, 14))
+    # Respuesta precalculada: los 100 nodos comparten un hilo y lo que se mide es el agregador
+    body = b"".join(ENCODERS["json"](history.export(now - 3600, now, 500)))
+    app = FastAPI()
+
+    @app.get("/stream")
+    async def stream():
+        return StreamingResponse(event_generator(hub), media_type="text/event-stream")
+
+    @app.get("/history")
+    async def get_history(start: float, end: float):
+        await asyncio.sleep(history_delay)
+        return Response(content=body, media_type="application/json")
+
+    @app.on_event("startup")
+    async def start_publisher():
+        async def publish():
+            i = 0
+            while True:
+                hub.publish(Sample(time.time(), 40.0 + k % 20 + i % 5, 1200.0, 800.0, 90, 14).to_json())
+                i += 1
+                await asyncio.sleep(1 / rate)
+        app.state.publisher = asyncio.create_task(publish())
+
+    return app
+
+
+def free_socket() -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", 0))
+    return sock
+
+
+class Nodes:
+    """N servidores uvicorn en un hilo propio (un solo event loop)"""
+
+    def __init__(self, n: int, rate: float, slow: int, down: int, slow_delay: float):
+        self.urls = {}
+        self.servers = []
+        self.sockets = []
+        self.expected_down = set()
+        self.expected_slow = set()
+        for k in range(n):
+            name = f"node{k:03d}"
+            sock = free_socket()
+            self.urls[name] = f"http://127.0.0.1:{sock.getsockname()[1]}"
+            if k < down:
+                sock.close()  # Puerto sin nadie escuchando
+                self.expected_down.add(name)
+                continue
+            delay = slow_delay if k < down + slow else 0.0
+            if delay:
+                self.expected_slow.add(name)
+            config = uvicorn.Config(node_app(k, rate, delay), log_level="error", lifespan="on")
+            self.servers.append(uvicorn.Server(config))
+            self.sockets.append(sock)
+        self._thread = threading.Thread(target=self._run, name="nodes", daemon=True)
+
+    def _run(self):
+        async def serve_all():
+            await asyncio.gather(*(server.serve(sockets=[sock])
+                                   for server, sock in zip(self.servers, self.sockets)))
+        asyncio.run(serve_all())
+
+    def start(self):
+        self._thread.start()
+        while not all(server.started for server in self.servers):
+            time.sleep(0.05)
+
+    def stop(self):
+        for server in self.servers:
+            server.should_exit = True
+        self._thread.join(timeout=10)
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+async def run(args) -> int:
+    nodes = Nodes(args.nodes, args.rate, args.slow, args.down, args.slow_delay)
+    begin = time.perf_counter()
+    nodes.start()
+    print(f"{args.nodes} nodos ({len(nodes.expected_slow)} lentos, {len(nodes.expected_down)} caídos) "
+          f"arrancados en {time.perf_counter() - begin:.1f} s")
+
+    cluster = ClusterAggregator(nodes.urls, timeout=args.timeout)
+    app = FastAPI()
+    app.dependency_overrides[get_cluster] = lambda: cluster
+    app.include_router(cluster_routes.router)
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://aggregator")
+    healthy = set(nodes.urls) - nodes.expected_down
+    ok = True
+    try:
+        begin = time.perf_counter()
+        await cluster.start()
+        deadline = begin + 10.0
+        while time.perf_counter() < deadline:
+            if all(cluster.peers[name].sample is not None for name in healthy):
+                break
+            await asyncio.sleep(0.02)
+        connect = time.perf_counter() - begin
+        missing = [name for name in healthy if cluster.peers[name].sample is None]
+        print(f"Primera muestra de los {len(healthy)} nodos sanos en {connect:.2f} s"
+              + (f" (faltan {len(missing)})" if missing else ""))
+        ok = ok and not missing
+
+        # Feed conjunto: frames recibidos y latencia desde la publicación en el nodo
+        queue = cluster.hub.subscribe()
+        while not queue.empty():
+            queue.get_nowait()
+        latencies = []
+        frames = 0
+        dropped0 = cluster.hub.frames_dropped
+        cpu0 = time.thread_time()
+        end = time.perf_counter() + args.seconds
+        while True:
+            timeout = end - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                frame = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            frames += 1
+            ts = frame.text.rsplit('"timestamp":', 1)[1].split(",", 1)[0]
+            latencies.append(time.time() - float(ts))
+        cpu = time.thread_time() - cpu0
+        cluster.hub.unsubscribe(queue)
+        expected = len(healthy) * args.rate * args.seconds
+        dropped = cluster.hub.frames_dropped - dropped0
+        print(f"Feed conjunto: {frames} frames en {args.seconds:.0f} s ({frames / expected:.0%} de lo esperado), "
+              f"{dropped} descartados, latencia p50 {percentile(latencies, 0.5) * 1e3:.1f} ms, "
+              f"p99 {percentile(latencies, 0.99) * 1e3:.1f} ms")
+        print(f"CPU del agregador: {cpu / max(frames, 1) * 1e6:.0f} µs/frame "
+              f"({cpu / args.seconds:.1%} de un núcleo)")
+        ok = ok and frames >= 0.9 * expected and dropped == 0
+
+        # Vista conjunta
+        times = []
+        for _ in range(20):
+            t = time.perf_counter()
+            view = (await client.get("/cluster")).json()
+            times.append(time.perf_counter() - t)
+        summary = view["summary"]
+        print(f"/cluster: {summary['up']} up, {summary['stale']} stale, {summary['down']} down; "
+              f"p50 {statistics.median(times) * 1e3:.1f} ms")
+        ok = ok and summary["up"] == len(healthy) and summary["down"] == len(nodes.expected_down)
+
+        # Reparto del histórico
+        times = []
+        for _ in range(args.queries):
+            now = time.time()
+            t = time.perf_counter()
+            response = await client.get("/cluster/history", params={"start": now - 3600, "end": now,
+                                                                    "max_points": 500})
+            times.append(time.perf_counter() - t)
+            result = response.json()
+        late = set(result["errors"])
+        expected_late = nodes.expected_slow | nodes.expected_down
+        print(f"/cluster/history: {len(result['nodes'])} nodos, {len(late)} errores "
+              f"({sum(1 for e in result['errors'].values() if e == 'timeout')} timeouts); "
+              f"p50 {statistics.median(times) * 1e3:.0f} ms, máx {max(times) * 1e3:.0f} ms "
+              f"(timeout {args.timeout * 1e3:.0f} ms)")
+        ok = ok and late == expected_late and max(times) <= args.timeout + 0.5
+    finally:
+        await client.aclose()
+        await cluster.stop()
+        nodes.stop()
+    print("OK" if ok else "FALLO")
+    return 0 if ok else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=1.0, help="muestras por segundo de cada nodo")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--slow", type=int, default=5, help="nodos con el histórico más lento que el timeout")
+    parser.add_argument("--down", type=int, default=5, help="nodos que no escuchan")
+    parser.add_argument("--slow-delay", type=float, default=5.0)
+    parser.add_argument("--timeout", type=float, default=1.0, help="timeout por nodo (s)")
+    parser.add_argument("--queries", type=int, default=5)
+    args = parser.parse_args()
+    for name in ("app.services.cluster", "httpx"):
+        logging.getLogger(name).setLevel(logging.WARNING if name == "httpx" else logging.ERROR)
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
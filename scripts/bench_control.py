@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""Benchmark del bucle de control sobre un hwmon simulado con modelo térmico.
+
+El servicio real (FanControlService) lee y escribe en un árbol hwmon
+simulado (ventiladores con inercia y ruido, temperatura de primer orden
+según la carga y el caudal) y avanza en tiempo virtual, así que horas de
+carga se reproducen en segundos. Por perfil de carga informa de la calidad
+del control (pico y sobreimpulso sobre temp_threshold, tiempo por encima,
+oscilaciones y escrituras PWM) y del coste de CPU por ciclo.
+
+Con --save se guardan los resultados y con --compare se sale con código 1
+si la CPU por ciclo o la calidad empeoran más de --tolerance respecto a una
+ejecución anterior. Con --predictive los ventiladores indicados usan el
+control predictivo (PID con feed-forward de carga) en lugar de su curva.
+Con --live el árbol se simula en tiempo real para apuntar el servicio
+completo a él (hwmon_root en la configuración).
+
+Uso (desde la raíz del repositorio):
+    python scripts/bench_control.py [--config FICHERO] [--profile steps bursty] [--hours 4]
+    python scripts/bench_control.py --save base.json
+    python scripts/bench_control.py --compare base.json [--tolerance 0.2]
+    python scripts/bench_control.py --predictive fan1 fan2 [--profile steps bursty]
+    python scripts/bench_control.py --live /tmp/hwmon-sim [--profile bursty]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.models.config import ChannelMap, FanConfig, default_config  # noqa: E402
+from app.services.fan_control import FanControlService  # noqa: E402
+from app.services.history import HistoryService  # noqa: E402
+from app.services.simulator import PROFILES, HwmonSimulator, SimulatedFan  # noqa: E402
+
+# Métricas comparadas con --compare (mayor es peor)
+REGRESSION_KEYS = ("cpu_us_per_tick", "overshoot", "time_above", "oscillations", "pwm_writes")
+
+
+def simulated_config(config: FanConfig, root: str) -> FanConfig:
+    """La configuración con sus canales apuntando al árbol simulado y sin notificadores"""
+    data = config.dict()
+    data["hwmon_root"] = root
+    data["proc_root"] = f"{root}/proc"
+    if data["fans"]:
+        data["zones"] = {zone: "hwmon0/temp2" for zone in data["zones"]}
+        for k, fan in enumerate(data["fans"].values(), 1):
+            fan["pwm"], fan["rpm"] = f"hwmon0/pwm{k}", f"hwmon0/fan{k}"
+    else:
+        data["channels"] = ChannelMap().dict()
+    data["alerts"].update(email=None, telegram=None, webhook=None)
+    return FanConfig(**data)
+
+
+async def replay(config: FanConfig, profile: str, hours: float, seed: int) -> dict:
+    tmp = tempfile.TemporaryDirectory()
+    fans = len(config.control_layout()[1])
+    sim = HwmonSimulator(tmp.name, [SimulatedFan() for _ in range(fans)],
+                         load=PROFILES[profile](seed), seed=seed)
+    config = simulated_config(config, tmp.name)
+    t0 = 1_700_000_000.0
+    service = FanControlService(HistoryService(), config, clock=lambda: t0 + sim.t)
+    names = service.engine.fan_names
+    threshold = config.alerts.temp_threshold
+
+    period = 1.0 / config.sample_rate
+    control_every = max(1, round(config.sample_rate / config.control_rate))
+    ticks = int(hours * 3600 / period)
+    peak, above, pwm_sum = -273.0, 0.0, 0.0
+    last = {name: -1 for name in names}
+    direction = {name: 0 for name in names}
+    oscillations = 0
+    cpu = wall = 0.0
+    begin = time.perf_counter()
+    try:
+        for tick in range(ticks):
+            sim.step(period)
+            c, w = time.process_time(), time.perf_counter()
+            await service.step(control=tick % control_every == 0)
+            cpu += time.process_time() - c
+            wall += time.perf_counter() - w
+
+            temp = sim.thermal.temp
+            peak = max(peak, temp)
+            if temp > threshold:
+                above += period
+            for name, value in service.actuator.values().items():
+                pwm_sum += value
+                # Oscilación: cambio de sentido del PWM escrito
+                if last[name] >= 0 and value != last[name]:
+                    sign = 1 if value > last[name] else -1
+                    if direction[name] and sign != direction[name]:
+                        oscillations += 1
+                    direction[name] = sign
+                last[name] = value
+        await asyncio.gather(*service._background)
+    finally:
+        service.hwmon.close()
+        service.load_sensor.close()
+        tmp.cleanup()
+    elapsed = time.perf_counter() - begin
+
+    return {
+        "profile": profile,
+        "hours": hours,
+        "ticks": ticks,
+        "peak_temp": round(peak, 2),
+        "overshoot": round(max(0.0, peak - threshold), 2),
+        "time_above": round(above, 1),
+        "oscillations": oscillations,
+        "pwm_writes": service.actuator.writes_issued,
+        "mean_pwm": round(pwm_sum / max(1, ticks * len(names)), 1),
+        "alerts": sum(1 for a in service.alerts.recent if a["state"] == "firing"),
+        "cpu_us_per_tick": round(cpu / ticks * 1e6, 1),
+        "wall_us_per_tick": round(wall / ticks * 1e6, 1),
+        "stages_us": {stage: round(h.total / max(1, h.count) * 1e6, 1)
+                      for stage, h in service.metrics.stages.items()},
+        "speedup": round(hours * 3600 / elapsed),
+        "model_fits": sum(c.fits for c in service.engine.controllers.values()),
+    }
+
+
+def report(result: dict):
+    print(f"{result['profile']:8s} {result['hours']:g} h en {result['hours'] * 3600 / result['speedup']:.1f} s "
+          f"(x{result['speedup']})")
+    print(f"  pico {result['peak_temp']:.1f} °C, sobreimpulso {result['overshoot']:.1f} °C, "
+          f"{result['time_above']:.0f} s por encima del umbral")
+    print(f"  oscilaciones {result['oscillations']}, escrituras PWM {result['pwm_writes']}, "
+          f"PWM medio {result['mean_pwm']:.1f}, alertas {result['alerts']}"
+          + (f", ajustes del modelo {result['model_fits']}" if result.get("model_fits") else ""))
+    stages = ", ".join(f"{k}={v:.1f}" for k, v in result["stages_us"].items())
+    print(f"  CPU {result['cpu_us_per_tick']:.1f} µs/ciclo (latencia {result['wall_us_per_tick']:.1f} µs; "
+          f"etapas µs: {stages})")
+
+
+def compare(results: list, baseline: dict, tolerance: float) -> bool:
+    ok = True
+    for result in results:
+        base = baseline.get(result["profile"])
+        if base is None:
+            continue
+        for key in REGRESSION_KEYS:
+            new, old = result[key], base[key]
+            # Holgura absoluta para métricas que pueden ser 0
+            if new > old * (1 + tolerance) + (0 if key == "cpu_us_per_tick" else 1):
+                print(f"REGRESIÓN {result['profile']}.{key}: {old} -> {new}")
+                ok = False
+    print("sin regresiones" if ok else "hay regresiones")
+    return ok
+
+
+def live(root: str, config: FanConfig, profile: str, seed: int):
+    fans = len(config.control_layout()[1])
+    sim = HwmonSimulator(root, [SimulatedFan() for _ in range(fans)],
+                         load=PROFILES[profile](seed), seed=seed).start()
+    print(f"Simulando {fans} ventiladores en {root} (perfil {profile}); "
+          f'usa "hwmon_root": "{root}" y los canales hwmon0/*. Ctrl+C para terminar.')
+    try:
+        while True:
+            time.sleep(5)
+            print(f"t={sim.t:7.0f} s  temp={sim.thermal.temp:5.1f} °C  caudal={sim.airflow:.2f}")
+    except KeyboardInterrupt:
+        sim.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--config", type=Path, default=None, help="por defecto, la configuración de fábrica")
+    parser.add_argument("--profile", nargs="+", default=["steps", "bursty", "diurnal"],
+                        choices=sorted(PROFILES))
+    parser.add_argument("--hours", type=float, default=4.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", type=Path, help="guardar los resultados como referencia")
+    parser.add_argument("--compare", type=Path, help="comparar con una referencia guardada")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--live", metavar="DIR", help="simular en tiempo real en DIR")
+    parser.add_argument("--predictive", nargs="+", metavar="FAN", default=[],
+                        help="ventiladores con control predictivo (ajustes por defecto)")
+    args = parser.parse_args()
+    # Las alertas se cuentan en el informe en lugar de registrarse una a una
+    logging.getLogger("app.services.alerts").setLevel(logging.ERROR)
+
+    if args.config:
+        with open(args.config, 'r') as f:
+            config = FanConfig(**json.load(f))
+    else:
+        config = default_config()
+    if args.predictive:
+        config = FanConfig(**{**config.dict(), "predictive": {name: {} for name in args.predictive}})
+    if args.live:
+        live(args.live, config, args.profile[0], args.seed)
+        return
+
+    results = []
+    for profile in args.profile:
+        result = asyncio.run(replay(config, profile, args.hours, args.seed))
+        report(result)
+        results.append(result)
+    if args.save:
+        args.save.write_text(json.dumps({r["profile"]: r for r in results}, indent=2))
+        print(f"resultados guardados en {args.save}")
+    if args.compare:
+        if not compare(results, json.loads(args.compare.read_text()), args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
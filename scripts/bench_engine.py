@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""Benchmark del motor de control: coste por tick frente a número de ventiladores.
+
+Uso (desde la raíz del repositorio):
+    python scripts/bench_engine.py [--fans 1 8 16 32 64] [--zones 16]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.models.config import ControlCurve, FanChannel  # noqa: E402
+from app.services.engine import ControlEngine  # noqa: E402
+
+CURVE = ControlCurve(min_pwm=30, max_pwm=255, curve=[(35, 60), (50, 90), (65, 160), (80, 255)])
+
+
+def build(n_fans: int, n_zones: int) -> ControlEngine:
+    rng = random.Random(n_fans)
+    zones = [f"zone{i}" for i in range(n_zones)]
+    fans = {}
+    modes = ("max", "mean", "curve_max")
+    for k in range(n_fans):
+        inputs = rng.sample(zones, 3)
+        fans[f"fan{k + 1}"] = FanChannel(
+            pwm=f"hwmon0/pwm{k + 1}", inputs=inputs, curve=CURVE, aggregate=modes[k % 3],
+            weights=[1.0, 2.0, 1.0] if modes[k % 3] == "mean" else None,
+        )
+    return ControlEngine(zones, fans)
+
+
+def bench(n_fans: int, n_zones: int, ticks: int) -> float:
+    engine = build(n_fans, n_zones)
+    rng = random.Random(0)
+    temps = engine.temps
+    samples = [[rng.uniform(30, 90) for _ in range(n_zones)] for _ in range(256)]
+    start = time.perf_counter()
+    for t in range(ticks):
+        sample = samples[t & 255]
+        for k in range(n_zones):
+            temps[k] = sample[k]
+        engine.evaluate(temps)
+    return (time.perf_counter() - start) / ticks * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fans", type=int, nargs="+", default=[1, 8, 16, 32, 64])
+    parser.add_argument("--zones", type=int, default=16)
+    parser.add_argument("--ticks", type=int, default=20_000)
+    args = parser.parse_args()
+
+    for n in args.fans:
+        us = bench(n, args.zones, args.ticks)
+        print(f"ventiladores={n:3d}  tick={us:8.2f} µs  por ventilador={us / n:6.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
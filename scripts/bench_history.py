@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Benchmark del histórico: memoria por muestra y coste de inserción.
+
+Uso (desde la raíz del repositorio):
+    python scripts/bench_history.py [--capacity 1000000]
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.models.sensor import SensorData  # noqa: E402
+from app.services.history import HistoryService  # noqa: E402
+
+
+class ListHistory:
+    """Implementación anterior (lista de SensorData con pop(0)) como referencia"""
+
+    def __init__(self, max_records: int):
+        self.max_records = max_records
+        self._data = []
+
+    def add_record(self, record_data):
+        self._data.append(SensorData(**record_data))
+        if len(self._data) > self.max_records:
+            self._data.pop(0)
+
+
+def sample(i: int) -> dict:
+    return {
+        "timestamp": 1_700_000_000 + i,
+        "temp": 40.0 + (i % 400) / 10,
+        "fan1_rpm": 1200 + i % 300,
+        "fan2_rpm": 800 + i % 100,
+        "pwm1": 90 + i % 100,
+        "pwm2": 14,
+    }
+
+
+def bench(factory, capacity: int, samples: int):
+    records = [sample(i) for i in range(min(samples, 10_000))]
+
+    # Coste de inserción (sin tracemalloc, que distorsiona los tiempos)
+    history = factory(capacity)
+    start = time.perf_counter()
+    for i in range(samples):
+        history.add_record(records[i % len(records)])
+    elapsed = time.perf_counter() - start
+    del history
+
+    # Memoria retenida con el histórico lleno
+    tracemalloc.start()
+    history = factory(capacity)
+    for i in range(samples):
+        history.add_record(records[i % len(records)])
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed / samples * 1e6, current / min(samples, capacity)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--capacity", type=int, default=1_000_000)
+    parser.add_argument("--legacy-samples", type=int, default=50_000,
+                        help="muestras para la implementación anterior (es lenta)")
+    args = parser.parse_args()
+
+    us, per_sample = bench(HistoryService, args.capacity, args.capacity + args.capacity // 10)
+    print(f"ring buffer  cap={args.capacity:>9,d}  append={us:6.2f} µs  memoria={per_sample:7.1f} B/muestra")
+
+    cap = args.legacy_samples
+    us, per_sample = bench(ListHistory, cap, cap + cap // 10)
+    print(f"lista        cap={cap:>9,d}  append={us:6.2f} µs  memoria={per_sample:7.1f} B/muestra")
+
+
+if __name__ == "__main__":
+    main()
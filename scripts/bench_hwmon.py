@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Microbenchmark de E/S hwmon: latencia por tick y bloqueo del event loop.
+
+Compara el acceso anterior (open/read/write por fichero dentro de la
+corrutina) con HwmonIO (descriptores abiertos, pread por lotes en un hilo)
+sobre un árbol hwmon falso en un directorio temporal.
+
+Uso (desde la raíz del repositorio):
+    python scripts/bench_hwmon.py [--ticks 5000]
+"""
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.hwmon import HwmonIO  # noqa: E402
+
+INPUTS = {"temp": "temp2_input", "fan1_rpm": "fan1_input", "fan2_rpm": "fan2_input"}
+OUTPUTS = {"fan1": "pwm1", "fan2": "pwm2"}
+
+
+def make_tree(root: Path):
+    (root / "temp2_input").write_text("45000\n")
+    (root / "fan1_input").write_text("1200\n")
+    (root / "fan2_input").write_text("800\n")
+    (root / "pwm1").write_text("90\n")
+    (root / "pwm2").write_text("14\n")
+
+
+async def legacy_tick(root: Path):
+    """Equivalente a _read_sensor x3 + _apply_pwm x2 de la versión anterior"""
+    values = {}
+    for name, filename in INPUTS.items():
+        with open(root / filename, "r") as f:
+            values[name] = float(f.read().strip())
+    for name, filename in OUTPUTS.items():
+        with open(root / filename, "w") as f:
+            f.write("90")
+    return values
+
+
+async def hwmon_tick(io: HwmonIO):
+    snapshot = await io.read()
+    await io.write({"fan1": 90, "fan2": 14})
+    return snapshot
+
+
+async def lag_probe(stop: asyncio.Event, lags: list):
+    """Mide cuánto se retrasa el event loop respecto a un reloj de 1 ms"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(time.perf_counter() - start - 0.001)
+
+
+async def run(name: str, tick, ticks: int):
+    stop = asyncio.Event()
+    lags: list = []
+    probe = asyncio.create_task(lag_probe(stop, lags))
+    latencies = []
+    for _ in range(ticks):
+        start = time.perf_counter()
+        await tick()
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0)  # Dar paso a la sonda entre ticks
+    stop.set()
+    await probe
+    latencies.sort()
+    lags.sort()
+    p50 = latencies[len(latencies) // 2] * 1e6
+    p99 = latencies[int(len(latencies) * 0.99)] * 1e6
+    lag99 = lags[int(len(lags) * 0.99)] * 1e6 if lags else 0.0
+    print(f"{name:8s} tick p50={p50:7.1f} µs  p99={p99:7.1f} µs  "
+          f"lag p99 del loop={lag99:7.1f} µs")
+
+
+async def main_async(ticks: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        make_tree(root)
+        await run("anterior", lambda: legacy_tick(root), ticks)
+        io = HwmonIO(str(root), INPUTS, OUTPUTS)
+        await run("hwmon", lambda: hwmon_tick(io), ticks)
+        io.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ticks", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.ticks))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Benchmark del camino por muestra: dict + SensorData frente a Sample + JSON en caché.
+
+Por cada muestra se mide lo que hace el servicio en un tick (construir la
+muestra, guardarla en el histórico, publicarla en el hub) más `--reads`
+lecturas de /sensors. La versión anterior validaba un SensorData por muestra
+y FastAPI lo volvía a validar y serializar en cada lectura.
+
+Uso (desde la raíz del repositorio):
+    python scripts/bench_samples.py [--samples 10000] [--reads 5]
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from app.models.sensor import Sample, SensorData  # noqa: E402
+from app.services.broadcast import BroadcastHub  # noqa: E402
+from app.services.history import FIELDS, HistoryService  # noqa: E402
+from app.services.rollup import ROLLUP_FIELDS  # noqa: E402
+
+
+class LegacyPath:
+    """Implementación anterior (dict por muestra, SensorData y serialización por lectura)"""
+
+    def __init__(self):
+        self.history = HistoryService()
+        self.buffer = self.history._buffer
+
+    def tick(self, i: int, reads: int):
+        record = {
+            "timestamp": round(1_700_000_000 + i * 0.1, 3),
+            "temp": 40.0 + (i % 400) / 10,
+            "fan1_rpm": 1200.0 + i % 300,
+            "fan2_rpm": 800.0 + i % 100,
+            "pwm1": 90 + i % 100,
+            "pwm2": 14,
+        }
+        self.buffer.append([record[name] for name in FIELDS])
+        values = [record[name] for name in ROLLUP_FIELDS]
+        for tier in self.history.tiers:
+            tier.add(record["timestamp"], values)
+        json.dumps(record, separators=(",", ":"))  # BroadcastHub.publish
+        model = SensorData(**dict(zip(FIELDS, self.buffer.row(-1))))  # get_last_record
+        for _ in range(reads):
+            # response_model: validar de nuevo, jsonable_encoder y json.dumps
+            json.dumps(jsonable_encoder(SensorData.validate(model))).encode()
+
+
+class SamplePath:
+    """Implementación actual: Sample sin validación y JSON codificado una vez"""
+
+    def __init__(self):
+        self.history = HistoryService()
+        self.hub = BroadcastHub()
+
+    def tick(self, i: int, reads: int):
+        sample = Sample(
+            round(1_700_000_000 + i * 0.1, 3),
+            40.0 + (i % 400) / 10,
+            1200.0 + i % 300,
+            800.0 + i % 100,
+            90 + i % 100,
+            14,
+        )
+        self.history.add_record(sample)
+        self.hub.publish(self.history.get_last_json())
+        for _ in range(reads):
+            self.history.get_last_json()
+
+
+def bench(factory, samples: int, reads: int):
+    # CPU (sin tracemalloc, que distorsiona los tiempos)
+    path = factory()
+    start = time.process_time()
+    for i in range(samples):
+        path.tick(i, reads)
+    cpu = time.process_time() - start
+
+    # Memoria transitoria: pico por tick respecto a la memoria retenida
+    path = factory()
+    tracemalloc.start()
+    transient = 0
+    for i in range(samples):
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        path.tick(i, reads)
+        _, peak = tracemalloc.get_traced_memory()
+        transient += peak - before
+    tracemalloc.stop()
+    return cpu, transient / samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=10_000)
+    parser.add_argument("--reads", type=int, default=5, help="lecturas de /sensors por muestra")
+    args = parser.parse_args()
+
+    results = {}
+    for name, factory in (("anterior", LegacyPath), ("Sample", SamplePath)):
+        cpu, transient = bench(factory, args.samples, args.reads)
+        results[name] = cpu
+        print(f"{name:9s} CPU={cpu * 1000:8.1f} ms/{args.samples} muestras  "
+              f"({cpu / args.samples * 1e6:6.2f} µs/muestra)  pico transitorio={transient:7.0f} B/muestra")
+    print(f"mejora: x{results['anterior'] / results['Sample']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""Rendimiento de /sensors: peticiones por segundo y CPU del servidor por petición.
+
+Lanza la API en un subproceso uvicorn sobre un árbol hwmon simulado y la
+ataca con N clientes keep-alive durante unos segundos. Modos:
+
+- shared: GET simple a los servicios del contenedor creado en el arranque.
+- conditional: cada cliente repite el último ETag en If-None-Match
+  (304 sin cuerpo mientras no haya muestra nueva).
+- long-poll: cada cliente pide ?after=<último seq> y espera a la siguiente
+  muestra; las peticiones por segundo deben ser ~clientes x sample_rate.
+- per-request: un FanControlService nuevo en cada petición, como hacía
+  antes `Depends()` (relee la configuración, crea un histórico vacío y
+  responde 503).
+
+Sale con código 1 si algún modo distinto de per-request responde con otro
+código que 200/304.
+
+Uso (desde la raíz del repositorio):
+    python scripts/bench_sensors.py [--mode shared conditional long-poll per-request] [--clients 8] [--seconds 5]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+MODES = ("shared", "conditional", "long-poll", "per-request")
+
+
+def serve(port: int, mode: str):
+    """Servidor de prueba: rutas de la API con servicios sobre un árbol simulado"""
+    import uvicorn
+    from fastapi import FastAPI
+    from app.models.config import default_config
+    from app.routes import api
+    from app.routes.deps import get_fan_control
+    from app.services.container import ServiceContainer
+    from app.services.fan_control import FanControlService
+    from app.services.history import HistoryService
+    from app.services.simulator import PROFILES, HwmonSimulator, SimulatedFan
+    from scripts.bench_control import simulated_config
+
+    tmp = tempfile.TemporaryDirectory()
+    sim = HwmonSimulator(tmp.name, [SimulatedFan(), SimulatedFan()], load=PROFILES["steady"](1)).start()
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        history = HistoryService()
+        services = ServiceContainer(history, FanControlService(history, simulated_config(default_config(), tmp.name)))
+        await services.start()
+        app.state.services = services
+        yield
+        await services.stop()
+        sim.stop()
+
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(api.router)
+    if mode == "per-request":
+        app.dependency_overrides[get_fan_control] = lambda: FanControlService(HistoryService())
+    uvicorn.run(app, port=port, log_level="warning")
+
+
+def cpu_seconds(pid: int) -> float:
+    fields = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def build_request(mode: str, etag: bytes, seq: bytes) -> bytes:
+    if mode == "conditional" and etag:
+        return b"GET /sensors HTTP/1.1\r\nHost: localhost\r\nIf-None-Match: %s\r\n\r\n" % etag
+    if mode == "long-poll":
+        return b"GET /sensors?after=%s&timeout=5 HTTP/1.1\r\nHost: localhost\r\n\r\n" % (seq or b"0")
+    return b"GET /sensors HTTP/1.1\r\nHost: localhost\r\n\r\n"
+
+
+async def client(port: int, mode: str, deadline: float, statuses: Counter, received: list):
+    """Peticiones secuenciales sobre una conexión keep-alive hasta el deadline"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    etag = seq = b""
+    try:
+        while time.perf_counter() < deadline:
+            writer.write(build_request(mode, etag, seq))
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n")[1:]:
+                name, _, value = line.partition(b":")
+                name = name.lower()
+                if name == b"content-length":
+                    length = int(value)
+                elif name == b"etag":
+                    etag = value.strip()
+                elif name == b"x-seq":
+                    seq = value.strip()
+            received[0] += len(head) + length
+            await reader.readexactly(length)
+            statuses[int(head.split(None, 2)[1])] += 1
+    finally:
+        writer.close()
+
+
+async def wait_ready(port: int, timeout: float = 30.0):
+    """uvicorn escucha cuando ha terminado el arranque (lifespan)"""
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            if time.perf_counter() > deadline:
+                raise RuntimeError("el servidor no arrancó")
+            await asyncio.sleep(0.2)
+
+
+async def measure(port: int, pid: int, mode: str, clients: int, seconds: float) -> dict:
+    await wait_ready(port)
+    await asyncio.sleep(1.5)  # Al menos una muestra en el histórico
+    statuses = Counter()
+    received = [0]
+    cpu0 = cpu_seconds(pid)
+    begin = time.perf_counter()
+    deadline = begin + seconds
+    await asyncio.gather(*(client(port, mode, deadline, statuses, received) for _ in range(clients)))
+    elapsed = time.perf_counter() - begin
+    cpu = cpu_seconds(pid) - cpu0
+    total = sum(statuses.values())
+    return {"requests": total, "rps": total / elapsed, "cpu_us": cpu / max(total, 1) * 1e6,
+            "cpu_share": cpu / elapsed, "kb_s": received[0] / elapsed / 1024, "statuses": dict(statuses)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", nargs="+", default=list(MODES), choices=MODES)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--serve", nargs=2, metavar=("PORT", "MODE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(int(args.serve[0]), args.serve[1])
+        return
+
+    ok = True
+    print(f"{'modo':>12} {'peticiones':>10} {'req/s':>9} {'CPU µs/req':>11} {'CPU':>6} {'KiB/s':>8}  códigos")
+    for mode in args.mode:
+        port = free_port()
+        # stdout descartado: en modo per-request cada petición imprime los canales sin resolver
+        server = subprocess.Popen([sys.executable, __file__, "--serve", str(port), mode], cwd=ROOT,
+                                  stdout=subprocess.DEVNULL)
+        try:
+            result = asyncio.run(measure(port, server.pid, mode, args.clients, args.seconds))
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"{mode:>12} {result['requests']:>10} {result['rps']:>9.0f} {result['cpu_us']:>11.0f} "
+              f"{result['cpu_share']:>6.0%} {result['kb_s']:>8.0f}  {result['statuses']}")
+        if mode != "per-request" and not set(result["statuses"]) <= {200, 304}:
+            ok = False
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
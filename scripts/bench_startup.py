@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""Benchmark del arranque: tiempo hasta la primera escritura PWM y coste de importación.
+
+Arranca el servicio completo (python -m app) en un subproceso sobre un árbol
+hwmon simulado, con su configuración (FANCONTROL_CONFIG) y un histórico
+persistido de --history-days días (FANCONTROL_HISTORY_DIR), y mide:
+
+- el tiempo hasta que cambia pwm1 (la primera escritura del watchdog en
+  initialize(): hasta entonces el PWM sigue con el valor que tuviera),
+- el tiempo hasta que la API responde /sensors con 200,
+- con `python -X importtime`, lo que cuesta importar el camino de control
+  (app.services.container) y la API web (app.main), y qué módulos pesados
+  entran en el primero.
+
+Con --legacy se mide además el arranque con uvicorn app.main:app (la API se
+importa antes de crear los servicios). Sale con código 1 si el camino de
+control importa algún módulo de FORBIDDEN o, con --compare, si algún tiempo
+empeora más de --tolerance respecto a una ejecución guardada con --save.
+
+Uso (desde la raíz del repositorio):
+    python scripts/bench_startup.py [--runs 5] [--history-days 3] [--legacy]
+    python scripts/bench_startup.py --save startup.json
+    python scripts/bench_startup.py --compare startup.json [--tolerance 0.25]
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from app.models.config import default_config  # noqa: E402
+from app.models.sensor import Sample  # noqa: E402
+from app.services.simulator import HwmonSimulator, SimulatedFan  # noqa: E402
+from app.services.storage import SegmentStore  # noqa: E402
+from scripts.bench_control import simulated_config  # noqa: E402
+
+# Módulos que no deben cargarse antes de la primera escritura PWM
+FORBIDDEN = ("fastapi", "starlette", "uvicorn", "httpx", "numpy", "pandas", "matplotlib",
+             "telegram", "smtplib", "email.message")
+# Métricas comparadas con --compare (mayor es peor)
+REGRESSION_KEYS = ("first_pwm_ms", "api_ready_ms", "import_control_ms")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def prepare(directory: Path, history_days: float) -> dict:
+    """Árbol simulado, configuración e histórico persistido; devuelve el entorno del servicio"""
+    HwmonSimulator(directory / "sys", [SimulatedFan(), SimulatedFan()])
+    config = simulated_config(default_config(), str(directory / "sys"))
+    (directory / "fancontrol.json").write_text(config.json())
+    store = SegmentStore(directory / "history")
+    start = time.time() - history_days * 86400
+    for i in range(int(history_days * 86400)):
+        store.append(Sample(start + i, 45.0 + i % 600 / 60, 1200.0, 800.0, 90 + i % 50, 14))
+    store.close()
+    return {**os.environ, "FANCONTROL_CONFIG": str(directory / "fancontrol.json"),
+            "FANCONTROL_HISTORY_DIR": str(directory / "history"), "FANCONTROL_HOST": "127.0.0.1",
+            "PYTHONDONTWRITEBYTECODE": "1"}
+
+
+def start_once(command: list, env: dict, pwm: Path, timeout: float = 30.0) -> dict:
+    """Arranca el servicio y mide la primera escritura PWM y la primera respuesta de la API"""
+    port = free_port()
+    env = {**env, "FANCONTROL_PORT": str(port)}
+    command = [arg.replace("{port}", str(port)) for arg in command]
+    pwm.write_bytes(b"0\n")
+    begin = time.perf_counter()
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+    first_pwm = api_ready = None
+    try:
+        deadline = begin + timeout
+        while first_pwm is None and time.perf_counter() < deadline:
+            if pwm.read_bytes() != b"0\n":
+                first_pwm = time.perf_counter() - begin
+            else:
+                time.sleep(0.001)
+        while api_ready is None and time.perf_counter() < deadline:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/sensors", timeout=1) as response:
+                    if response.status == 200:
+                        api_ready = time.perf_counter() - begin
+            except OSError:
+                time.sleep(0.005)
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    if first_pwm is None or api_ready is None:
+        raise RuntimeError(f"{' '.join(command)}: el servicio no arrancó en {timeout:.0f} s")
+    return {"first_pwm_ms": first_pwm * 1e3, "api_ready_ms": api_ready * 1e3}
+
+
+def import_cost(module: str, runs: int) -> tuple:
+    """(ms, módulos importados) del mejor de varios `python -X importtime -c import module`"""
+    best, modules = float("inf"), set()
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT,
+                             capture_output=True, text=True, env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"})
+        total, names, started = 0, set(), False
+        for line in out.stderr.splitlines():
+            m = re.match(r"import time:\s+\d+ \|\s+(\d+) \|( +)(\S+)", line)
+            if not m:
+                continue
+            top = len(m.group(2)) == 1
+            if not started:
+                # Lo anterior a site es el arranque del intérprete, común a todo
+                started = top and m.group(3) == "site"
+                continue
+            names.add(m.group(3))
+            if top:
+                total += int(m.group(1))
+        if total < best:
+            best, modules = total, names
+    return best / 1e3, modules
+
+
+def summary(runs: list) -> dict:
+    return {key: round(statistics.median(r[key] for r in runs), 1) for key in runs[0]}
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> bool:
+    ok = True
+    for key in REGRESSION_KEYS:
+        new, old = result[key], baseline.get(key)
+        # Holgura absoluta de 20 ms: en tiempos tan cortos el ruido pesa
+        if old is not None and new > old * (1 + tolerance) + 20:
+            print(f"REGRESIÓN {key}: {old} -> {new}")
+            ok = False
+    print("sin regresiones" if ok else "hay regresiones")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--history-days", type=float, default=3.0)
+    parser.add_argument("--legacy", action="store_true", help="medir también uvicorn app.main:app")
+    parser.add_argument("--save", type=Path, help="guardar los resultados como referencia")
+    parser.add_argument("--compare", type=Path, help="comparar con una referencia guardada")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    ok = True
+    control_ms, control_modules = import_cost("app.services.container", args.runs)
+    web_ms, _ = import_cost("app.main", args.runs)
+    loaded = sorted(name for name in control_modules
+                    if any(name == f or name.startswith(f + ".") for f in FORBIDDEN))
+    print(f"importación: control {control_ms:.0f} ms, API web {web_ms:.0f} ms")
+    if loaded:
+        print(f"FALLO: el camino de control importa {', '.join(loaded)}")
+        ok = False
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        env = prepare(directory, args.history_days)
+        pwm = directory / "sys" / "hwmon0" / "pwm1"
+        modes = {"python -m app": [sys.executable, "-m", "app"]}
+        if args.legacy:
+            modes["uvicorn app.main:app"] = [sys.executable, "-m", "uvicorn", "app.main:app",
+                                             "--host", "127.0.0.1", "--port", "{port}"]
+        results = {}
+        for label, command in modes.items():
+            results[label] = summary([start_once(command, env, pwm) for _ in range(args.runs)])
+            print(f"{label:>22}: primera escritura PWM {results[label]['first_pwm_ms']:.0f} ms, "
+                  f"API lista {results[label]['api_ready_ms']:.0f} ms (mediana de {args.runs})")
+
+    result = {**results["python -m app"], "import_control_ms": round(control_ms, 1),
+              "import_web_ms": round(web_ms, 1), "history_days": args.history_days}
+    if args.save:
+        args.save.write_text(json.dumps(result, indent=2))
+        print(f"resultados guardados en {args.save}")
+    if args.compare:
+        ok = compare(result, json.loads(args.compare.read_text()), args.tolerance) and ok
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Prueba de carga de /stream: CPU del servidor con 1..N clientes SSE.
+
+Lanza el router de streaming en un subproceso uvicorn con un publicador
+sintético y mide el tiempo de CPU del servidor por tick para distintos
+números de clientes concurrentes (Linux, lee /proc/<pid>/stat).
+
+Uso (desde la raíz del repositorio):
+    python scripts/bench_stream.py [--clients 1 10 100 500] [--rate 10] [--seconds 5]
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def serve(port: int, rate: float):
+    """Servidor de prueba: router de streaming + publicador a `rate` Hz"""
+    import uvicorn
+    from fastapi import FastAPI
+    from app.models.sensor import Sample
+    from app.routes import ws
+    from app.services.broadcast import BroadcastHub
+    from app.routes.deps import get_fan_control
+
+    class StubControl:
+        hub = BroadcastHub()
+
+    stub = StubControl()
+    app = FastAPI()
+    app.include_router(ws.router)
+    app.dependency_overrides[get_fan_control] = lambda: stub
+
+    @app.on_event("startup")
+    async def start_publisher():
+        async def publish():
+            i = 0
+            while True:
+                stub.hub.publish(Sample(round(time.time(), 3), 45.0 + i % 10, 1200.0, 800.0, 90, 14).to_json())
+                i += 1
+                await asyncio.sleep(1 / rate)
+        asyncio.create_task(publish())
+
+    uvicorn.run(app, port=port, log_level="warning")
+
+
+def cpu_seconds(pid: int) -> float:
+    fields = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+async def client(port: int, stop: asyncio.Event, counter: list):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /stream HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    await writer.drain()
+    try:
+        while not stop.is_set():
+            chunk = await reader.read(65536)
+            if not chunk:
+                break
+            counter[0] += chunk.count(b"data: ")
+    finally:
+        writer.close()
+
+
+async def measure(port: int, pid: int, n: int, seconds: float, rate: float):
+    stop = asyncio.Event()
+    counter = [0]
+    tasks = [asyncio.create_task(client(port, stop, counter)) for _ in range(n)]
+    await asyncio.sleep(1.0)  # Dejar que se conecten todos
+    counter[0] = 0
+    cpu0 = cpu_seconds(pid)
+    await asyncio.sleep(seconds)
+    cpu1 = cpu_seconds(pid)
+    frames = counter[0]
+    stop.set()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    ticks = seconds * rate
+    print(f"clientes={n:4d}  CPU/tick={(cpu1 - cpu0) / ticks * 1e3:7.3f} ms  "
+          f"CPU/frame={(cpu1 - cpu0) / max(frames, 1) * 1e6:7.1f} µs  frames={frames}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 10, 100, 500])
+    parser.add_argument("--rate", type=float, default=10.0)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--port", type=int, default=18765)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.rate)
+        return
+
+    proc = subprocess.Popen([sys.executable, __file__, "--serve", "--port", str(args.port),
+                             "--rate", str(args.rate)], cwd=ROOT)
+    try:
+        time.sleep(2.0)
+        for n in args.clients:
+            asyncio.run(measure(args.port, proc.pid, n, args.seconds, args.rate))
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,116 +1,178 @@
 #!/usr/bin/env python3
+"""Calibración no interactiva de los ventiladores (todos a la vez).
+
+Para cada ventilador con tacómetro mide las RPM máximas, el PWM mínimo que
+lo mantiene girando (parada) y el que lo arranca desde parado, ajusta un
+modelo PWM -> RPM y escribe una FanConfig completa con min_pwm y
+calibration actualizados. Los valores originales de pwmN y pwmN_enable se
+restauran al terminar.
+
+Con --simulate N se calibra un árbol hwmon simulado de N ventiladores con
+inercia y se comprueban los umbrales detectados frente a los reales y el
+tiempo total (sale con código 1 si algo falla).
+
+Uso (desde la raíz del repositorio):
+    sudo python scripts/calibrate.py [--config FICHERO] [--output FICHERO]
+    python scripts/calibrate.py --simulate 6
+"""
+import argparse
+import asyncio
+import json
 import os
+import random
+import sys
+import tempfile
 import time
-import json
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
-def main():
-    print("=== Script de Calibración de Ventiladores ===")
-    print("Este script ayudará a determinar los valores mínimos de PWM para tus ventiladores.")
-
-    # Verificar acceso root
-    if os.geteuid() != 0:
-        print("Error: Este script debe ejecutarse como root (sudo).")
-        exit(1)
-
-    # Configuración inicial
-    config = {
-        "fan1": {
-            "min_pwm": None,
-            "default_pwm": 90,
-            "max_pwm": 255
-        },
-        "fan2": {
-            "min_pwm": None,
-            "default_pwm": 14,
-            "max_pwm": 100
-        }
-    }
-
-    # Calibrar fan1
-    print("\n=== Calibrando Ventilador 1 (pwm1) ===")
-    input("Desconecta temporalmente otros ventiladores si es necesario. Presiona Enter para continuar...")
-
-    config["fan1"]["min_pwm"] = calibrate_fan("fan1", "pwm1")
-
-    # Calibrar fan2
-    print("\n=== Calibrando Ventilador 2 (pwm2) ===")
-    config["fan2"]["min_pwm"] = calibrate_fan("fan2", "pwm2")
-
-    # Guardar configuración
-    config_path = Path("/etc/fancontrol.json")
-    with open(config_path, 'w') as f:
-        json.dump(config, f, indent=2)
-
-    print(f"\nConfiguración guardada en {config_path}")
-    print("Calibración completada. Puedes iniciar el servicio fancontrol.")
-
-
-def calibrate_fan(fan_name: str, pwm_name: str) -> int:
-    """Encuentra el valor PWM mínimo para que el ventilador arranque"""
-    print(f"\nDeterminando PWM mínimo para {fan_name} ({pwm_name})...")
-
-    # Detener ventilador
-    set_pwm(pwm_name, 0)
-    time.sleep(2)
+from app.models.config import ControlCurve, FanChannel, FanConfig, default_config  # noqa: E402
+from app.services.calibration import apply_results, calibrate  # noqa: E402
+from app.services.discovery import HWMON_CLASS, HwmonDiscovery  # noqa: E402
+from app.services.simulator import HwmonSimulator, SimulatedFan  # noqa: E402
 
-    # Buscar punto de arranque
-    min_pwm = None
-    for pwm in range(0, 255, 2):
-        set_pwm(pwm_name, pwm)
-        time.sleep(1)
+CONFIG_PATH = Path(os.getenv("FANCONTROL_CONFIG", "/etc/fancontrol.json"))
 
-        rpm = get_rpm(fan_name)
-        print(f"PWM={pwm:3d} → RPM={rpm:5.0f}")
-
-        if rpm > 100:  # Umbral de arranque
-            min_pwm = pwm
-            print(f"\n¡Ventilador {fan_name} arrancó a PWM={min_pwm}!")
-            break
-
-    if min_pwm is None:
-        print(f"Error: No se pudo hacer arrancar {fan_name} incluso a PWM máximo.")
-        exit(1)
-
-    # Aplicar histeresis (bajar hasta que se detenga)
-    print("\nDeterminando punto de parada...")
-    for pwm in range(min_pwm, 0, -1):
-        set_pwm(pwm_name, pwm)
-        time.sleep(1)
-
-        rpm = get_rpm(fan_name)
-        print(f"PWM={pwm:3d} → RPM={rpm:5.0f}")
-
-        if rpm < 100:
-            stop_pwm = pwm + 1
-            print(f"\nVentilador {fan_name} se detuvo a PWM={pwm}, usando PWM={stop_pwm} como mínimo seguro.")
-            return stop_pwm
-
-    return min_pwm
 
+def load_config(path: Path) -> FanConfig:
+    if path.exists():
+        with open(path, 'r') as f:
+            return FanConfig(**json.load(f))
+    return default_config()
+
+
+def resolve_fans(config: FanConfig, root: str):
+    """Rutas (pwm, rpm) de los ventiladores con tacómetro"""
+    discovery = HwmonDiscovery(root)
+    _, fans = config.control_layout()
+    paths = {}
+    for name, fan in fans.items():
+        if fan.rpm is None:
+            print(f"{name}: sin tacómetro, se omite")
+            continue
+        try:
+            paths[name] = (discovery.resolve(fan.pwm), discovery.resolve(fan.rpm))
+        except KeyError as e:
+            print(f"{name}: {e}, se omite")
+            continue
+        print(f"{name}: {fan.pwm} → {paths[name][0]}, {fan.rpm} → {paths[name][1]}")
+    return paths
+
+
+def save_config(config: FanConfig, path: Path):
+    """Escritura atómica: el servicio nunca lee un fichero a medias"""
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, 'w') as f:
+        json.dump(json.loads(config.json()), f, indent=2)
+    os.replace(tmp, path)
+
+
+def simulated_fans(n: int, seed: int):
+    rng = random.Random(seed)
+    fans = []
+    for _ in range(n):
+        stop = rng.randint(20, 70)
+        fans.append(SimulatedFan(
+            max_rpm=rng.uniform(1200, 3000), min_rpm=rng.uniform(250, 600),
+            start_pwm=stop + rng.randint(0, 40), stop_pwm=stop, gamma=rng.uniform(0.6, 1.0),
+            tau_up=rng.uniform(0.3, 0.8), tau_down=rng.uniform(0.6, 1.5),
+        ))
+    return fans
+
+
+def simulated_config(n: int) -> FanConfig:
+    curve = ControlCurve(min_pwm=0, max_pwm=255, curve=[(40, 80), (80, 255)])
+    return FanConfig(
+        alerts=default_config().alerts,
+        zones={"cpu": "fansim/temp1"},
+        fans={
+            f"fan{k}": FanChannel(pwm=f"fansim/pwm{k}", rpm=f"fansim/fan{k}", inputs=["cpu"], curve=curve)
+            for k in range(1, n + 1)
+        },
+    )
+
+
+def check(results, fans, elapsed: float, budget: float) -> bool:
+    """Compara lo detectado con los parámetros reales del simulador"""
+    ok = elapsed <= budget
+    print(f"\nTiempo total: {elapsed:.1f} s (límite {budget:.0f} s) {'OK' if ok else 'FALLO'}")
+    for (name, result), fan in zip(results.items(), fans):
+        if result.error is not None:
+            print(f"{name}: FALLO ({result.error})")
+            ok = False
+            continue
+        model_error = max(
+            abs(result.model(pwm) - fan.target_rpm(pwm)) / fan.target_rpm(pwm)
+            for pwm in range(result.stop_pwm, 256, 8)
+        )
+        good = (abs(result.stop_pwm - fan.stop_pwm) <= 1 and abs(result.start_pwm - fan.start_pwm) <= 1
+                and model_error <= 0.05)
+        ok = ok and good
+        print(f"{name}: parada {result.stop_pwm} (real {fan.stop_pwm}), "
+              f"arranque {result.start_pwm} (real {fan.start_pwm}), "
+              f"error del modelo {model_error:.1%} {'OK' if good else 'FALLO'}")
+    return ok
+
+
+async def run(args) -> int:
+    simulator = None
+    if args.simulate:
+        tmp = tempfile.TemporaryDirectory()
+        fans = simulated_fans(args.simulate, args.seed)
+        simulator = HwmonSimulator(tmp.name, fans, seed=args.seed).start()
+        root, config = tmp.name, simulated_config(args.simulate)
+        output = args.output or Path(tmp.name) / "fancontrol.json"
+    else:
+        if os.geteuid() != 0 and args.root == HWMON_CLASS:
+            print("Error: Este script debe ejecutarse como root (sudo).")
+            return 1
+        root, config = args.root, load_config(args.config)
+        output = args.output or args.config
 
-def set_pwm(pwm_name: str, value: int):
-    """Establece el valor PWM"""
-    path = f"/sys/class/hwmon/hwmon0/{pwm_name}"
     try:
-        with open(path, 'w') as f:
-            f.write(str(value))
-    except Exception as e:
-        print(f"Error escribiendo PWM: {e}")
-        exit(1)
+        paths = resolve_fans(config, root)
+        if not paths:
+            print("Error: no hay ventiladores que calibrar")
+            return 1
+        print(f"\nCalibrando {len(paths)} ventiladores a la vez...")
+        begin = time.monotonic()
+        results = await calibrate(paths)
+        elapsed = time.monotonic() - begin
+    finally:
+        if simulator is not None:
+            simulator.stop()
+
+    for name, result in results.items():
+        if result.error is not None:
+            print(f"{name}: error: {result.error}")
+        else:
+            print(f"{name}: parada PWM={result.stop_pwm}, arranque PWM={result.start_pwm}, "
+                  f"máx {result.max_rpm:.0f} RPM, min_pwm={result.min_pwm(args.margin)} "
+                  f"({len(result.points)} puntos, {result.elapsed:.1f} s)")
+
+    config = apply_results(config, results, args.margin)
+    save_config(config, Path(output))
+    print(f"\nConfiguración guardada en {output}")
+
+    if simulator is not None:
+        return 0 if check(results, simulator.fans, elapsed, args.budget) else 1
+    return 1 if any(r.error is not None for r in results.values()) else 0
 
 
-def get_rpm(fan_name: str) -> float:
-    """Lee las RPM del ventilador"""
-    path = f"/sys/class/hwmon/hwmon0/{fan_name}_input"
-    try:
-        with open(path, 'r') as f:
-            return float(f.read().strip())
-    except Exception as e:
-        print(f"Error leyendo RPM: {e}")
-        return 0.0
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--config", type=Path, default=CONFIG_PATH)
+    parser.add_argument("--output", type=Path, default=None, help="por defecto, sobrescribe --config")
+    parser.add_argument("--root", default=HWMON_CLASS, help="directorio de clase hwmon")
+    parser.add_argument("--margin", type=int, default=4, help="PWM por encima de la parada para min_pwm")
+    parser.add_argument("--simulate", type=int, default=0, metavar="N",
+                        help="calibrar N ventiladores simulados y verificar el resultado")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--budget", type=float, default=60.0, help="segundos máximos con --simulate")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""Reproduce un histórico con otra configuración (what-if) antes de desplegarla.
+
+Toma las muestras de un fichero exportado por /history (cualquier formato;
+binary es el más rápido), de un nodo en marcha (--url) o una serie
+sintética de --synthetic días a 1 Hz, y las pasa por las curvas, la
+histéresis y el watchdog de la configuración indicada (--config, --profile,
+--curve). Informa por ventilador de las escrituras PWM, el tiempo con el PWM
+por encima de --high-pwm (ruido) y las veces que saltaría el watchdog, junto
+a lo registrado para fan1/fan2. --trace guarda la traza PWM completa en CSV.
+
+Con --budget sale con código 1 si la reproducción tarda más de esos segundos.
+
+Uso (desde la raíz del repositorio):
+    curl 'http://nodo:8000/history?start=...&end=...&downsample=none&format=binary' > semana.fch
+    python scripts/replay.py semana.fch [--config nuevo.json] [--profile silent]
+    python scripts/replay.py --url http://nodo:8000 --days 7 --curve fan1=45:80,75:255
+    python scripts/replay.py --synthetic 30 [--budget 5]
+"""
+import argparse
+import json
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np  # noqa: E402
+
+from app.models.config import ControlCurve, FanConfig, default_config  # noqa: E402
+from app.services.profiles import ProfileService  # noqa: E402
+from app.services.replay import HIGH_PWM, read_export, replay  # noqa: E402
+
+
+def synthetic(days: float, seed: int = 1) -> dict:
+    """Temperatura a 1 Hz: ciclo diario, ráfagas de carga con inercia térmica y ruido"""
+    rng = np.random.default_rng(seed)
+    n = int(days * 86400)
+    t = np.arange(n, dtype=np.float64)
+    load = np.zeros(n)
+    starts = rng.integers(0, n, size=int(days * 40))
+    lengths = rng.integers(60, 1800, len(starts))
+    for start, length, level in zip(starts, lengths, rng.uniform(3, 20, len(starts))):
+        load[start:start + length] += level
+    # Primer orden (~2 min) por FFT: la ráfaga se nota de forma gradual
+    kernel = np.exp(-np.arange(1200) / 120.0)
+    size = 1 << int(np.ceil(np.log2(n + len(kernel))))
+    heat = np.fft.irfft(np.fft.rfft(load, size) * np.fft.rfft(kernel / kernel.sum(), size), size)[:n]
+    temp = 46 + 8 * np.sin(2 * np.pi * t / 86400) + heat + rng.normal(0, 0.3, n)
+    temp[rng.integers(0, n, size=n // 100000)] = np.nan  # Alguna lectura fallida
+    return {"timestamp": 1_700_000_000.0 + t, "temp": np.round(temp, 1)}
+
+
+def fetch(url: str, days: float) -> bytes:
+    end = time.time()
+    query = f"start={end - days * 86400}&end={end}&downsample=none&format=binary"
+    with urllib.request.urlopen(f"{url.rstrip('/')}/history?{query}", timeout=300) as response:
+        return response.read()
+
+
+def parse_curve(spec: str):
+    """fan1=50:90,80:255[/hyst] -> ("fan1", puntos, histéresis)"""
+    name, _, points = spec.partition("=")
+    points, _, hysteresis = points.partition("/")
+    pairs = [tuple(float(x) for x in p.split(":")) for p in points.split(",")]
+    return name, [(t, int(p)) for t, p in pairs], float(hysteresis) if hysteresis else None
+
+
+def candidate(args) -> FanConfig:
+    if args.config:
+        config = FanConfig(**json.loads(args.config.read_text()))
+    else:
+        config = default_config()
+    if args.profile:
+        config = ProfileService().apply(config, args.profile)
+    curves = {}
+    layout = config.control_layout()[1]
+    for spec in args.curve:
+        name, points, hysteresis = parse_curve(spec)
+        if name not in layout:
+            raise SystemExit(f"Ventilador desconocido: {name}")
+        current = layout[name].curve
+        curves[name] = ControlCurve(min_pwm=current.min_pwm, max_pwm=current.max_pwm, curve=points,
+                                    hysteresis=current.hysteresis if hysteresis is None else hysteresis)
+    alerts = {"temp_critical": args.temp_critical} if args.temp_critical is not None else {}
+    return config.with_curves(curves, **alerts) if curves or alerts else config
+
+
+def report(result: dict, high_pwm: int):
+    hours = result["seconds"] / 3600
+    print(f"{result['samples']} muestras ({hours:.1f} h); watchdog (≥{result['watchdog']['temp_critical']:g} °C): "
+          f"{result['watchdog']['episodes']} veces, {result['watchdog']['seconds']:.0f} s")
+    print(f"{'ventilador':>10} {'':>10} {'escrituras':>10} {'PWM medio':>9} {'p95':>5} "
+          f"{f'≥{high_pwm} (h)':>10} {'tramos':>7}")
+    for name, fan in result["fans"].items():
+        rows = [("what-if", fan["writes"], fan)]
+        if "recorded" in fan:
+            rows.append(("registrado", fan["recorded"]["changes"], fan["recorded"]))
+        for label, writes, data in rows:
+            print(f"{name:>10} {label:>10} {writes:>10} {data['mean']:>9.1f} {data['p95']:>5.0f} "
+                  f"{data['seconds_high'] / 3600:>10.2f} {data['episodes_high']:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("file", nargs="?", type=Path, help="exportación de /history")
+    source.add_argument("--url", help="nodo del que descargar el histórico")
+    source.add_argument("--synthetic", type=float, metavar="DAYS", help="serie sintética de DAYS días")
+    parser.add_argument("--days", type=float, default=7.0, help="días a descargar con --url")
+    parser.add_argument("--config", type=Path, help="configuración candidata (por defecto, la de fábrica)")
+    parser.add_argument("--profile", help="perfil aplicado sobre la configuración")
+    parser.add_argument("--curve", action="append", default=[], metavar="FAN=T:PWM,...[/HIST]",
+                        help="sustituye la curva de un ventilador (repetible)")
+    parser.add_argument("--temp-critical", type=float, help="umbral del watchdog")
+    parser.add_argument("--high-pwm", type=int, default=HIGH_PWM)
+    parser.add_argument("--trace", type=Path, help="guardar la traza PWM en CSV")
+    parser.add_argument("--budget", type=float, help="segundos máximos de reproducción")
+    args = parser.parse_args()
+
+    config = candidate(args)
+    begin = time.perf_counter()
+    if args.synthetic:
+        columns = synthetic(args.synthetic)
+    else:
+        columns = read_export(args.file.read_bytes() if args.file else fetch(args.url, args.days))
+    loaded = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    result = replay(config, columns, args.high_pwm)
+    elapsed = time.perf_counter() - begin
+    report(result, args.high_pwm)
+    print(f"datos en {loaded:.2f} s, reproducción en {elapsed:.2f} s "
+          f"({result['samples'] / max(elapsed, 1e-9) / 1e6:.1f} M muestras/s)")
+
+    if args.trace:
+        names = list(result["fans"])
+        table = np.column_stack([columns["timestamp"], columns["temp"]]
+                                + [result["fans"][name]["pwm"] for name in names])
+        np.savetxt(args.trace, table, delimiter=",", fmt=["%.3f", "%.1f"] + ["%d"] * len(names),
+                   header=",".join(["timestamp", "temp"] + names), comments="")
+        print(f"traza guardada en {args.trace}")
+    if args.budget is not None and elapsed > args.budget:
+        print(f"FALLO: {elapsed:.2f} s > {args.budget:g} s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,16 @@ fi
 # Crear directorios
 mkdir -p /opt/fancontrol
 mkdir -p /var/log/fancontrol
+mkdir -p /var/lib/fancontrol/history
+# La configuración vive en un directorio del servicio: al guardarla (save=true)
+# se escribe un temporal y se renombra, y eso necesita escribir en el directorio
+mkdir -p /etc/fancontrol
+if [ -f /etc/fancontrol.json ] && [ ! -f /etc/fancontrol/fancontrol.json ]; then
+    mv /etc/fancontrol.json /etc/fancontrol/fancontrol.json
+fi
+chown -R fancontrol:fancontrol /etc/fancontrol
 chown fancontrol:fancontrol /var/log/fancontrol
+chown -R fancontrol:fancontrol /var/lib/fancontrol
 
 # Copiar archivos
 cp -r app /opt/fancontrol/
@@ -20,11 +29,23 @@ apt-get update
 apt-get install -y python3-pip
 pip3 install -r /opt/fancontrol/requirements.txt
 
-# Configurar sudoers
-echo "fancontrol ALL=(root) NOPASSWD: /bin/chmod 666 /sys/class/hwmon/hwmon0/pwm*" > /etc/sudoers.d/fancontrol
-echo "fancontrol ALL=(root) NOPASSWD: /bin/chmod 444 /sys/class/hwmon/hwmon0/fan*_input" >> /etc/sudoers.d/fancontrol
-echo "fancontrol ALL=(root) NOPASSWD: /bin/chmod 444 /sys/class/hwmon/hwmon0/temp*_input" >> /etc/sudoers.d/fancontrol
-chmod 440 /etc/sudoers.d/fancontrol
+# Permisos de escritura en los PWM mediante una regla udev: se aplica a cada
+# chip hwmon al aparecer, así que no depende del número hwmonN (cambia entre
+# arranques). Argumentos opcionales: nombres de chip (<hwmonN>/name, p.ej.
+# nct6775) a los que limitarla; sin argumentos, todos los chips con PWM.
+rm -f /etc/sudoers.d/fancontrol
+RULES=/etc/udev/rules.d/90-fancontrol.rules
+GRANT="RUN+=\"/bin/sh -c 'cd /sys%p && for f in pwm[0-9]* pwm[0-9]*_enable; do [ -e \$\$f ] && chgrp fancontrol \$\$f && chmod g+w \$\$f; done; true'\""
+echo "# Generado por scripts/setup_systemd.sh" > "$RULES"
+if [ $# -eq 0 ]; then
+    echo "ACTION==\"add\", SUBSYSTEM==\"hwmon\", $GRANT" >> "$RULES"
+else
+    for chip in "$@"; do
+        echo "ACTION==\"add\", SUBSYSTEM==\"hwmon\", ATTR{name}==\"$chip\", $GRANT" >> "$RULES"
+    done
+fi
+udevadm control --reload-rules
+udevadm trigger --subsystem-match=hwmon --action=add
 
 # Crear servicio systemd
 cat > /etc/systemd/system/fancontrol.service <<EOF
@@ -35,10 +56,12 @@ After=network.target
 [Service]
 User=fancontrol
 WorkingDirectory=/opt/fancontrol
-ExecStart=/usr/bin/python3 -m app.main
+ExecStart=/usr/bin/python3 -m app
 Restart=always
 RestartSec=5
 Environment=PYTHONUNBUFFERED=1
+Environment=FANCONTROL_HISTORY_DIR=/var/lib/fancontrol/history
+Environment=FANCONTROL_CONFIG=/etc/fancontrol/fancontrol.json
 StandardOutput=file:/var/log/fancontrol/out.log
 StandardError=file:/var/log/fancontrol/err.log
 
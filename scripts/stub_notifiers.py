@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""Servidores locales de prueba para las notificaciones de alerta (SMTP y HTTP).
+
+El servidor HTTP acepta tanto la API de Telegram (/bot<token>/sendMessage)
+como cualquier webhook. Ambos pueden simular un servicio lento (--delay) o
+que falla las primeras peticiones (--fail), y muestran lo que reciben.
+
+Uso (desde la raíz del repositorio):
+    python scripts/stub_notifiers.py [--smtp-port 2525] [--http-port 8025] [--delay 0] [--fail 0]
+    python scripts/stub_notifiers.py --check   # comprueba que el envío no retrasa el bucle
+
+Configuración equivalente en /etc/fancontrol.json:
+    "alerts": {
+        "email": {"host": "127.0.0.1", "port": 2525, "sender": "fc@localhost", "to": ["admin@localhost"]},
+        "telegram": {"token": "TEST", "chat_id": "1", "api_url": "http://127.0.0.1:8025"},
+        "webhook": {"url": "http://127.0.0.1:8025/hook"}
+    }
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+class StubState:
+    """Mensajes recibidos y comportamiento simulado de los servidores"""
+
+    def __init__(self, delay: float = 0.0, fail: int = 0):
+        self.delay = delay
+        self.fail = fail
+        self.received: List[dict] = []
+
+    def should_fail(self) -> bool:
+        if self.fail > 0:
+            self.fail -= 1
+            return True
+        return False
+
+
+async def _smtp_session(state: StubState, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Diálogo SMTP mínimo: lo justo para smtplib.send_message"""
+    def reply(line: str):
+        writer.write((line + "\r\n").encode())
+
+    reply("220 stub ESMTP")
+    await writer.drain()
+    data: List[str] = []
+    in_data = False
+    while True:
+        raw = await reader.readline()
+        if not raw:
+            break
+        line = raw.decode(errors="replace").rstrip("\r\n")
+        if in_data:
+            if line == ".":
+                in_data = False
+                await asyncio.sleep(state.delay)
+                if state.should_fail():
+                    reply("451 stub: fallo simulado")
+                else:
+                    state.received.append({"via": "smtp", "body": "\n".join(data)})
+                    print(f"[smtp] mensaje de {len(data)} líneas")
+                    reply("250 OK")
+                data = []
+            else:
+                data.append(line[1:] if line.startswith("..") else line)
+        else:
+            command = line[:4].upper()
+            if command in ("EHLO", "HELO"):
+                reply("250 stub")
+            elif command == "DATA":
+                in_data = True
+                reply("354 Fin con <CRLF>.<CRLF>")
+            elif command == "QUIT":
+                reply("221 Adiós")
+                await writer.drain()
+                break
+            else:
+                reply("250 OK")
+        await writer.drain()
+    writer.close()
+
+
+async def _http_session(state: StubState, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Servidor HTTP/1.0 mínimo que acepta cualquier POST con cuerpo JSON"""
+    request_line = (await reader.readline()).decode().split()
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode().strip()
+        if not line:
+            break
+        key, _, value = line.partition(":")
+        headers[key.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get("content-length", 0)))
+    await asyncio.sleep(state.delay)
+
+    if state.should_fail():
+        status, payload = "500 Internal Server Error", {"ok": False}
+    else:
+        path = request_line[1] if len(request_line) > 1 else "/"
+        via = "telegram" if path.endswith("/sendMessage") else "webhook"
+        state.received.append({"via": via, "path": path, "body": json.loads(body or b"{}")})
+        print(f"[{via}] {path} {body.decode(errors='replace')}")
+        status, payload = "200 OK", {"ok": True}
+    content = json.dumps(payload).encode()
+    writer.write(
+        f"HTTP/1.0 {status}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(content)}\r\n\r\n".encode() + content
+    )
+    await writer.drain()
+    writer.close()
+
+
+async def serve(state: StubState, smtp_port: int, http_port: int):
+    smtp = await asyncio.start_server(lambda r, w: _smtp_session(state, r, w), "127.0.0.1", smtp_port)
+    http = await asyncio.start_server(lambda r, w: _http_session(state, r, w), "127.0.0.1", http_port)
+    return smtp, http
+
+
+async def check(args) -> int:
+    """Dispara alertas a 10Hz contra servidores lentos y mide el retraso del bucle"""
+    from app.models.config import AlertConfig, AlertRule
+    from app.services.alerts import AlertService
+
+    state = StubState(delay=args.delay or 2.0, fail=args.fail or 2)
+    smtp, http = await serve(state, args.smtp_port, args.http_port)
+    config = AlertConfig(
+        default_rules=False, cooldown=0, retries=3, email_notifications=True, telegram_notifications=True,
+        rules=[AlertRule(name="hot", metric="temp", threshold=80)],
+        email={"host": "127.0.0.1", "port": args.smtp_port, "sender": "fc@localhost",
+               "to": ["admin@localhost"]},
+        telegram={"token": "TEST", "chat_id": "1", "api_url": f"http://127.0.0.1:{args.http_port}"},
+        webhook={"url": f"http://127.0.0.1:{args.http_port}/hook"},
+    )
+    service = AlertService(config)
+    service.notifier.backoff = 0.1
+    await service.start()
+
+    period, worst, fired = 0.1, 0.0, 0
+    deadline = time.monotonic()
+    for tick in range(int(args.seconds / period)):
+        start = time.perf_counter()
+        temp = 90.0 if (tick // 5) % 2 else 50.0  # Alterna cada 0.5 s: firing/resolved
+        fired += len(service.evaluate(time.time(), {"temp": temp}))
+        worst = max(worst, time.perf_counter() - start)
+        deadline += period
+        await asyncio.sleep(max(0.0, deadline - time.monotonic()))
+        worst = max(worst, time.monotonic() - deadline)
+
+    # Esperar a que se entreguen (o fallen) todas las notificaciones
+    notifier = service.notifier
+    expected = fired * len(notifier.senders)
+    for _ in range(int(args.seconds * 40 * (state.delay + 1))):
+        if notifier.sent + notifier.failed + notifier.dropped * len(notifier.senders) >= expected:
+            break
+        await asyncio.sleep(0.1)
+    await service.stop()
+    smtp.close()
+    http.close()
+
+    stats = service.notifier.stats()
+    print(f"transiciones={fired}  recibidas={len(state.received)}  notificador={stats}")
+    print(f"retraso máximo del bucle={worst * 1000:.2f} ms (retardo del servidor {state.delay:g} s)")
+    return 0 if worst < period and state.received else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--smtp-port", type=int, default=2525)
+    parser.add_argument("--http-port", type=int, default=8025)
+    parser.add_argument("--delay", type=float, default=0.0, help="segundos de retardo por petición")
+    parser.add_argument("--fail", type=int, default=0, help="número de peticiones que fallan al principio")
+    parser.add_argument("--check", action="store_true")
+    parser.add_argument("--seconds", type=float, default=5.0, help="duración de --check")
+    args = parser.parse_args()
+
+    if args.check:
+        sys.exit(asyncio.run(check(args)))
+
+    async def run():
+        await serve(StubState(args.delay, args.fail), args.smtp_port, args.http_port)
+        print(f"SMTP en 127.0.0.1:{args.smtp_port}, HTTP en 127.0.0.1:{args.http_port}")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import asyncio
+
+from app.services.actuator import PwmActuator
+
+
+class FakeHwmon:
+    """Registra los lotes escritos; los canales de `failing` devuelven error"""
+
+    def __init__(self, failing=()):
+        self.batches = []
+        self.failing = set(failing)
+
+    async def write(self, values):
+        self.batches.append(dict(values))
+        return {name: "EIO" for name in values if name in self.failing}
+
+
+def make(min_interval=0.0, hysteresis=3.0, failing=()):
+    now = [0.0]
+    hwmon = FakeHwmon(failing)
+    actuator = PwmActuator(hwmon, ["fan1", "fan2"], [20, 0], [hysteresis, hysteresis],
+                           min_interval=min_interval, clock=lambda: now[0])
+    return actuator, hwmon, now
+
+
+def flush(actuator):
+    return asyncio.run(actuator.flush())
+
+
+def test_watchdog_beats_manual_and_auto():
+    actuator, _, _ = make()
+    actuator.set_manual("fan1", 100)
+    actuator.request("fan1", 80, "auto", 50.0)
+    actuator.request("fan1", 255, "watchdog")
+    actuator.request("fan1", 90, "auto", 50.0)  # Menor prioridad: no pisa al watchdog
+    assert flush(actuator) == {"fan1": 255}
+
+
+def test_manual_overrides_auto_until_hold_expires():
+    actuator, _, now = make()
+    actuator.set_manual("fan1", 100, hold=10)
+    actuator.request("fan1", 60, "auto", 40.0)
+    assert flush(actuator) == {"fan1": 100}
+    assert actuator.manual() == {"fan1": 100}
+
+    now[0] = 10.0
+    actuator.request("fan1", 60, "auto", 40.0)
+    assert flush(actuator) == {"fan1": 60}
+    assert actuator.manual() == {}
+
+
+def test_requests_are_clamped_to_min_pwm_and_255():
+    actuator, _, _ = make()
+    actuator.request("fan1", 5, "auto", 30.0)
+    actuator.request("fan2", 300, "auto", 30.0)
+    assert flush(actuator) == {"fan1": 20, "fan2": 255}
+
+
+def test_unchanged_value_is_suppressed():
+    actuator, hwmon, _ = make()
+    actuator.request("fan1", 80, "auto", 50.0)
+    flush(actuator)
+    actuator.request("fan1", 80, "auto", 50.0)
+    assert flush(actuator) == {}
+    assert len(hwmon.batches) == 1
+    assert actuator.writes_suppressed == 1
+
+
+def test_auto_decrease_needs_hysteresis():
+    actuator, _, _ = make(hysteresis=3.0)
+    actuator.request("fan1", 120, "auto", 60.0)
+    flush(actuator)
+    actuator.request("fan1", 100, "auto", 58.0)  # Sólo 2 °C por debajo
+    assert flush(actuator) == {}
+    actuator.request("fan1", 100, "auto", 57.0)
+    assert flush(actuator) == {"fan1": 100}
+
+
+def test_auto_decrease_waits_min_interval_but_increase_does_not():
+    actuator, _, now = make(min_interval=5.0, hysteresis=0.0)
+    actuator.request("fan1", 120, "auto", 60.0)
+    flush(actuator)
+
+    now[0] = 2.0
+    actuator.request("fan1", 100, "auto", 50.0)
+    assert flush(actuator) == {}
+    actuator.request("fan1", 150, "auto", 65.0)
+    assert flush(actuator) == {"fan1": 150}
+
+    now[0] = 6.0  # 4 s desde la última escritura
+    actuator.request("fan1", 100, "auto", 50.0)
+    assert flush(actuator) == {}
+    now[0] = 7.0
+    actuator.request("fan1", 100, "auto", 50.0)
+    assert flush(actuator) == {"fan1": 100}
+
+
+def test_auto_may_drop_freely_after_watchdog():
+    actuator, _, _ = make(hysteresis=10.0)
+    actuator.request("fan1", 255, "watchdog")
+    flush(actuator)
+    actuator.request("fan1", 100, "auto", 94.0)
+    assert flush(actuator) == {"fan1": 100}
+
+
+def test_needs_flush_only_for_watchdog_and_increases():
+    actuator, _, _ = make()
+    actuator.request("fan1", 120, "auto", 60.0)
+    assert actuator.needs_flush()
+    flush(actuator)
+    actuator.request("fan1", 100, "auto", 50.0)
+    assert not actuator.needs_flush()
+    actuator.request("fan1", 255, "watchdog")
+    assert actuator.needs_flush()
+
+
+def test_failed_write_is_retried():
+    actuator, _, _ = make(failing=("fan2",))
+    actuator.request("fan2", 90, "auto", 50.0)
+    assert flush(actuator) == {}
+    assert actuator.write_errors == 1
+    assert actuator.value("fan2") == 0
+
+    actuator.hwmon.failing.clear()
+    actuator.request("fan2", 90, "auto", 50.0)
+    assert flush(actuator) == {"fan2": 90}
@@ -0,0 +1,86 @@
+import math
+
+from app.models.config import AlertConfig, AlertRule
+from app.services.alerts import AlertService, default_rules
+
+
+def service(*rules, cooldown=300.0):
+    return AlertService(AlertConfig(default_rules=False, rules=list(rules), cooldown=cooldown))
+
+
+def run(alerts, metric, samples):
+    """Evalúa (t, valor) en orden; devuelve las transiciones como (t, estado)"""
+    out = []
+    for t, value in samples:
+        out += [(t, a.state) for a in alerts.evaluate(t, {metric: value})]
+    return out
+
+
+def test_above_fires_after_duration_and_resolves():
+    alerts = service(AlertRule(name="hot", metric="temp", kind="above", threshold=80, duration=5))
+    samples = [(t, 85.0) for t in range(8)] + [(8, 70.0)]
+    assert run(alerts, "temp", samples) == [(5, "firing"), (8, "resolved")]
+
+
+def test_above_window_restarts_when_condition_breaks():
+    alerts = service(AlertRule(name="hot", metric="temp", kind="above", threshold=80, duration=5))
+    samples = [(t, 85.0) for t in range(4)] + [(4, 79.0)] + [(t, 85.0) for t in range(5, 11)]
+    assert run(alerts, "temp", samples) == [(10, "firing")]
+
+
+def test_below_with_zero_duration_fires_immediately():
+    alerts = service(AlertRule(name="fan", metric="fan1_rpm", kind="below", threshold=500))
+    assert run(alerts, "fan1_rpm", [(0, 900.0), (1, 100.0), (2, 120.0), (3, 900.0)]) == \
+        [(1, "firing"), (3, "resolved")]
+
+
+def test_rate_uses_sliding_window():
+    alerts = service(AlertRule(name="rise", metric="temp", kind="rate", threshold=1.0, duration=10))
+    # 0.5 °C/s: no dispara; luego 2 °C/s durante unos segundos
+    samples = [(t, 40.0 + 0.5 * t) for t in range(20)]
+    samples += [(t, samples[-1][1] + 2.0 * (t - 19)) for t in range(20, 26)]
+    transitions = run(alerts, "temp", samples)
+    assert transitions and transitions[0][1] == "firing"
+    assert 20 <= transitions[0][0] <= 25
+
+
+def test_stuck_fires_when_value_does_not_change():
+    alerts = service(AlertRule(name="stuck", metric="temp", kind="stuck", threshold=0.1, duration=30))
+    samples = [(t, 50.0 + (0.05 if t % 2 else 0.0)) for t in range(31)] + [(31, 52.0)]
+    assert run(alerts, "temp", samples) == [(30, "firing"), (31, "resolved")]
+
+
+def test_cooldown_deduplicates_notifications():
+    alerts = service(AlertRule(name="hot", metric="temp", kind="above", threshold=80), cooldown=60)
+    samples = [(0, 85.0), (1, 70.0), (10, 85.0), (11, 70.0), (70, 85.0), (71, 70.0)]
+    # La segunda activación cae dentro del cooldown: ni firing ni resolved
+    assert run(alerts, "temp", samples) == [(0, "firing"), (1, "resolved"),
+                                             (70, "firing"), (71, "resolved")]
+
+
+def test_rule_cooldown_overrides_global():
+    rule = AlertRule(name="hot", metric="temp", kind="above", threshold=80, cooldown=0)
+    alerts = service(rule, cooldown=600)
+    assert len(run(alerts, "temp", [(0, 85.0), (1, 70.0), (2, 85.0)])) == 3
+
+
+def test_missing_and_nan_values_do_not_touch_windows():
+    alerts = service(AlertRule(name="hot", metric="temp", kind="above", threshold=80, duration=5))
+    transitions = run(alerts, "temp", [(0, 85.0), (2, math.nan), (3, None), (5, 85.0)])
+    assert transitions == [(5, "firing")]
+
+
+def test_fan_failure_only_for_first_or_calibrated_fans():
+    names = {rule.name for rule in default_rules(AlertConfig(), ["temp"], ["fan1", "fan2", "fan3"],
+                                                  calibrated=["fan3"])}
+    assert "fan_failure:fan1" in names
+    assert "fan_failure:fan2" not in names
+    assert "fan_failure:fan3" in names
+    assert {"fan_degraded:fan1", "fan_degraded:fan2", "fan_degraded:fan3"} <= names
+
+
+def test_airflow_only_for_analysed_zone():
+    names = {rule.name for rule in default_rules(AlertConfig(), ["cpu", "gpu"], ["fan1"])}
+    assert "airflow:cpu" in names
+    assert "airflow:gpu" not in names
+    assert {"temp_high:cpu", "temp_high:gpu"} <= names
@@ -0,0 +1,81 @@
+import asyncio
+import builtins
+import time
+
+import pytest
+
+from app.services.calibration import FanCalibrator, calibrate
+from app.services.simulator import HwmonSimulator, SimulatedFan
+
+# Ventiladores rápidos y sondeo corto: la calibración completa tarda unos segundos
+OPTIONS = {"poll": 0.02, "window": 0.24, "settle_timeout": 3.0, "start_timeout": 0.4}
+
+
+def fast_fan(stop, start, max_rpm):
+    return SimulatedFan(max_rpm=max_rpm, min_rpm=400.0, stop_pwm=stop, start_pwm=start,
+                        gamma=0.8, tau_up=0.04, tau_down=0.08, noise=0.002)
+
+
+@pytest.fixture
+def simulator(tmp_path, monkeypatch):
+    # Nada de preguntas: cualquier input() hace fallar la prueba
+    def no_prompt(*args):
+        raise AssertionError("la calibración no debe pedir confirmación")
+    monkeypatch.setattr(builtins, "input", no_prompt)
+
+    fans = [fast_fan(30, 45, 1800.0), fast_fan(60, 62, 2400.0)]
+    sim = HwmonSimulator(tmp_path, fans, dt=0.005).start()
+    yield sim
+    sim.stop()
+
+
+def paths(sim):
+    return {f"fan{n}": (sim.dir / f"pwm{n}", sim.dir / f"fan{n}_input")
+            for n in range(1, len(sim.fans) + 1)}
+
+
+def test_calibrates_all_fans_concurrently(simulator):
+    for n in (1, 2):
+        (simulator.dir / f"pwm{n}").write_text("77\n")
+    begin = time.monotonic()
+    results = asyncio.run(calibrate(paths(simulator), **OPTIONS))
+    elapsed = time.monotonic() - begin
+
+    for (name, result), fan in zip(results.items(), simulator.fans):
+        assert result.error is None, name
+        assert abs(result.stop_pwm - fan.stop_pwm) <= 1
+        assert abs(result.start_pwm - fan.start_pwm) <= 1
+        assert abs(result.max_rpm - fan.max_rpm) / fan.max_rpm < 0.03
+        # PWM y modo originales restaurados
+        assert simulator.dir.joinpath(f"pwm{name[-1]}").read_text().split()[0] == "77"
+        assert simulator.dir.joinpath(f"pwm{name[-1]}_enable").read_text().strip() == "2"
+    # A la vez: el total es el del más lento, no la suma
+    assert elapsed < 0.75 * sum(r.elapsed for r in results.values())
+
+
+def test_settle_returns_once_rpm_is_stable(simulator, caplog):
+    fan = simulator.fans[0]
+    calibrator = FanCalibrator("fan1", *paths(simulator)["fan1"], **OPTIONS)
+
+    async def run():
+        await calibrator._kick()
+        begin = time.monotonic()
+        rpm = await calibrator._settle(200)
+        return rpm, time.monotonic() - begin
+
+    rpm, elapsed = asyncio.run(run())
+    assert abs(rpm - fan.target_rpm(200)) / fan.target_rpm(200) < 0.02
+    # Asentado por la ventana, no por agotar settle_timeout
+    assert elapsed < OPTIONS["settle_timeout"] / 2
+    assert "sin estabilizar" not in caplog.text
+
+
+def test_settle_reports_a_stopped_fan(simulator):
+    calibrator = FanCalibrator("fan2", *paths(simulator)["fan2"], **OPTIONS)
+
+    async def run():
+        await calibrator._kick()
+        await calibrator._settle(255)
+        return await calibrator._settle(20)  # Por debajo de la parada (60)
+
+    assert asyncio.run(run()) == 0.0
@@ -0,0 +1,45 @@
+import math
+
+import pytest
+
+from app.models.config import ControlCurve, default_config
+from app.services.curves import CompiledCurve
+
+np = pytest.importorskip("numpy")
+
+
+def curves():
+    config = default_config()
+    yield config.fan1
+    yield config.fan2
+    yield ControlCurve(min_pwm=30, max_pwm=200, hysteresis=2.0,
+                       curve=[[30, 40], [45, 97], [45, 120], [62.5, 181], [80, 255]])
+
+
+@pytest.mark.parametrize("curve", list(curves()))
+def test_evaluate_many_matches_scalar(curve):
+    compiled = CompiledCurve(curve)
+    rng = np.random.default_rng(7)
+    points = [t for t, _ in curve.curve]
+    temps = np.concatenate([
+        rng.uniform(0, 120, 5000),
+        np.array(points, dtype=np.float64),
+        np.array(points, dtype=np.float64) + 1e-9,
+        np.linspace(points[0], points[-1], 2001),
+        [-40.0, 0.0, 150.0, math.nan, math.inf, -math.inf],
+    ])
+    expected = [compiled(float(t)) for t in temps]
+    assert compiled.evaluate_many(temps).tolist() == expected
+
+
+def test_nan_requests_max_pwm():
+    compiled = CompiledCurve(default_config().fan1)
+    assert compiled(math.nan) == compiled.max_pwm
+    values = compiled.evaluate_many([math.nan, 20.0, math.nan])
+    assert values.tolist() == [compiled.max_pwm, compiled(20.0), compiled.max_pwm]
+
+
+def test_compiled_curve_is_immutable():
+    compiled = CompiledCurve(default_config().fan1)
+    with pytest.raises(AttributeError):
+        compiled.max_pwm = 10
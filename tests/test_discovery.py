@@ -0,0 +1,35 @@
+from app.services.discovery import HwmonDiscovery
+
+
+def make_chip(root, entry, chip="fansim"):
+    hwmon = root / entry
+    hwmon.mkdir()
+    (hwmon / "name").write_text(f"{chip}\n")
+    (hwmon / "pwm1").write_text("128\n")
+    return hwmon
+
+
+def test_refresh_is_rate_limited(tmp_path):
+    make_chip(tmp_path, "hwmon0")
+    now = [0.0]
+    discovery = HwmonDiscovery(str(tmp_path), lambda: now[0])
+
+    # Sin cambios: comprobaciones cada vez más espaciadas
+    checks = []
+    for tick in range(120):
+        now[0] = float(tick)
+        before = discovery._next_check
+        discovery.refresh()
+        if discovery._next_check != before:
+            checks.append(tick)
+    assert checks == [0, 1, 3, 7, 15, 31, 63]
+
+    # Un hwmon nuevo se detecta en la siguiente comprobación y el backoff se reinicia
+    make_chip(tmp_path, "hwmon1", "other")
+    now[0] = 127.0
+    assert discovery.refresh()
+    assert discovery.resolve("other/pwm1") == tmp_path / "hwmon1" / "pwm1"
+    assert not discovery.refresh()
+    now[0] = 128.0
+    assert not discovery.refresh()
+    assert discovery._interval == 2.0
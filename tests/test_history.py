@@ -0,0 +1,54 @@
+from app.models.sensor import Sample
+from app.services.history import HistoryService
+
+
+def sample(t):
+    return Sample(float(t), 40.0 + t % 7, 1200.0, 800.0, 90, 14)
+
+
+def history(n, max_records=100):
+    service = HistoryService(max_records=max_records, tiers=())
+    for t in range(n):
+        service.add_record(sample(t))
+    return service
+
+
+def timestamps(export):
+    return [row[0] for chunk in export.chunks() for row in chunk]
+
+
+def test_export_keeps_its_rows_while_samples_arrive():
+    service = history(100)
+    export = service.export(50, 60, downsample="none")
+    for t in range(100, 130):  # Búfer lleno: cada muestra desplaza los índices lógicos
+        service.add_record(sample(t))
+    assert timestamps(export) == [float(t) for t in range(50, 61)]
+    assert not export.truncated
+
+
+def test_next_cursor_matches_the_page_sent():
+    service = history(100)
+    page = service.export(40, 99, downsample="none", limit=10)
+    for t in range(100, 130):
+        service.add_record(sample(t))
+    assert timestamps(page)[-1] == page.next_cursor == 49.0
+    assert [c.tolist() for c in page.column_chunks(0)] == [[float(t) for t in range(40, 50)]]
+
+
+def test_export_stops_when_rows_are_evicted():
+    service = history(100)
+    export = service.export(10, 20, downsample="none")
+    for t in range(100, 115):  # Descarta las filas 0-14
+        service.add_record(sample(t))
+    assert timestamps(export) == []
+    assert export.truncated
+
+
+def test_tier_selection_follows_the_point_budget():
+    service = HistoryService(max_records=10_000, tiers=((10, 1000), (60, 1000)))
+    for t in range(5000):
+        service.add_record(sample(t))
+    assert service.export(0, 4999, max_points=1000).resolution == 0  # 5000 <= 10 * 1000 crudas
+    assert service.export(0, 4999, max_points=50).resolution == 10
+    assert service.export(0, 4999, max_points=20).resolution == 60
+    assert service.export(0, 4999, max_points=3).resolution == 60  # El más grueso que cubre
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from app.models.config import default_config
+from app.services.actuator import PwmActuator
+from app.services.curves import CompiledCurve
+from app.services.replay import _writes, replay
+
+np = pytest.importorskip("numpy")
+
+
+class RecordingHwmon:
+    def __init__(self, clock):
+        self.clock = clock
+        self.writes = []
+
+    async def write(self, values):
+        for name, value in values.items():
+            self.writes.append((name, self.clock(), value))
+        return {}
+
+
+def samples(n=4000, seed=3):
+    """Temperatura con deriva, picos por encima de la crítica y lecturas fallidas"""
+    rng = np.random.default_rng(seed)
+    ts = 1000.0 + np.arange(n, dtype=np.float64)
+    temps = np.clip(55 + np.cumsum(rng.normal(0, 0.8, n)), 25, 90)
+    temps[rng.choice(n, 40, replace=False)] = np.nan
+    temps[1500:1520] = 97.0
+    return ts, temps
+
+
+def per_sample(ts, temps, values, watchdog, control_every, hysteresis, min_interval):
+    """Escrituras de un PwmActuator alimentado muestra a muestra como en el bucle"""
+    now = [0.0]
+    hwmon = RecordingHwmon(lambda: now[0])
+    names = [f"fan{f}" for f in range(len(values))]
+    actuator = PwmActuator(hwmon, names, [0] * len(names), hysteresis, min_interval,
+                           clock=lambda: now[0])
+
+    async def run():
+        for i in range(len(ts)):
+            now[0] = float(ts[i])
+            for f, name in enumerate(names):
+                actuator.request(name, int(values[f, i]), "auto", float(temps[i]))
+                if watchdog[i]:
+                    actuator.request(name, 255, "watchdog")
+            if i % control_every == 0 or actuator.needs_flush():
+                await actuator.flush()
+
+    asyncio.run(run())
+    return [[(t, value) for name, t, value in hwmon.writes if name == fan] for fan in names]
+
+
+@pytest.mark.parametrize("control_every", [1, 3, 10])
+@pytest.mark.parametrize("min_interval", [0.0, 7.0])
+def test_writes_match_actuator(control_every, min_interval):
+    # Dos curvas con pendiente: las subidas de una fuerzan flush que aplican bajadas de la otra
+    ts, temps = samples()
+    config = default_config()
+    other = config.fan1.copy(update={"curve": [(40.0, 60), (70.0, 200)], "hysteresis": 1.5})
+    curves = [CompiledCurve(config.fan1), CompiledCurve(other)]
+    watchdog = ~np.isnan(temps) & (temps >= 95.0)
+    values = np.array([curve.evaluate_many(temps) for curve in curves], dtype=np.int16)
+    values[:, watchdog] = 255
+    hysteresis = [float(curve.hysteresis) for curve in curves]
+
+    writes = _writes(ts, temps, values, watchdog, control_every, hysteresis, min_interval)
+    expected = per_sample(ts, temps, values, watchdog, control_every, hysteresis, min_interval)
+    assert [list(zip(ts[index].tolist(), written.tolist())) for index, written in writes] == expected
+
+
+def test_replay_counts_watchdog_and_writes():
+    ts, temps = samples(n=2000)
+    config = default_config()
+    result = replay(config, {"timestamp": ts, "temp": temps})
+    assert result["samples"] == 2000
+    assert result["watchdog"]["episodes"] == 1
+    assert result["watchdog"]["seconds"] == 20.0
+    # fan2 no llega a 255 por su curva: el watchdog escribe una vez y lo mantiene
+    fan = result["fans"]["fan2"]
+    assert fan["watchdog_writes"] == 1
+    assert fan["pwm"][1500:1520].tolist() == [255] * 20
+    # Sin lectura la curva pide max_pwm
+    nan = np.isnan(temps)
+    assert (fan["pwm"][nan] >= config.fan2.max_pwm).all()
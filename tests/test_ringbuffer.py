@@ -0,0 +1,56 @@
+import pytest
+
+from app.services.ringbuffer import RingBuffer
+
+
+def filled(capacity, n):
+    buf = RingBuffer(capacity, {"timestamp": "d", "value": "i"})
+    for i in range(n):
+        buf.append((float(i), i * 10))
+    return buf
+
+
+def test_wraparound_keeps_last_capacity_rows():
+    buf = filled(4, 6)
+    assert len(buf) == 4
+    assert buf.count == 6
+    assert [buf.row(i) for i in range(4)] == [(2.0, 20), (3.0, 30), (4.0, 40), (5.0, 50)]
+    assert buf.row(-1) == (5.0, 50)
+    with pytest.raises(IndexError):
+        buf.row(4)
+
+
+def test_segments_split_at_wraparound():
+    buf = filled(4, 6)
+    segments = buf.segments("value")
+    assert len(segments) == 2
+    assert [v for seg in segments for v in seg] == [20, 30, 40, 50]
+    assert [list(seg) for seg in buf.segments("value", last_n=2)] == [[40, 50]]
+    assert [v for seg in buf.segments("value", last_n=3, stop=3) for v in seg] == [20, 30, 40]
+    assert buf.segments("value", last_n=0) == []
+
+
+def test_values_rows_and_bisect_use_logical_order():
+    buf = filled(5, 12)
+    assert buf.values("value", 1, 4) == [80, 90, 100]
+    assert list(buf.rows(3, 10)) == [(10.0, 100), (11.0, 110)]
+    assert buf.bisect("timestamp", 9.5) == 3
+    assert buf.bisect("timestamp", 0.0) == 0
+    assert buf.bisect("timestamp", 99.0) == 5
+
+
+def test_covers_only_retained_range():
+    buf = filled(4, 3)
+    assert buf.covers("timestamp", -100.0)
+    buf = filled(4, 6)
+    assert not buf.covers("timestamp", 1.0)
+    assert buf.covers("timestamp", 2.0)
+
+
+def test_clear_and_invalid_capacity():
+    buf = filled(4, 6)
+    buf.clear()
+    assert len(buf) == 0
+    assert buf.segments("value") == []
+    with pytest.raises(ValueError):
+        RingBuffer(0, {"value": "i"})
@@ -0,0 +1,23 @@
+import math
+
+from app.services.rollup import RollupTier
+
+
+def test_nan_reads_are_left_out_of_the_bucket():
+    tier = RollupTier(60, 10)
+    nan = math.nan
+    # Primera muestra del bucket sin lectura de temperatura
+    tier.add(0, (nan, 1000.0, 800.0, 90, 14))
+    tier.add(10, (44.0, 1100.0, 800.0, 90, 14))
+    tier.add(20, (46.0, nan, 800.0, 90, 14))
+    tier.add(60, (45.0, 1000.0, 800.0, 90, 14))
+    tier.add(120, (nan, 1000.0, 800.0, 90, 14))
+
+    result = tier.query(0, 180)
+    assert result["count"] == [3, 1, 1]
+    assert result["temp"]["mean"][:2] == [45.0, 45.0]
+    assert math.isnan(result["temp"]["mean"][2])
+    assert result["temp"]["min"][0] == 44.0
+    assert result["temp"]["max"][0] == 46.0
+    assert result["fan1_rpm"]["mean"][0] == 1050.0
+    assert result["pwm1"]["mean"] == [90.0, 90.0, 90.0]
@@ -0,0 +1,98 @@
+import os
+import threading
+
+from app.services.storage import RECORD_SIZE, SEGMENT_SUFFIX, SegmentStore
+
+
+def record(i):
+    return (1000.0 + i, 40.0 + i / 10, 1200.0, 800.0, 90, 14)
+
+
+def store_with(directory, n, **kwargs):
+    store = SegmentStore(directory, **kwargs)
+    for i in range(n):
+        store.append(record(i))
+    return store
+
+
+def last_segment(directory):
+    return sorted(directory.glob(f"*{SEGMENT_SUFFIX}"))[-1]
+
+
+def test_reopen_keeps_records(tmp_path):
+    store_with(tmp_path, 25, segment_records=10).close()
+    store = SegmentStore(tmp_path, segment_records=10)
+    assert len(store) == 25
+    assert store.row(0) == record(0)
+    assert store.row(-1) == record(24)
+    assert store.column("timestamp", 8, 12).tolist() == [1008.0, 1009.0, 1010.0, 1011.0]
+    store.close()
+
+
+def test_torn_tail_is_truncated(tmp_path):
+    store_with(tmp_path, 10).close()
+    path = last_segment(tmp_path)
+    with open(path, "ab") as f:
+        f.write(b"\x01" * (RECORD_SIZE // 2))  # Registro escrito a medias
+
+    store = SegmentStore(tmp_path)
+    assert len(store) == 10
+    assert path.stat().st_size == 10 * RECORD_SIZE
+    store.append(record(10))
+    assert store.row(-1) == record(10)
+    store.close()
+
+
+def test_corrupt_last_record_is_dropped(tmp_path):
+    store_with(tmp_path, 10).close()
+    path = last_segment(tmp_path)
+    with open(path, "r+b") as f:
+        f.seek(9 * RECORD_SIZE + 8)
+        f.write(b"\xff\xff\xff\xff")  # CRC del último registro inválido
+
+    store = SegmentStore(tmp_path)
+    assert len(store) == 9
+    assert store.row(-1) == record(8)
+    store.append(record(9))
+    store.close()
+
+    reopened = SegmentStore(tmp_path)
+    assert [reopened.row(i) for i in range(len(reopened))] == [record(i) for i in range(10)]
+    reopened.close()
+
+
+def test_empty_trailing_segment_after_rotation(tmp_path):
+    store_with(tmp_path, 10, segment_records=5).close()
+    path = last_segment(tmp_path)
+    os.truncate(path, RECORD_SIZE - 1)  # Sólo basura en el segmento activo
+
+    store = SegmentStore(tmp_path, segment_records=5)
+    assert len(store) == 5
+    assert store.row(-1) == record(4)
+    store.close()
+
+
+def test_rotation_while_reading(tmp_path):
+    # Lectura desde otro hilo (como los executors) mientras la retención borra segmentos
+    store = store_with(tmp_path, 10, segment_records=5, max_segments=3)
+    errors = []
+    done = threading.Event()
+
+    def reader():
+        while not done.is_set():
+            try:
+                store.row(0)
+                store.column("temp", 0, 3)
+            except Exception as e:  # noqa: BLE001
+                errors.append(e)
+                return
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    for i in range(10, 5000):
+        store.append(record(i))
+    done.set()
+    thread.join()
+    assert errors == []
+    assert len(list(tmp_path.glob(f"*{SEGMENT_SUFFIX}"))) == 3
+    store.close()